@@ -4,21 +4,43 @@ import secrets
 import unicodedata
 import re
 import json
+import hashlib
 import requests
 import threading
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, make_response, flash, copy_current_request_context
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, make_response, flash, copy_current_request_context, Response, stream_with_context, has_request_context, g, send_file
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from flask_mail import Mail, Message
-from email.utils import parseaddr
-from werkzeug.security import generate_password_hash, check_password_hash
+from hashing import hash_password, hash_password_later, verify_password, needs_rehash, HashingBusy, current_method as password_hash_method
 from authlib.integrations.flask_client import OAuth
 from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
-from sqlalchemy import select, text, func
-from models import SessionLocal, User, Question, Leaderboard, THEMES, Base, engine
+from sqlalchemy import select, text, func, case, event, or_, and_
+from sqlalchemy.exc import DBAPIError, OperationalError
+from models import SessionLocal, User, Question, Leaderboard, THEMES, Base, engine, ensure_indexes, dialect_insert
+from models import ReplicaSessionLocal, replica_engine
 from contextlib import contextmanager
 from models import Meta
+from oidc import install_jwks_cache, claims_complete
+from leaderboard_hub import LeaderboardHub
+from battle import make_battle_ticket
+from score_buffer import ScoreAggregator
+from replica import ReplicaRouter, STICKY_SECONDS
+from question_stats import QuestionStatsRecorder
+from deck import DeckSampler
+from question_cache import QuestionCache, CachedQuestion
+from cache import Cache, make_backend
+import shm_cache
+from session_codec import BinarySessionInterface
+import jinja_cache
+from compression import Compressor, Precompressed
+from settings import SettingsStore
+from invalidation import InvalidationBus
+import profiler
+import query_budget
+import score_hist
+import match_history
 from zoneinfo import ZoneInfo
 from datetime import datetime, time, timedelta
+from time import perf_counter, time as unix_time
 from dotenv import load_dotenv
 
 
@@ -26,8 +48,14 @@ load_dotenv()
 
 TZ = ZoneInfo("America/Manaus")
 
+# gunicorn --preload (ver gunicorn.conf.py): o módulo é importado no master;
+# threads de fundo e conexões só nascem nos workers, em after_fork()
+PRELOAD = os.getenv("APP_PRELOAD", "0") == "1"
+
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "28a08c230e257781ef22b1d7be9758a0")
+# cookie de sessão em formato binário compacto (ver session_codec.py)
+app.session_interface = BinarySessionInterface()
 
 app.config.update(
     SESSION_COOKIE_SECURE=True,
@@ -49,24 +77,37 @@ app.config["MAIL_USERNAME"] = os.getenv("MAIL_USERNAME", "")
 app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD", "")
 app.config["MAIL_DEFAULT_SENDER"] = os.getenv("MAIL_DEFAULT_SENDER", app.config["MAIL_USERNAME"] or "nao-responda<quizbattle.suporte@gmail.com>")
 
+# templates: bytecode em disco, sem checagem de mtime em produção
+jinja_cache.configure(app)
+
+# gzip/brotli conforme Accept-Encoding (COMPRESS_MIN_SIZE, COMPRESS_LEVEL)
+compressor = Compressor(app)
+
+# consultas por request contra query_budget.BUDGETS (QUERY_BUDGET=warn|raise)
+query_budget.install(app, engine, replica_engine)
+
 try:
     mail = Mail(app) if app.config["MAIL_SERVER"] else None
 except Exception:
     mail = None
 
 Base.metadata.create_all(engine)
+ensure_indexes(engine)
 
 # OAuth (Authlib)
 oauth = OAuth(app)
 
 # Google OpenID Connect (usa discovery)
+# GOOGLE_DISCOVERY_URL permite apontar para um provedor OIDC local em testes
 oauth.register(
     name="google",
-    server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+    server_metadata_url=os.getenv("GOOGLE_DISCOVERY_URL", "https://accounts.google.com/.well-known/openid-configuration"),
     client_id=os.getenv("GOOGLE_CLIENT_ID"),
     client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
     client_kwargs={"scope": "openid email profile"},
 )
+# id_token validado contra JWKS em cache (TTL + refresh na rotação de chaves)
+google_jwks = install_jwks_cache(oauth.google)
 
 THEMES = ["Esportes", "TV/Cinema", "Jogos", "Música", "Lógica", "História", "Diversos"]
 
@@ -74,6 +115,50 @@ LOWER_WORDS_PT = {"de","da","do","das","dos","e"}
 
 MAINTENANCE_COOKIE = "preview_ok"
 
+# configuração do caminho do request (snapshot; overrides em meta, ver settings.py)
+settings = SettingsStore(SessionLocal, logger=app.logger)
+settings.reload(reread_env=False)
+
+# profiler amostral por request, sob demanda (ver profiler.py e _profile_begin)
+request_profiler = profiler.Profiler(logger=app.logger)
+
+# invalidação dos caches em processo entre workers/nós (LISTEN/NOTIFY ou polling)
+invalidation_bus = InvalidationBus(engine, logger=app.logger)
+
+# estatísticas por pergunta (contadores em memória, flush em lote)
+question_stats = QuestionStatsRecorder(logger=app.logger)
+
+# caches em memória compartilhada (um por host; um worker escreve, todos leem)
+shm_writer = shm_cache.WriterLock()
+shared_top = shm_cache.SharedTop() if shm_cache.ENABLED else None
+
+# baralho com rampa de dificuldade (faixas reconstruídas em segundo plano)
+deck_sampler = DeckSampler(
+    logger=app.logger,
+    shared=shm_cache.SharedDeckIndex() if shm_cache.ENABLED else None,
+    writer=shm_writer,
+)
+
+# cache compartilhado (CACHE_URL: local, redis:// ou fake://), por namespace
+shared_cache = Cache(make_backend(logger=app.logger), logger=app.logger)
+shared_cache.namespace("user", 300)                               # identidade da sessão
+shared_cache.namespace("q", 3600, load=CachedQuestion._make)      # perguntas
+shared_cache.namespace("lb", 2, load=lambda rows: [shm_cache.TopRow(*r) for r in rows])  # 1ª página do ranking
+
+# perguntas imutáveis em memória (carregadas em warm_state)
+question_cache = QuestionCache(shared=shared_cache)
+
+# ranking ao vivo (SSE): um publicador por processo. Cada conexão prende um
+# thread do worker: por padrão no máximo metade dos GUNICORN_THREADS fica com
+# SSE; o excedente recebe 204 e a página cai para polling de /leaderboard/top
+leaderboard_hub = LeaderboardHub(
+    top_n=10,
+    heartbeat=float(os.getenv("SSE_HEARTBEAT", "15")),
+    max_stream=float(os.getenv("SSE_MAX_STREAM", "300")),
+    max_subscribers=int(os.getenv("SSE_MAX_SUBSCRIBERS",
+                                  str(max(1, int(os.getenv("GUNICORN_THREADS", "4")) // 2)))),
+)
+
 # “Aquecimento” do pool no startup
 def warmup_db():
     try:
@@ -85,8 +170,21 @@ def warmup_db():
 # após criar app/engine
 warmup_db()
 
+# histograma de pontuações (percentil "você superou X%")
+score_histogram = score_hist.HistogramCache(SessionLocal)
+try:
+    with SessionLocal() as _db:
+        score_hist.ensure(_db)
+        _db.commit()
+except Exception as e:
+    app.logger.warning(f"[HIST] {e}")
+
+# custo fixo do hash de senha (PASSWORD_HASH_METHOD)
+app.logger.info("[HASH] método: %s", password_hash_method())
+
 def _has_preview_cookie():
-    return request.cookies.get(MAINTENANCE_COOKIE) == os.getenv("PREVIEW_TOKEN", "")
+    token = settings.current.preview_token
+    return bool(token) and request.cookies.get(MAINTENANCE_COOKIE) == token
 
 
 
@@ -106,20 +204,88 @@ def beautify_name(name: str) -> str:
             out.append(w[:1].upper() + w[1:])
     return " ".join(out)
 
+def _like_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+NICK_MAX = User.__table__.c.nickname.type.length   # 16
+SUFFIX_DIGITS = 9   # cabe no INTEGER do Postgres; sufixo maior que isso é ignorado
+
+def _suffix_filter(base: str, digits: int) -> tuple[str, dict]:
+    # "base" exato ou "base <1..digits dígitos>"; length() barra sufixo que estouraria o CAST
+    return """
+         WHERE nickname = :base
+            OR (nickname LIKE :pat ESCAPE '\\'
+                AND length(nickname) BETWEEN :base_len + 2 AND :base_len + 1 + :digits
+                AND ltrim(substr(nickname, :off), '0123456789') = '')
+    """, {"base": base, "off": len(base) + 2, "pat": _like_escape(base) + " %",
+          "base_len": len(base), "digits": digits}
+
+def _next_nickname_suffix(db, base: str, digits: int = SUFFIX_DIGITS) -> int | None:
+    """
+    Em UMA consulta, descobre o maior sufixo numérico já usado para `base`
+    ('Base' conta como 1, 'Base 7' como 7). Retorna None se o nome está livre.
+    Sufixos com mais de `digits` dígitos não contam.
+    """
+    where, params = _suffix_filter(base, digits)
+    return db.execute(text(f"""
+        SELECT MAX(CASE WHEN nickname = :base THEN 1
+                        ELSE CAST(substr(nickname, :off) AS INTEGER) END)
+          FROM users {where}
+    """), params).scalar()
+
+def _lowest_free_suffix(db, base: str, digits: int) -> int | None:
+    # caminho raro (MAX+1 não cabe em NICK_MAX): procura o primeiro buraco
+    if digits < 1:
+        return None
+    where, params = _suffix_filter(base, digits)
+    used = {int(n[len(base) + 1:]) for n in db.execute(text(f"SELECT nickname FROM users {where}"), params)
+            .scalars() if n != base}
+    n = 2
+    while n in used:
+        n += 1
+    return n if len(str(n)) <= digits else None
+
 def unique_nickname_human(db, base_name: str) -> str:
     """
     Tenta manter o nome 'bonito' como nickname. Se já existir, anexa um número.
     Ex.: 'Lucas Silva', 'Lucas Silva 2', 'Lucas Silva 3', ...
+    O resultado cabe em NICK_MAX: sem espaço para o número, o nome é encurtado.
     """
-    base = beautify_name(base_name)
-    if not db.get(User, base):
-        return base
-    i = 2
+    base = beautify_name(base_name)[:NICK_MAX].rstrip() or "Jogador"
+    shortened = False
     while True:
-        cand = f"{base} {i}"
-        if not db.get(User, cand):
-            return cand
-        i += 1
+        digits = min(NICK_MAX - len(base) - 1, SUFFIX_DIGITS)
+        top = _next_nickname_suffix(db, base, max(digits, 0))
+        if top is None:
+            if not shortened:
+                return base
+            top = 1      # nome encurtado sempre leva número ('Maria Aparecid 2')
+        if digits >= 1 and len(str(top + 1)) <= digits:
+            return f"{base} {top + 1}"
+        free = _lowest_free_suffix(db, base, digits)
+        if free is not None:
+            return f"{base} {free}"
+        if len(base) <= 1:
+            raise RuntimeError(f"sem nickname livre para {base_name!r}")
+        # abre espaço para pelo menos mais um dígito
+        base = base[:min(len(base) - 1, NICK_MAX - 2)].rstrip() or base[:1]
+        shortened = True
+
+def _insert_ignore_nickname(db, values: dict) -> bool:
+    # INSERT ... ON CONFLICT (nickname) DO NOTHING no dialeto do engine
+    stmt = dialect_insert(db.get_bind())(User).values(**values).on_conflict_do_nothing(index_elements=["nickname"])
+    return db.execute(stmt).rowcount == 1
+
+def create_user_unique_nickname(db, base_name: str, attempts: int = 5, **fields) -> User:
+    """
+    Cria o usuário com o primeiro nickname livre. Se outro callback concorrente
+    pegar o mesmo nome entre a consulta e o INSERT, tenta de novo.
+    """
+    for _ in range(attempts):
+        nick = unique_nickname_human(db, base_name)
+        if _insert_ignore_nickname(db, {"nickname": nick, **fields}):
+            return User(nickname=nick, **fields)
+    raise RuntimeError(f"não foi possível alocar nickname para {base_name!r}")
 
 def next_monday_midnight(dt: datetime | None = None) -> datetime:
     now = dt or datetime.now(TZ)
@@ -139,7 +305,11 @@ def _maybe_reset_week(db):
     meta = db.get(Meta, "last_reset_week")
     if not meta or meta.value != cur:
         # zera acumulado semanal; preserva best_score
+        score_buffer.reset_week()
         db.execute(text("UPDATE leaderboard SET total_points = 0, games_played = 0"))
+        score_hist.rebuild(db, kinds=("total",))
+        score_histogram.invalidate()
+        invalidation_bus.publish(db, "week-reset")
         if meta:
             meta.value = cur
         else:
@@ -156,21 +326,13 @@ def load_email_token(token: str, salt: str, max_age: int = 3600):
     return _ts(salt).loads(token, max_age=max_age)
 
 
-def _parse_sender(sender_str: str):
-    # aceita "Nome <email@dominio>" ou só "email@dominio"
-    name, email = None, None
-    if sender_str:
-        n, e = parseaddr(sender_str)
-        name = n or None
-        email = (e or sender_str).strip()
-    return name, email
-
 def send_email(subject: str, recipients: list[str], html: str, text: str = None) -> bool:
     # 1) Preferir BREVO API (HTTPS) se houver chave
-    api_key = os.getenv("BREVO_API_KEY", "").strip()
+    cfg = settings.current
+    api_key = cfg.brevo_api_key
     if api_key:
         try:
-            name, email = _parse_sender(os.getenv("MAIL_DEFAULT_SENDER", "") or os.getenv("MAIL_USERNAME", ""))
+            name, email = cfg.mail_sender_name, cfg.mail_sender_email
             if not email:
                 raise RuntimeError("MAIL_DEFAULT_SENDER não configurado para API Brevo")
             payload = {
@@ -208,9 +370,8 @@ def send_email(subject: str, recipients: list[str], html: str, text: str = None)
                 html=html,
                 body=text or (re.sub("<[^>]+>", "", html or "") if html else ""),
             )
-            sender_str = os.getenv("MAIL_DEFAULT_SENDER", "") or os.getenv("MAIL_USERNAME", "")
-            if sender_str:
-                msg.sender = sender_str
+            if cfg.mail_sender:
+                msg.sender = cfg.mail_sender
             mail.send(msg)
             return True
         except Exception as e:
@@ -225,20 +386,12 @@ def send_email(subject: str, recipients: list[str], html: str, text: str = None)
 
 @app.before_request
 def maintenance_gate():
-    # ligue/desligue pelo env
-    if os.getenv("MAINTENANCE_MODE", "False").lower() != "true":
+    cfg = settings.current
+    if not cfg.maintenance:
         return
 
     # endpoints livres (assets/health/callback OAuth etc.)
-    allowed = {
-        "static",
-        "healthcheck",            # se você tiver
-        "auth_google",            # sua rota de iniciar OAuth, se quiser liberar
-        "auth_google_cb",         # callback OAuth (às vezes precisa liberar)
-        "__preview_on",
-        "__preview_off",
-    }
-    if request.endpoint in allowed:
+    if request.endpoint in cfg.maintenance_allowed:
         return
 
     # se você tiver login/admin e quiser se autenticar antes de liberar:
@@ -249,15 +402,20 @@ def maintenance_gate():
     if _has_preview_cookie():
         return
 
-    # caso contrário: mostra manutenção
+    # caso contrário: mostra manutenção. Renderizada a cada request (caminho
+    # frio): template e settings podem mudar com o modo ligado; a compressão
+    # fica com o after_request, como nas outras páginas
+    return _render_maintenance(), 503
+
+def _render_maintenance():
     return render_template("maintenance.html",
                            title="Em atualização",
-                           body_class="maintenance"), 503
+                           body_class="maintenance")
 
 @app.get("/__preview_on")
 def __preview_on():
     token = request.args.get("token", "")
-    if token and token == os.getenv("PREVIEW_TOKEN", ""):
+    if token and token == settings.current.preview_token:
         resp = make_response(redirect(url_for("home")))
         # cookie seguro; em dev local pode tirar "secure=True"
         resp.set_cookie(
@@ -278,37 +436,152 @@ def __preview_off():
     return resp
 
 
+# ---------- profiler por request ----------
+# liga com: header X-Profile assinado (python profiler.py token), cookie de
+# preview + ?profile=1, ou PROFILE_SAMPLE_RATE. A resposta traz X-Profile-Id.
+_PROFILE_SKIP = {"static", "leaderboard_stream", "profiles_list", "profiles_get"}
+
+def _profile_authorized():
+    token = request.headers.get("X-Profile")
+    return bool(token) and profiler.check_token(app.secret_key, token)
+
+def _profile_wanted():
+    if _profile_authorized():
+        return True
+    if "profile" in request.args and _has_preview_cookie():
+        return True
+    rate = settings.current.profile_sample_rate
+    return rate > 0 and random.random() < rate
+
+@app.before_request
+def _profile_begin():
+    if request.endpoint in _PROFILE_SKIP or not _profile_wanted():
+        return
+    g.profile_run = request_profiler.begin(f"{request.method}-{request.endpoint}")
+
+@app.after_request
+def _profile_end(resp):
+    run = g.pop("profile_run", None)
+    if run is not None:
+        profile_id = request_profiler.end(run)
+        if profile_id:
+            resp.headers["X-Profile-Id"] = profile_id
+            app.logger.info("[PROFILE] %s", profile_id)
+    return resp
+
+@app.teardown_request
+def _profile_abort(exc):
+    # view levantou exceção: after_request não roda, mas o perfil interessa
+    run = g.pop("profile_run", None)
+    if run is not None:
+        request_profiler.end(run)
+
+@app.get("/__profiles")
+def profiles_list():
+    if not (_profile_authorized() or _has_preview_cookie()):
+        return "Token inválido", 403
+    return jsonify([
+        {
+            "id": pid,
+            "collapsed": url_for("profiles_get", profile_id=pid, fmt="collapsed"),
+            "speedscope": url_for("profiles_get", profile_id=pid, fmt="speedscope"),
+        }
+        for pid in request_profiler.list()
+    ])
+
+@app.get("/__profiles/<profile_id>/<fmt>")
+def profiles_get(profile_id, fmt):
+    if not (_profile_authorized() or _has_preview_cookie()):
+        return "Token inválido", 403
+    path = request_profiler.path(profile_id, fmt)
+    if path is None:
+        return "Perfil não encontrado", 404
+    return send_file(os.path.abspath(path), as_attachment=True,
+                     download_name=os.path.basename(path), max_age=0)
+
+
+VERSION_INFO = {
+    "version": "1.0.4",
+    "released_at": "2025-09-30 01:00:00",  # America/Manaus"
+    "notes": [
+        "Pop-up de novidades",
+        "Página de manutenção",
+        "Correção do reset do ranking semanal",
+        "Sistema de login e cadastro pelo Google ou por email",
+        "Recuperação de senha",
+        "Sistema de e-mails",
+        "Mudanças visuais na página inicial",
+    ],
+    "cta": {"label": "Ver novidades", "action": "#whats-new"},
+}
+
+def _load_version_info() -> dict:
+    # RELEASE_MANIFEST: JSON gerado no build com o mesmo formato de VERSION_INFO
+    path = os.getenv("RELEASE_MANIFEST")
+    if not path:
+        return VERSION_INFO
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError) as e:
+        app.logger.warning(f"[VERSION] manifesto {path} ignorado: {e}")
+        return VERSION_INFO
+
+# serializado, comprimido e com ETag uma vez (muda só a cada release)
+_version_body = Precompressed(json.dumps(_load_version_info(), ensure_ascii=False), "application/json")
+
 @app.get("/version.json")
 def version_json():
-    payload = {
-        "version": "1.0.4",
-        "released_at": "2025-09-30 01:00:00",  # America/Manaus"
-        "notes": [
-            "Pop-up de novidades",
-            "Página de manutenção",
-            "Correção do reset do ranking semanal",
-            "Sistema de login e cadastro pelo Google ou por email",
-            "Recuperação de senha",
-            "Sistema de e-mails",
-            "Mudanças visuais na página inicial",
-        ],
-        "cta": {"label": "Ver novidades", "action": "#whats-new"},
-    }
-    resp = make_response(jsonify(payload))
-    # Evita cache agressivo do navegador/CDN
-    resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-    resp.headers["Pragma"] = "no-cache"
-    resp.headers["Expires"] = "0"
+    resp = _version_body.response()
+    # o navegador guarda, mas revalida sempre (If-None-Match → 304 sem corpo)
+    resp.headers["Cache-Control"] = "no-cache"
     return resp
 
 login_manager = LoginManager(app)
 login_manager.login_view = "login"   # rota que mostra tela de login quando exige auth
 
 # Carrega usuário por id (no nosso caso, 'nickname')
+_USER_FIELDS = ("nickname", "email", "google_id", "facebook_id", "is_active", "avatar_url")
+
+def _prefetch_qid():
+    # /game: a pergunta que a página vai mostrar entra no mesmo round-trip do usuário
+    if request.endpoint != "game":
+        return None
+    fb = session.get("feedback_state") if request.args.get("fb") == "1" else None
+    qid = fb["qid"] if fb else session.get("current_qid")
+    return qid if qid is not None and qid not in question_cache else None
+
 @login_manager.user_loader
 def load_user(user_id: str):
+    wanted = {"user": [user_id]}
+    qid = _prefetch_qid()
+    if qid is not None:
+        wanted["q"] = [qid]
+    found = shared_cache.get_multi(wanted)
+    if qid is not None:
+        g.q_prefetched = qid
+        if qid in found["q"]:
+            question_cache.put(found["q"][qid])
+    data = found["user"].get(user_id)
+    if data is not None:
+        # objeto desanexado só para leitura (sem hash de senha no cache)
+        return User(**data)
     with db_readonly() as db:
-        return db.get(User, user_id)
+        user = db.get(User, user_id)
+    if user is not None:
+        shared_cache.set("user", user_id, {f: getattr(user, f) for f in _USER_FIELDS})
+    return user
+
+def _forget_user(db, *nicknames):
+    # depois do commit (um leitor no meio não recoloca a versão antiga no cache);
+    # os caches locais dos outros workers são limpos pelo barramento
+    nicks = set(nicknames)
+    invalidation_bus.publish(db, *(f"user:{n}" for n in nicks))
+
+    @event.listens_for(db, "after_commit", once=True)
+    def _drop(_session):
+        for nick in nicks:
+            shared_cache.delete("user", nick)
     
 
 @app.get("/login")
@@ -329,10 +602,33 @@ def login_email():
 
     with db_readonly() as db:
         user = db.query(User).filter(User.email == email).first()
-    if not user or not user.password_hash or not check_password_hash(user.password_hash, password):
+    try:
+        ok = bool(user and user.password_hash and verify_password(user.password_hash, password))
+    except HashingBusy:
+        flash("Servidor ocupado, tente novamente em instantes.", "warn")
+        return redirect(url_for("login"))
+    if not ok:
         flash("Credenciais inválidas.", "error")
         return redirect(url_for("login"))
 
+    # hash com parâmetros antigos → regrava com o custo atual (senha já validada),
+    # sem o request esperar; fila cheia fica para o próximo login
+    if needs_rehash(user.password_hash):
+        nickname, old_hash = user.nickname, user.password_hash
+
+        def _store_rehash(new_hash):
+            try:
+                with db_session() as db:
+                    db.execute(
+                        text("UPDATE users SET password_hash = :h WHERE nickname = :n AND password_hash = :old"),
+                        {"h": new_hash, "n": nickname, "old": old_hash},
+                    )
+                    _forget_user(db, nickname)
+            except Exception as e:
+                app.logger.warning(f"[HASH] rehash falhou para {nickname}: {e}")
+
+        hash_password_later(password, _store_rehash)
+
     login_user(user, remember=remember)
     flash(f"Bem-vindo(a), {user.nickname}!", "ok")
     return redirect(url_for("home"))
@@ -369,21 +665,27 @@ def register_post():
             flash("Este e-mail já está cadastrado.", "error")
             return redirect(url_for("register"))
 
-        t0 = time.perf_counter()
+        try:
+            pwhash = hash_password(pw1)
+        except HashingBusy:
+            flash("Servidor ocupado, tente novamente em instantes.", "warn")
+            return redirect(url_for("register"))
+
+        t0 = perf_counter()
         user = User(
             nickname=nickname,
             email=email,
-            password_hash=generate_password_hash(pw1),
+            password_hash=pwhash,
             # avatar_url pode ser preenchido depois (login Google) ou por foto default
         )
         db.add(user)
         db.commit()
         db.refresh(user)
-        t1 = time.perf_counter()
+        t1 = perf_counter()
 
         html = render_template("emails/welcome.html", nickname=nickname)
 
-        t2 = time.perf_counter()
+        t2 = perf_counter()
 
         # Enviar e-mail de boas-vindas
         @copy_current_request_context
@@ -407,7 +709,7 @@ def register_post():
 @app.get("/auth/google")
 def auth_google():
     session["post_auth_next"] = request.args.get("next", "")
-    redirect_uri = url_for("auth_google_cb", _external=True, _scheme=os.getenv("PREFERRED_URL_SCHEME", "https"))
+    redirect_uri = url_for("auth_google_cb", _external=True, _scheme=settings.current.preferred_url_scheme)
     resp = oauth.google.authorize_redirect(redirect_uri)
     try:
         app.logger.info("SESSION KEYS BEFORE REDIRECT: %s", list(session.keys()))
@@ -419,10 +721,14 @@ def auth_google():
 @app.get("/auth/google/callback")
 def auth_google_cb():
     try:
-        _ = oauth.google.authorize_access_token()
-        resp = oauth.google.get("https://openidconnect.googleapis.com/v1/userinfo")
-        userinfo = resp.json() if resp else {}
-        app.logger.info(f"[GOOGLE] userinfo: {userinfo}")
+        token = oauth.google.authorize_access_token()
+        # claims do id_token (assinatura/aud/iss/nonce já verificados pelo Authlib)
+        userinfo = dict(token.get("userinfo") or {})
+        if not claims_complete(userinfo):
+            # só vai ao endpoint userinfo se o id_token não trouxe o essencial
+            resp = oauth.google.userinfo(token=token)
+            userinfo = {**(resp or {}), **userinfo}
+        app.logger.debug("[GOOGLE] login sub=%s", userinfo.get("sub"))
     except Exception as e:
         app.logger.exception("Falha no OAuth Google: %s", e)
         flash("Falha ao autenticar com o Google. Tente novamente.", "error")
@@ -439,16 +745,15 @@ def auth_google_cb():
             user = db.query(User).filter(User.email == email).first()
 
         if not user:
-            nick = unique_nickname_human(db, display_name)
-            user = User(
-                nickname=nick,
+            user = create_user_unique_nickname(
+                db, display_name,
                 email=email,
                 google_id=sub,
                 is_active=True,
-                avatar_url=picture,            
+                avatar_url=picture,
             )
-            db.add(user)
         else:
+            old_nick = user.nickname
             if not user.google_id:
                 user.google_id = sub
             if email and not user.email:
@@ -459,6 +764,8 @@ def auth_google_cb():
                 user.nickname = new_nick
             if picture:
                 user.avatar_url = picture
+            if db.is_modified(user):
+                _forget_user(db, old_nick, user.nickname)
 
     login_user(user)
     flash(f"Olá, {user.nickname}!", "ok")
@@ -512,13 +819,21 @@ def reset_password(token):
         return redirect(url_for("forgot_password"))
 
     email = data.get("email")
+    # hash calculado antes de abrir a sessão para não segurar conexão do pool
+    try:
+        pwhash = hash_password(pw1)
+    except HashingBusy:
+        flash("Servidor ocupado, tente novamente em instantes.", "warn")
+        return redirect(request.url)
+
     with db_session() as db:
         user = db.execute(select(User).where(User.email == email)).scalar_one_or_none()
         if not user:
             flash("Usuário não encontrado.", "error")
             return redirect(url_for("login"))
-        user.password_hash = generate_password_hash(pw1)
+        user.password_hash = pwhash
         db.add(user)
+        _forget_user(db, user.nickname)
         db.commit()
         try:
             html = render_template("emails/password_changed.html", nickname=user.nickname)
@@ -538,23 +853,42 @@ def do_logout():
     return redirect(url_for("login", notice="logout"))
 
 
+db_router = ReplicaRouter(SessionLocal, ReplicaSessionLocal, replica_engine, logger=app.logger)
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _track_writes(state):
+    if not state.is_select:
+        state.session.info["wrote"] = True
+
 @contextmanager
 def db_session():
     db = SessionLocal()
     try:
         yield db
+        wrote = bool(db.info.get("wrote") or db.new or db.dirty or db.deleted)
         db.commit()
     except Exception:
         db.rollback()
         raise
     finally:
         db.close()
+    # read-your-writes: por alguns segundos, as leituras deste usuário vão ao primário
+    if wrote and db_router.enabled and has_request_context():
+        session["rw_until"] = int(unix_time() + STICKY_SECONDS) + 1
 
 @contextmanager
 def db_readonly():
-    db = SessionLocal()
+    factory, on_replica = db_router.factory_for(
+        session.get("rw_until", 0) if has_request_context() else 0
+    )
+    db = factory()
     try:
         yield db
+    except DBAPIError as e:
+        # só falha de conexão/servidor tira a réplica; erro de SQL é do chamador
+        if on_replica and (isinstance(e, OperationalError) or e.connection_invalidated):
+            db_router.mark_failed()
+        raise
     finally:
         db.close()
 
@@ -607,6 +941,8 @@ def _next_qid_from_queue():
         if cand not in asked:
             session["current_qid"] = cand
             session["current_token"] = secrets.token_urlsafe(16)
+            session["current_shown_at"] = int(unix_time() * 1000)
+            question_stats.shown(cand)
             return cand
     return None
 
@@ -632,6 +968,89 @@ def _load_ranking(db):
         for (n, b, t, g) in res
     ]
 
+def _flush_scores(batch: dict):
+    # um único upsert multi-linha; ordem por nickname evita deadlock entre workers
+    rows = [
+        {"nickname": n, "best_score": b, "total_points": t, "games_played": g}
+        for n, (b, t, g) in sorted(batch.items())
+    ]
+    with db_session() as db:
+        insert = dialect_insert(db.get_bind())
+        # nickname novo entra antes, zerado: o INSERT trava a chave e um flush
+        # concorrente do mesmo nickname espera o commit e o vê como existente.
+        # Só o que ESTE flush inseriu conta como novo no histograma
+        created = set()
+        for i in range(0, len(rows), 200):
+            created.update(db.execute(
+                insert(Leaderboard)
+                .values([{"nickname": r["nickname"], "best_score": 0, "total_points": 0, "games_played": 0}
+                         for r in rows[i:i + 200]])
+                .on_conflict_do_nothing(index_elements=[Leaderboard.nickname])
+                .returning(Leaderboard.nickname)
+            ).scalars())
+        # valores atuais (travados até o commit) para mover as contagens do histograma
+        old = {}
+        for i in range(0, len(rows), 200):
+            nicks = [r["nickname"] for r in rows[i:i + 200]]
+            for n, b, t in db.execute(
+                select(Leaderboard.nickname, Leaderboard.best_score, Leaderboard.total_points)
+                .where(Leaderboard.nickname.in_(nicks))
+                .order_by(Leaderboard.nickname)
+                .with_for_update()
+            ).all():
+                old[n] = (b, t)
+        moves = {}
+        for r in rows:
+            prev = None if r["nickname"] in created else old.get(r["nickname"])
+            new = (max(prev[0], r["best_score"]), prev[1] + r["total_points"]) if prev \
+                else (r["best_score"], r["total_points"])
+            for k, d in score_hist.moves_for(prev, new).items():
+                moves[k] = moves.get(k, 0) + d
+
+        for i in range(0, len(rows), 200):  # limite de parâmetros do SQLite
+            stmt = insert(Leaderboard).values(rows[i:i + 200])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Leaderboard.nickname],
+                set_={
+                    "best_score": case(
+                        (stmt.excluded.best_score > Leaderboard.best_score, stmt.excluded.best_score),
+                        else_=Leaderboard.best_score,
+                    ),
+                    "total_points": Leaderboard.total_points + stmt.excluded.total_points,
+                    "games_played": Leaderboard.games_played + stmt.excluded.games_played,
+                },
+            )
+            db.execute(stmt)
+        score_hist.apply_moves(db, moves)
+        invalidation_bus.publish(db, "leaderboard:best", "leaderboard:total")
+    # só depois do commit: assinantes SSE não podem ver um top que ainda pode voltar atrás
+    with SessionLocal() as db:
+        _publish_top(db)
+    score_histogram.invalidate()
+    shared_cache.delete("lb", "best")
+    shared_cache.delete("lb", "total")
+
+score_buffer = ScoreAggregator(_flush_scores, logger=app.logger)
+
+def _beat_pct(score: int, old_best: int | None) -> int | None:
+    """
+    % de jogadores com best_score abaixo desta partida (pelos 51 contadores).
+    `old_best`: o recorde já GRAVADO no banco (o que o histograma conhece);
+    None se o jogador ainda não está lá, mesmo que tenha algo no buffer.
+    """
+    counts = score_histogram.counts()["best"]
+    bucket = score_hist.bucket_of("best", score)
+    beaten = sum(counts[:bucket])
+    total = sum(counts)
+    if old_best is None:
+        total += 1                 # o jogador ainda não está no histograma
+    elif old_best < score:
+        beaten -= 1                # não conta a si mesmo
+    others = total - 1
+    if others <= 0:
+        return None
+    return round(100 * max(beaten, 0) / others)
+
 def _find_position(rows, nickname):
     for i, r in enumerate(rows, start=1):
         if r["nickname"] == nickname:
@@ -666,10 +1085,13 @@ def start():
 
     theme = random.choice(THEMES)
 
-    # Carrega todos os IDs do tema e embaralha
-    with db_readonly() as db:
-        ids = [row[0] for row in db.query(Question.id).filter(Question.theme == theme).all()]
-    random.shuffle(ids)
+    # Baralho fácil → difícil a partir das faixas em memória
+    ids = deck_sampler.deck(theme)
+    if ids is None:
+        # faixas ainda não carregadas (logo após o boot): todos os IDs do tema, embaralhados
+        with db_readonly() as db:
+            ids = [row[0] for row in db.query(Question.id).filter(Question.theme == theme).all()]
+        random.shuffle(ids)
 
     # Estado inicial da partida
     session.update(
@@ -678,15 +1100,41 @@ def start():
         asked_ids=[],
         score=0,
         queue_ids=ids,
+        started_at=int(unix_time() * 1000),
     )
 
     # LIMPE estados de rodada/pergunta
-    for k in ("roulette_shown", "current_qid", "current_token", "ended", "feedback_state"):
+    for k in ("roulette_shown", "current_qid", "current_token", "ended", "feedback_state", "missed_qid"):
         session.pop(k, None)
 
     return redirect(url_for("game"))
 
 
+@app.get("/battle")
+@login_required
+def battle():
+    # o jogo 1v1 roda no sidecar asyncio (battle.py); aqui só emitimos o ticket
+    ws_url = settings.current.battle_ws_url
+    # tema escolhido vai na mensagem de entrada; a fila é separada por tema
+    theme = request.args.get("theme", "")
+    if theme not in THEMES:
+        theme = ""
+    with db_readonly() as db:
+        skill = db.execute(
+            select(Leaderboard.best_score).where(Leaderboard.nickname == current_user.nickname)
+        ).scalar() or 0
+    return render_template(
+        "battle.html",
+        ticket=make_battle_ticket(app.secret_key, current_user.nickname, skill),
+        ws_url=ws_url,
+        nickname=current_user.nickname,
+        theme=theme,
+        themes=THEMES,
+        body_class="game",
+        title="Batalha",
+    )
+
+
 @app.get("/game")
 @login_required
 def game():
@@ -706,7 +1154,7 @@ def game():
         fb = session.get("feedback_state")
         if fb:
             with db_readonly() as db:
-                q = db.get(Question, fb["qid"])
+                q = question_cache.get(db, fb["qid"], ask_shared=g.get("q_prefetched") != fb["qid"])
             score = len(asked_ids)
             session.pop("feedback_state", None)
             return render_template(
@@ -733,7 +1181,7 @@ def game():
         return redirect(url_for("end", reason="completou"))
 
     with db_readonly() as db:
-        q = db.get(Question, qid)
+        q = question_cache.get(db, qid, ask_shared=g.get("q_prefetched") != qid)
     if not q:
         # (raro) se id “órfão”, tenta novamente
         return redirect(url_for("game"))
@@ -775,6 +1223,13 @@ def answer():
     timed_out   = (picked == "TIMEOUT")
     was_correct = (picked == correct) and not timed_out
 
+    shown_at = session.pop("current_shown_at", None)
+    question_stats.answered(
+        qid,
+        "timeout" if timed_out else ("correct" if was_correct else "wrong"),
+        int(unix_time() * 1000) - shown_at if shown_at else None,
+    )
+
     # CONSUME a pergunta (remove da fila) e limpa instância
     queue = session.get("queue_ids") or []
     try:
@@ -789,6 +1244,8 @@ def answer():
     if was_correct and (qid not in asked):
         asked.append(qid)
         session["asked_ids"] = asked
+    elif not was_correct:
+        session["missed_qid"] = qid     # entra no histórico da partida (ver end)
 
     session["feedback_state"] = {
         "qid": qid,
@@ -815,10 +1272,15 @@ def go_next():
     return redirect(url_for("game"))
 
 
+# motivos de fim que o /continue e o /game geram; qualquer outro vira ""
+END_REASONS = frozenset({"wrong", "timeout", "completou"})
+
 @app.get("/end")
 @login_required
 def end():
     reason   = request.args.get("reason", "")
+    if reason not in END_REASONS:
+        reason = ""            # vai para o histórico: nada de texto arbitrário da URL
     nickname = session.get("nickname")
     score    = len(session.get("asked_ids") or [])
     if not nickname:
@@ -827,47 +1289,56 @@ def end():
     with db_session() as db:
         _maybe_reset_week(db)
 
-        rows_before = _load_ranking(db)  # lista de dicts
-        existed     = any(r["nickname"] == nickname for r in rows_before)
-        old_pos     = _find_position(rows_before, nickname)
-
-        if score > 0:
-            db.execute(text("""
-                INSERT INTO leaderboard (nickname, best_score, total_points, games_played)
-                VALUES (:nick, :score, :score, 1)
-                ON CONFLICT(nickname) DO UPDATE SET
-                  best_score = CASE
-                      WHEN EXCLUDED.best_score > leaderboard.best_score
-                      THEN EXCLUDED.best_score ELSE leaderboard.best_score END,
-                  total_points = leaderboard.total_points + EXCLUDED.total_points,
-                  games_played = leaderboard.games_played + EXCLUDED.games_played
-            """), {"nick": nickname, "score": score})
-
-            if score >= 50:
-                u = db.get(User, nickname)
-                if u:
-                    u.has_perfect_medal = True
+        # histórico + agregados do perfil, uma vez por partida (refresh do /end não regrava)
+        started_at = session.pop("started_at", None)
+        if started_at is not None:
+            now_ms = int(unix_time() * 1000)
+            qids = list(session.get("asked_ids") or [])
+            missed = session.get("missed_qid")
+            if missed is not None and missed not in qids:
+                qids.append(missed)
+            match_history.record(db, nickname, session.get("theme") or "", score, qids,
+                                 now_ms - started_at, reason, now_ms, TZ)
 
         if score == 0:
             # LIMPA estado da rodada ANTES de retornar
-            for k in ("asked_ids","current_qid","current_token","ended","roulette_shown","feedback_state"):
+            for k in ("asked_ids","current_qid","current_token","ended","roulette_shown","feedback_state","missed_qid"):
                 session.pop(k, None)
 
             return render_template("end.html",
                                    score=score, perfect=False, reason=reason,
                                    title="Fim da partida", body_class="end")
 
-        rows_after = _load_ranking(db)
-        new_pos    = _find_position(rows_after, nickname)
+        ranking = _load_ranking(db)  # lista de dicts (sem o que ainda está no buffer)
+
+        if score >= 50:
+            u = db.get(User, nickname)
+            if u:
+                u.has_perfect_medal = True
+
+    # o upsert no leaderboard é feito em lote pelo score_buffer; a posição do
+    # jogador é calculada lendo através do buffer pendente
+    rows_before = score_buffer.overlay(ranking)
+    existed     = any(r["nickname"] == nickname for r in rows_before)
+    old_pos     = _find_position(rows_before, nickname)
+
+    score_buffer.add(nickname, score)
+
+    rows_after = score_buffer.overlay(ranking)
+    new_pos    = _find_position(rows_after, nickname)
+    # o histograma só conhece o que já foi gravado: o recorde vem do banco, não do overlay
+    stored     = next((r["best_score"] for r in ranking if r["nickname"] == nickname), None)
+    beat_pct   = _beat_pct(score, stored)
 
     # LIMPA estado da rodada antes dos returns seguintes
-    for k in ("asked_ids","current_qid","current_token","ended","roulette_shown","feedback_state"):
+    for k in ("asked_ids","current_qid","current_token","ended","roulette_shown","feedback_state","missed_qid"):
         session.pop(k, None)
 
     if not existed:
         return render_template("leaderboard.html",
                                rows=rows_after[:50],
                                just_added=nickname,
+                               beat_pct=beat_pct,
                                body_class="rank", title="Ranking")
 
     moved_up = (old_pos is not None and new_pos is not None and new_pos < old_pos)
@@ -877,50 +1348,359 @@ def end():
                                promoted_nick=nickname,
                                positions_up=(old_pos - new_pos),
                                new_rank=new_pos,
+                               beat_pct=beat_pct,
                                body_class="rank", title="Ranking")
 
     return render_template("end.html",
-                           score=score, perfect=(score >= 50),
+                           score=score, perfect=(score >= 50), beat_pct=beat_pct,
                            reason=reason, title="Fim da partida", body_class="end")
 
 
+LEADERBOARD_PAGE = 10
+AROUND_ME = 5
+
+def _score_col(mode: str):
+    # colunas NOT NULL: sem coalesce, para o índice (score DESC, nickname) ser usado
+    return Leaderboard.best_score if mode == "best" else Leaderboard.total_points
+
+def _top_rows(db, mode: str, limit: int = LEADERBOARD_PAGE, after: tuple[int, str] | None = None):
+    """Página do ranking por keyset: tudo que vem depois de (score, nickname)."""
+    col = _score_col(mode)
+    stmt = select(Leaderboard).where(col > 0)
+    if after:
+        score, nick = after
+        stmt = stmt.where(or_(col < score, and_(col == score, Leaderboard.nickname > nick)))
+    return db.execute(
+        stmt.order_by(col.desc(), Leaderboard.nickname.asc()).limit(limit)
+    ).scalars().all()
+
+def _rows_before(db, mode: str, score: int, nick: str, limit: int):
+    """As `limit` linhas imediatamente acima de (score, nickname), na ordem do ranking."""
+    col = _score_col(mode)
+    rows = db.execute(
+        select(Leaderboard)
+        .where(or_(col > score, and_(col == score, Leaderboard.nickname < nick)))
+        .order_by(col.asc(), Leaderboard.nickname.desc())
+        .limit(limit)
+    ).scalars().all()
+    return rows[::-1]
+
+def _rank_of(db, mode: str, score: int, nick: str) -> int:
+    """
+    Posição de (score, nickname) no ranking: os contadores do histograma das
+    faixas acima da do jogador + uma contagem só dentro da faixa dele. O custo
+    não cresce com a posição (o histograma pode estar até SCORE_HIST_TTL atrás).
+    """
+    col = _score_col(mode)
+    bucket = score_hist.bucket_of(mode, score)
+    above = sum(score_histogram.counts()[mode][bucket + 1:])
+    lo, hi = score_hist.bucket_range(mode, bucket)
+    stmt = (select(func.count()).select_from(Leaderboard)
+            .where(col >= lo, or_(col > score, and_(col == score, Leaderboard.nickname < nick))))
+    if hi is not None:
+        stmt = stmt.where(col < hi)
+    return 1 + above + db.execute(stmt).scalar()
+
+def _parse_after(raw: str | None):
+    # cursor "score,nickname" (o nickname pode ter vírgula: só a primeira separa)
+    if not raw or "," not in raw:
+        return None
+    score, nick = raw.split(",", 1)
+    # as colunas são INTEGER: número fora da faixa estouraria o parâmetro do banco
+    if not score.isdigit() or len(score) > 9:
+        return None
+    return int(score), nick
+
+def _cursor(mode: str, row) -> str:
+    return f"{row.best_score if mode == 'best' else row.total_points},{row.nickname}"
+
+def _hub_rows(mode: str, rows):
+    if mode == "best":
+        return [(r.nickname, r.best_score or 0, r.games_played or 0) for r in rows]
+    return [(r.nickname, r.total_points or 0, r.games_played or 0) for r in rows]
+
+def _publish_top(db):
+    # o hub só recebe leituras do primário feitas depois do commit: cópia em
+    # cache (shm, "lb") ou réplica atrasada faria o ranking ao vivo voltar atrás
+    for mode in ("total", "best"):
+        leaderboard_hub.observe(mode, _hub_rows(mode, _top_rows(db, mode, leaderboard_hub.top_n)))
+
+def _refresh_shared_top():
+    # só o worker escritor roda isto (WriterLoop); página 1 dos dois modos
+    with SessionLocal() as db:
+        shared_top.publish({
+            mode: [(r.nickname, r.best_score, r.total_points, r.games_played)
+                   for r in _top_rows(db, mode, LEADERBOARD_PAGE + 1)]
+            for mode in ("total", "best")
+        })
+
+shared_top_writer = (shm_cache.WriterLoop(shm_writer, shm_cache.TOP_REFRESH, _refresh_shared_top,
+                                          "top", logger=app.logger)
+                     if shared_top is not None else None)
+
+def _first_page_shared(mode: str):
+    # read-your-writes: quem acabou de escrever lê do banco
+    if unix_time() < session.get("rw_until", 0):
+        return None
+    if shared_top is not None:
+        shared_top_writer.start()
+        rows = shared_top.rows(mode, max_age=shm_cache.TOP_REFRESH * 5)
+        if rows is not None:
+            return rows
+    return shared_cache.get("lb", mode)
+
+@app.get("/leaderboard/stream")
+@login_required
+def leaderboard_stream():
+    if not leaderboard_hub.seeded():
+        # worker que ainda não publicou nada: o snapshot inicial vem do primário
+        with SessionLocal() as db:
+            _publish_top(db)
+    sub = leaderboard_hub.subscribe(request.headers.get("Last-Event-ID"))
+    if sub is None:
+        # threads deste worker já ocupados com SSE: 204 faz o EventSource desistir
+        # e a página passa a consultar /leaderboard/top
+        return "", 204
+    resp = Response(stream_with_context(sub), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"  # evita buffer em proxies (nginx/Railway)
+    return resp
+
+@app.get("/leaderboard/top")
+@login_required
+def leaderboard_top():
+    """Top N de um modo em JSON: fallback da página quando não há vaga de SSE."""
+    mode = request.args.get("mode", "total")
+    if mode not in ("total", "best"):
+        mode = "total"
+    rows = _first_page_shared(mode)
+    if rows is None:
+        with db_readonly() as db:
+            rows = _top_rows(db, mode, leaderboard_hub.top_n)
+    rows = _hub_rows(mode, rows[:leaderboard_hub.top_n])
+    resp = jsonify({"m": mode, "rows": rows})
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+@app.get("/profile")
+@app.get("/profile/<nickname>")
+@login_required
+def profile(nickname=None):
+    nickname = nickname or current_user.nickname
+    with db_readonly() as db:
+        stats = match_history.profile(db, nickname, datetime.now(TZ).date().toordinal())
+    recent = []
+    for m in (stats or {}).get("recent", ()):
+        m["played_at"] = datetime.fromtimestamp(m["played_at"] / 1000, TZ)
+        recent.append(m)
+    return render_template("profile.html", nickname=nickname, stats=stats, recent=recent,
+                           own=(nickname == current_user.nickname),
+                           body_class="rank", title="Perfil")
+
 @app.get("/leaderboard")
 @login_required
 def leaderboard():
     mode = request.args.get("mode", "total")
     if mode not in ("total", "best"):
         mode = "total"
+    after = _parse_after(request.args.get("after"))
+    # posição do 1º item da página vem no link (evita COUNT(*) em páginas fundas)
+    rank_offset = max(request.args.get("pos", 0, type=int), 0) if after else 0
 
     with db_session() as db:
         _maybe_reset_week(db)
 
-        if mode == "best":
-            order_cols = (
-                func.coalesce(Leaderboard.best_score, 0).desc(),
-                Leaderboard.nickname.asc(),
-            )
-            where_cond = (func.coalesce(Leaderboard.best_score, 0) > 0)
-        else:  # total (semanal acumulado)
-            order_cols = (
-                func.coalesce(Leaderboard.total_points, 0).desc(),
-                Leaderboard.nickname.asc(),
-                
-            )
-            where_cond = (func.coalesce(Leaderboard.total_points, 0) > 0)
-
-        rows = db.execute(
-            select(Leaderboard).where(where_cond).order_by(*order_cols).limit(10)
-        ).scalars().all()
-
+    rows = None if after else _first_page_shared(mode)
+    if rows is None:
+        # leitura pode ir para a réplica (o reset acima já marcou quem escreveu)
+        with db_readonly() as db:
+            rows = _top_rows(db, mode, LEADERBOARD_PAGE + 1, after)
+        if not after:
+            rows = [shm_cache.TopRow(r.nickname, r.best_score, r.total_points, r.games_played) for r in rows]
+            shared_cache.set("lb", mode, rows)
+    has_next = len(rows) > LEADERBOARD_PAGE
+    rows = rows[:LEADERBOARD_PAGE]
 
     deadline = next_monday_midnight()
     deadline_ms = int(deadline.timestamp() * 1000)
+    dist = None if after else score_hist.chart(mode, score_histogram.counts()[mode])
 
     return render_template(
         "leaderboard.html",
         rows=rows, body_class="rank", title="Ranking",
-        deadline_ms=deadline_ms, mode=mode
+        deadline_ms=deadline_ms, mode=mode, dist=dist,
+        rows_live=_hub_rows(mode, rows) if not after else None,
+        rank_offset=rank_offset,
+        next_after=_cursor(mode, rows[-1]) if has_next else None,
+        next_pos=rank_offset + len(rows),
     )
 
+@app.get("/leaderboard/me")
+@login_required
+def leaderboard_me():
+    """K linhas acima e abaixo do jogador, por consultas de intervalo no índice."""
+    mode = request.args.get("mode", "total")
+    if mode not in ("total", "best"):
+        mode = "total"
+    nickname = current_user.nickname
+
+    with db_readonly() as db:
+        me = db.get(Leaderboard, nickname)
+        score = (me.best_score if mode == "best" else me.total_points) if me else 0
+        if not me or score <= 0:
+            above, below, rank_offset = [], [], None
+        else:
+            above = _rows_before(db, mode, score, nickname, AROUND_ME)
+            below = _top_rows(db, mode, AROUND_ME, (score, nickname))
+            rank_offset = _rank_of(db, mode, score, nickname) - len(above) - 1
+
+    rows = above + ([me] if me and score > 0 else []) + below
+    return render_template(
+        "leaderboard.html",
+        rows=rows, body_class="rank", title="Ranking",
+        mode=mode, around_me=nickname, rank_offset=rank_offset,
+        deadline_ms=int(next_monday_midnight().timestamp() * 1000),
+    )
+
+# ---------- invalidação vinda de outros workers/nós ----------
+_hub_refreshed = {}
+_hub_pending = set()
+_hub_lock = threading.Lock()
+
+def _drop_local(ns, key=None):
+    # backend compartilhado já foi limpo por quem publicou; local e fake:// são um por worker
+    if not shared_cache.backend.shared:
+        shared_cache.delete(ns, key)
+
+def _on_question(key):
+    qid = int(key) if key and key.isdigit() else None
+    question_cache.invalidate(qid)
+    _drop_local("q", qid)
+
+def _on_user(key):
+    _drop_local("user", key)
+
+def _refresh_hub(mode):
+    with _hub_lock:
+        _hub_pending.discard(mode)
+        _hub_refreshed[mode] = unix_time()
+    try:
+        # o evento só chega depois do commit de quem publicou; lê do primário
+        with SessionLocal() as db:
+            leaderboard_hub.observe(mode, _hub_rows(mode, _top_rows(db, mode, leaderboard_hub.top_n)))
+    except Exception as e:
+        app.logger.warning(f"[SSE] top {mode}: {e}")
+
+def _on_leaderboard(key):
+    score_histogram.invalidate()
+    _drop_local("lb", key if key in ("best", "total") else None)
+    # SSE dos clientes ligados a este worker: no máximo uma consulta por segundo
+    # por modo; evento dentro da janela agenda uma leitura no fim dela (não se perde)
+    for mode in ((key,) if key in ("best", "total") else ("best", "total")):
+        with _hub_lock:
+            if mode in _hub_pending:
+                continue
+            wait = _hub_refreshed.get(mode, 0) + 1 - unix_time()
+            if wait > 0:
+                _hub_pending.add(mode)
+                t = threading.Timer(wait, _refresh_hub, (mode,))
+                t.daemon = True
+                t.start()
+                continue
+        _refresh_hub(mode)
+
+def _on_week_reset(_key):
+    # o acumulado pendente neste worker é da semana que acabou
+    score_buffer.reset_week()
+    score_histogram.invalidate()
+
+invalidation_bus.subscribe("question", _on_question)
+invalidation_bus.subscribe("user", _on_user)
+invalidation_bus.subscribe("leaderboard", _on_leaderboard)
+invalidation_bus.subscribe("week-reset", _on_week_reset)
+
+# ---------- estado aquecido / fork ----------
+STATIC_MANIFEST = {}
+
+@app.url_defaults
+def _static_version(endpoint, values):
+    # ?v=<hash> do manifesto: cache longo no navegador, invalida a cada deploy
+    if endpoint == "static" and "v" not in values:
+        v = STATIC_MANIFEST.get(values.get("filename"))
+        if v:
+            values["v"] = v
+
+@app.after_request
+def _static_cache(resp):
+    # URL com o ?v= do manifesto atual nunca muda de conteúdo: cache de 1 ano;
+    # sem ?v= (ou com hash velho) fica o padrão do Flask (revalida)
+    if request.endpoint == "static" and resp.status_code == 200:
+        v = request.args.get("v")
+        if v and v == STATIC_MANIFEST.get((request.view_args or {}).get("filename")):
+            resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return resp
+
+def _build_static_manifest() -> dict:
+    out = {}
+    root = app.static_folder
+    for dirpath, _dirs, files in os.walk(root):
+        for name in files:
+            path = os.path.join(dirpath, name)
+            with open(path, "rb") as fh:
+                digest = hashlib.blake2b(fh.read(), digest_size=4).hexdigest()
+            out[os.path.relpath(path, root).replace(os.sep, "/")] = digest
+    return out
+
+def warm_state():
+    """Estado imutável montado uma vez por processo (no master, com --preload)."""
+    global STATIC_MANIFEST
+    t0 = perf_counter()
+    try:
+        n = question_cache.load()
+    except Exception as e:
+        n = 0
+        app.logger.warning(f"[WARM] perguntas: {e}")
+    # compila todos os templates (ficam no cache do Jinja; do disco, se já houver bytecode)
+    templates = len(jinja_cache.compile_all(app))
+    STATIC_MANIFEST = _build_static_manifest()
+    app.logger.info("[WARM] %d perguntas, %d templates, %d estáticos em %.0f ms",
+                    n, templates, len(STATIC_MANIFEST), (perf_counter() - t0) * 1000)
+
+def start_background():
+    # threads por processo (cada uma também se recria sozinha após fork)
+    deck_sampler.start()
+    score_buffer.start()         # recupera spills de workers mortos já no boot
+    settings.start()
+    invalidation_bus.start()
+    if shared_top_writer is not None:
+        shared_top_writer.start()
+
+def after_fork():
+    """Chamado no worker logo após o fork (post_fork do gunicorn.conf.py)."""
+    # conexões abertas no master não podem ser usadas pelo filho:
+    # close=False descarta o pool sem fechar os sockets do pai
+    engine.dispose(close=False)
+    if replica_engine is not None:
+        replica_engine.dispose(close=False)
+    # HUP no master recria os workers sem reimportar o app: relê o .env aqui
+    # para o snapshot de settings (o resto exige reiniciar o master)
+    settings.reload()
+    start_background()
+
+if __name__ == "__mp_main__":
+    # `python app.py`: o forkserver do pool de hash (hashing.py) reimporta este
+    # arquivo como __mp_main__; lá não sobe estado aquecido nem threads
+    pass
+elif PRELOAD:
+    warm_state()
+    # o master não fica com conexões abertas para herdar
+    engine.dispose()
+    if replica_engine is not None:
+        replica_engine.dispose()
+else:
+    warm_state()
+    start_background()
+
 if __name__ == "__main__":
+    settings.install_sighup()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,326 @@
+# battle.py
+# Modo 1v1 ("batalha"): sidecar asyncio + WebSocket, separado do Flask.
+#
+# Um único event loop conduz todas as salas. Cada sala guarda só o baralho
+# (ids), o índice da rodada e um handle de timer (loop.call_later), sem
+# task/thread por jogador. As perguntas ficam em memória e a resposta é
+# conferida no servidor.
+#
+# Uma conexão por nickname (a segunda aba é recusada com 4409). Cada conexão
+# tem uma fila de saída limitada (SEND_QUEUE mensagens); cliente que não
+# consome a tempo é desconectado em vez de acumular memória no servidor.
+#
+#   python battle.py            # sobe em BATTLE_HOST:BATTLE_PORT
+import asyncio
+import itertools
+import json
+import os
+import random
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from matchmaking import Matchmaker
+from models import THEMES
+
+ROUND_SECONDS = int(os.getenv("BATTLE_ROUND_SECONDS", "15"))
+ROUND_GRACE   = 1.0     # latência de rede tolerada além do timer do cliente
+NEXT_DELAY    = 2.0     # pausa para mostrar o resultado da rodada
+SWEEP_EVERY   = 1.0     # varredura da fila de pareamento
+SEND_QUEUE    = 32      # mensagens pendentes por conexão antes de derrubar
+MAX_QUESTIONS = 50
+TICKET_SALT   = "battle-ticket"
+TICKET_MAX_AGE = 120
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+# ---------- tickets (emitidos pelo Flask, validados aqui) ----------
+def make_battle_ticket(secret_key: str, nickname: str, skill: int = 0) -> str:
+    # a habilidade (best_score) vai no ticket: o sidecar não consulta o banco
+    return URLSafeTimedSerializer(secret_key, salt=TICKET_SALT).dumps({"n": nickname, "s": int(skill or 0)})
+
+
+def load_battle_ticket(secret_key: str, ticket: str) -> tuple[str, int] | None:
+    try:
+        data = URLSafeTimedSerializer(secret_key, salt=TICKET_SALT).loads(ticket, max_age=TICKET_MAX_AGE)
+    except (BadSignature, SignatureExpired):
+        return None
+    if not data.get("n"):
+        return None
+    return data["n"], int(data.get("s") or 0)
+
+
+# ---------- banco de perguntas em memória ----------
+class QuestionBank:
+    def __init__(self):
+        self.ids_by_theme = {t: [] for t in THEMES}
+        self._correct = {}
+        self._payload = {}
+
+    def add(self, qid, theme, statement, opts, correct, image_url=None):
+        self.ids_by_theme.setdefault(theme, []).append(qid)
+        self._correct[qid] = correct
+        # payload enviado ao cliente (sem a resposta), serializado uma vez
+        self._payload[qid] = {"id": qid, "st": statement, "o": list(opts), "img": image_url}
+
+    @classmethod
+    def from_db(cls):
+        from models import SessionLocal, Question
+        bank = cls()
+        with SessionLocal() as db:
+            for q in db.query(Question).all():
+                bank.add(q.id, q.theme, q.statement,
+                         (q.opt_a, q.opt_b, q.opt_c, q.opt_d), q.correct, q.image_url)
+        return bank
+
+    def deck(self, theme, rng=random):
+        ids = list(self.ids_by_theme.get(theme) or [])
+        rng.shuffle(ids)
+        return ids[:MAX_QUESTIONS]
+
+    def correct(self, qid):
+        return self._correct.get(qid)
+
+    def payload(self, qid):
+        return self._payload[qid]
+
+
+# ---------- estado ----------
+class Player:
+    __slots__ = ("nick", "send", "room", "alive", "picked", "score")
+
+    def __init__(self, nick, send):
+        self.nick = nick
+        self.send = send          # callable(str) não bloqueante
+        self.room = None
+        self.alive = True
+        self.picked = None
+        self.score = 0
+
+
+class Room:
+    __slots__ = ("id", "theme", "deck", "idx", "players", "timer", "open")
+
+    def __init__(self, rid, theme, deck, players):
+        self.id = rid
+        self.theme = theme
+        self.deck = deck
+        self.idx = -1
+        self.players = players
+        self.timer = None
+        self.open = False         # aceitando respostas da rodada atual?
+
+
+class BattleEngine:
+    def __init__(self, bank: QuestionBank, loop=None, round_seconds=ROUND_SECONDS,
+                 next_delay=NEXT_DELAY, rng=random, matchmaker: Matchmaker | None = None):
+        self.bank = bank
+        self.loop = loop or asyncio.get_event_loop()
+        self.round_seconds = round_seconds
+        self.next_delay = next_delay
+        self.rng = rng
+        self.rooms = {}
+        self.players = {}          # nickname -> Player conectado
+        self._ids = itertools.count(1)
+        self.matchmaker = matchmaker or Matchmaker(clock=self.loop.time)
+        self._sweeper = None
+
+    # ----- entrada -----
+    def connect(self, player: Player) -> bool:
+        """Registra a conexão; False se o nickname já está em outra aba (pareava consigo mesmo)."""
+        if player.nick in self.players:
+            return False
+        self.players[player.nick] = player
+        return True
+
+    def join(self, player: Player, skill: int = 0, theme: str | None = None):
+        """Entra na fila de pareamento; se já houver adversário, abre a sala."""
+        if theme not in THEMES:
+            theme = None
+        other = self.matchmaker.enqueue(player, skill, theme)
+        if other is None:
+            player.send(_dumps({"t": "wait"}))
+            return None
+        return self.create_room(other, player, theme)
+
+    def start_sweeper(self, every: float = SWEEP_EVERY):
+        def _tick():
+            pairs, expired = self.matchmaker.sweep()
+            for a, b, theme in pairs:
+                self.create_room(a, b, theme)
+            for p in expired:
+                # ninguém apareceu a tempo: o cliente volta para o modo solo
+                p.send(_dumps({"t": "solo"}))
+            self._sweeper = self.loop.call_later(every, _tick)
+        self._sweeper = self.loop.call_later(every, _tick)
+
+    def create_room(self, p1: Player, p2: Player, theme: str | None = None):
+        themes = [t for t in THEMES if self.bank.ids_by_theme.get(t)]
+        theme = theme or self.rng.choice(themes or THEMES)
+        room = Room(next(self._ids), theme, self.bank.deck(theme, self.rng), (p1, p2))
+        self.rooms[room.id] = room
+        for me, opp in ((p1, p2), (p2, p1)):
+            me.room, me.alive, me.picked, me.score = room, True, None, 0
+            me.send(_dumps({"t": "start", "theme": theme, "opp": opp.nick, "themes": THEMES}))
+        self._next_round(room)
+        return room
+
+    def answer(self, player: Player, qid, picked):
+        room = player.room
+        if room is None or not room.open or not player.alive or player.picked is not None:
+            return
+        if room.deck[room.idx] != qid:
+            return
+        player.picked = (picked or "").upper()[:1] or "-"
+        if all(p.picked is not None for p in room.players if p.alive):
+            self._close_round(room, room.idx)
+
+    def leave(self, player: Player):
+        if self.players.get(player.nick) is player:
+            del self.players[player.nick]
+        self.matchmaker.remove(player)
+        room = player.room
+        if room is None:
+            return
+        player.alive = False
+        player.room = None
+        self._finish(room, reason="abandono")
+
+    # ----- rodadas -----
+    def _next_round(self, room: Room):
+        if room.id not in self.rooms:
+            return
+        room.idx += 1
+        if room.idx >= len(room.deck):
+            self._finish(room, reason="completou")
+            return
+        for p in room.players:
+            p.picked = None
+        room.open = True
+        qid = room.deck[room.idx]
+        msg = _dumps({"t": "q", "n": room.idx + 1, "q": self.bank.payload(qid), "s": self.round_seconds})
+        for p in room.players:
+            p.send(msg)
+        room.timer = self.loop.call_later(self.round_seconds + ROUND_GRACE,
+                                          self._close_round, room, room.idx)
+
+    def _close_round(self, room: Room, idx: int):
+        if not room.open or room.idx != idx or room.id not in self.rooms:
+            return
+        room.open = False
+        if room.timer:
+            room.timer.cancel()
+            room.timer = None
+        qid = room.deck[idx]
+        correct = self.bank.correct(qid)
+        for p in room.players:
+            if not p.alive:
+                continue
+            if p.picked == correct:
+                p.score += 1
+            else:
+                p.alive = False
+        status = {p.nick: {"ok": p.alive, "picked": p.picked if p.picked != "-" else None, "score": p.score}
+                  for p in room.players}
+        msg = _dumps({"t": "res", "q": qid, "correct": correct, "r": status})
+        for p in room.players:
+            p.send(msg)
+
+        alive = [p for p in room.players if p.alive]
+        if len(alive) < len(room.players) or idx + 1 >= MAX_QUESTIONS:
+            self._finish(room, reason="eliminado" if len(alive) < 2 else "completou")
+        else:
+            room.timer = self.loop.call_later(self.next_delay, self._next_round, room)
+
+    def _finish(self, room: Room, reason: str):
+        if self.rooms.pop(room.id, None) is None:
+            return
+        room.open = False
+        if room.timer:
+            room.timer.cancel()
+            room.timer = None
+        alive = [p for p in room.players if p.alive]
+        winner = alive[0].nick if len(alive) == 1 else None
+        msg = _dumps({"t": "end", "winner": winner, "reason": reason,
+                      "score": {p.nick: p.score for p in room.players}})
+        for p in room.players:
+            if p.room is room:
+                p.send(msg)
+                p.room = None
+
+    def stats(self) -> dict:
+        return {"rooms": len(self.rooms), "players": len(self.players), **self.matchmaker.stats()}
+
+
+# ---------- transporte WebSocket ----------
+async def _serve(host: str, port: int, secret_key: str):
+    import websockets  # dependência só do sidecar
+
+    engine = BattleEngine(QuestionBank.from_db(), loop=asyncio.get_running_loop())
+    engine.start_sweeper()
+
+    async def handler(ws, *_):
+        try:
+            first = json.loads(await asyncio.wait_for(ws.recv(), timeout=10))
+        except Exception:
+            return
+        ident = load_battle_ticket(secret_key, first.get("ticket") or "")
+        if first.get("t") != "join" or not ident:
+            await ws.close(code=4401, reason="ticket inválido")
+            return
+        nick, skill = ident
+
+        outbox = asyncio.Queue(maxsize=SEND_QUEUE)
+        dropped = False
+
+        def send(txt):
+            nonlocal dropped
+            try:
+                outbox.put_nowait(txt)
+            except asyncio.QueueFull:
+                # cliente lento: as mensagens da partida não podem ser puladas
+                if not dropped:
+                    dropped = True
+                    asyncio.ensure_future(ws.close(code=4408, reason="cliente lento"))
+
+        async def writer():
+            try:
+                while True:
+                    await ws.send(await outbox.get())
+            except websockets.ConnectionClosed:
+                pass
+
+        player = Player(nick, send)
+        if not engine.connect(player):
+            await ws.close(code=4409, reason="já conectado em outra aba")
+            return
+        sender = asyncio.ensure_future(writer())
+        engine.join(player, skill, first.get("theme"))
+        try:
+            async for raw in ws:
+                try:
+                    msg = json.loads(raw)
+                except ValueError:
+                    continue
+                if msg.get("t") == "ans":
+                    engine.answer(player, msg.get("q"), msg.get("p"))
+        finally:
+            engine.leave(player)
+            sender.cancel()
+
+    async with websockets.serve(handler, host, port, max_size=4096):
+        await asyncio.Future()
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+    # mesmo SECRET_KEY (e default) do app.py, para validar os tickets
+    secret_key = os.getenv("SECRET_KEY", "28a08c230e257781ef22b1d7be9758a0")
+    host = os.getenv("BATTLE_HOST", "0.0.0.0")
+    port = int(os.getenv("BATTLE_PORT", "8765"))
+    asyncio.run(_serve(host, port, secret_key))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+# bench.py
+# Benchmarks dos caminhos quentes + portão de regressão contra baselines salvos.
+#
+#   python bench.py run              # roda e mostra
+#   python bench.py save             # grava BENCH_BASELINE desta máquina
+#   python bench.py check            # compara com o baseline; sai com 1 se regrediu
+#   python bench.py check --only game_render,rank_lookup --samples 100
+#
+# Cada benchmark cronometra chamada por chamada (ao menos BENCH_MIN_CALLS e
+# ~BENCH_SECONDS, em rodadas intercaladas com os outros benchmarks), guarda
+# uma amostra aleatória de BENCH_SAMPLES dessas latências e, à parte, o pico
+# de memória alocada por operação (tracemalloc). Uma regressão precisa de duas
+# coisas: o p95 por chamada subir mais que BENCH_P95_THRESHOLD e o teste de
+# Mann-Whitney (unilateral) sobre as amostras dizer que a distribuição nova é
+# maior com p < BENCH_ALPHA. Alocação reprova se subir mais que
+# BENCH_ALLOC_THRESHOLD. Benchmark suspeito é medido mais BENCH_RETRIES vezes
+# e só reprova se a maioria das medições regredir.
+#
+# Os tempos não são normalizados: o baseline só vale na máquina que o gravou
+# (python, SO, CPU) e `check` em outra máquina sai com 2 sem comparar. Por
+# isso o baseline não vai para o repositório; no CI, o mesmo job grava no
+# commit base e confere no commit novo:
+#
+#   git checkout $BASE && python bench.py save
+#   git checkout $HEAD && python bench.py check
+#
+# Roda num SQLite temporário com dados sintéticos, sem threads de fundo nem
+# memória compartilhada: não toca no banco de dev nem no app em execução.
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BASELINE        = os.getenv("BENCH_BASELINE", "bench_baseline.json")
+SAMPLES         = int(os.getenv("BENCH_SAMPLES", "200"))
+P95_THRESHOLD   = float(os.getenv("BENCH_P95_THRESHOLD", "0.10"))
+ALLOC_THRESHOLD = float(os.getenv("BENCH_ALLOC_THRESHOLD", "0.10"))
+ALPHA           = float(os.getenv("BENCH_ALPHA", "0.01"))
+RETRIES         = int(os.getenv("BENCH_RETRIES", "2"))
+MIN_CALLS       = int(os.getenv("BENCH_MIN_CALLS", "200"))
+MEASURE_SECONDS = float(os.getenv("BENCH_SECONDS", "1.0"))
+ROUNDS          = 5
+MAX_CALLS       = 100_000
+LEADERBOARD_ROWS = 2000
+
+
+# ---------- ambiente ----------
+def _environment(tmp: str):
+    """Importa o app contra um banco descartável e devolve os benchmarks."""
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+        "SCORE_SPILL_DIR": os.path.join(tmp, "spill"),
+        "APP_PRELOAD": "1",          # sem threads de fundo
+        "SHM_CACHE": "False",
+        "CACHE_URL": "",
+        "QUERY_BUDGET": "off",
+        "MAINTENANCE_MODE": "false",
+    })
+    os.environ.pop("DATABASE_REPLICA_URL", None)
+    import seed
+    from models import Base, engine, SessionLocal, Question, Leaderboard
+    Base.metadata.create_all(engine)
+    rng = random.Random(42)
+    with SessionLocal() as db:
+        for theme, rows in seed.SEED.items():
+            for st, a, b, c, d, corr, img in rows:
+                db.add(Question(theme=theme, statement=st, opt_a=a, opt_b=b, opt_c=c, opt_d=d,
+                                correct=corr, image_url=img))
+        for i in range(LEADERBOARD_ROWS):
+            best = rng.randint(0, 50)
+            db.add(Leaderboard(nickname=f"Jogador {i}", best_score=best,
+                               total_points=best * rng.randint(1, 20), games_played=rng.randint(1, 20)))
+        db.commit()
+
+    import app as A
+    import score_hist
+    from deck import build_tiers
+    from session_codec import BinarySessionInterface, encode, decode
+
+    with SessionLocal() as db:
+        score_hist.rebuild(db)
+        db.commit()
+    A.question_cache.load()
+    A.deck_sampler.rebuild()
+
+    A.app.config.update(SESSION_COOKIE_SECURE=False, REMEMBER_COOKIE_SECURE=False)
+    client = A.app.test_client()
+    client.post("/register", data=dict(nickname="bench", email="bench@example.com",
+                                       password="bench123", confirmPassword="bench123"))
+    client.post("/login/email", data=dict(email="bench@example.com", password="bench123"))
+    client.post("/start")
+    assert client.get("/game").status_code == 200, "/game não respondeu 200"
+
+    qids = list(A.question_cache._by_id)
+    themes = sorted({q.theme for q in A.question_cache._by_id.values()})
+    stat_rows = [(qid, themes[qid % len(themes)], rng.randint(0, 50), rng.randint(50, 100))
+                 for qid in range(1, 2001)]
+
+    iface = BinarySessionInterface()
+    deck = rng.sample(qids, min(50, len(qids)))
+    sess = {
+        "_user_id": "bench", "_fresh": True, "_id": "x" * 128,
+        "nickname": "bench", "theme": themes[0], "score": 0,
+        "queue_ids": deck, "asked_ids": deck[:20], "roulette_shown": True,
+        "current_qid": deck[20], "current_token": "Qm9vbGVhbkxvZ2ljMTIz",
+        "current_shown_at": int(time.time() * 1000),
+        "feedback_state": {"qid": deck[19], "was_correct": True, "timed_out": False,
+                           "picked": "B", "correct": "B"},
+    }
+    signed = iface.sign(A.app, encode(sess))
+
+    def question_fetch():
+        with A.db_readonly() as db:
+            for qid in rng.sample(qids, 10):
+                A.question_cache.get(db, qid, ask_shared=False)
+
+    def rank_lookup():
+        with SessionLocal() as db:
+            ranking = A._load_ranking(db)
+        rows = A.score_buffer.overlay(ranking)
+        pos = A._find_position(rows, f"Jogador {LEADERBOARD_ROWS // 2}")
+        A._beat_pct(30, rows[pos - 1]["best_score"] if pos else None)
+
+    return {
+        "question_fetch": question_fetch,
+        "deck_build":     lambda: build_tiers(stat_rows),
+        "deck_sample":    lambda: A.deck_sampler.deck(themes[0], rng=rng),
+        "rank_lookup":    rank_lookup,
+        "session_encode": lambda: iface.sign(A.app, encode(sess)),
+        "session_decode": lambda: decode(iface.unsign(A.app, signed)),
+        "game_render":    lambda: client.get("/game"),
+    }
+
+
+# ---------- medição ----------
+def _alloc_kb(fn, repeat: int = 5) -> float:
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(repeat):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn()
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return round(statistics.median(peaks) / 1024, 2)
+
+
+def _percentile(values, q: float) -> float:
+    s = sorted(values)
+    k = (len(s) - 1) * q
+    lo, hi = math.floor(k), math.ceil(k)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
+
+
+def _time_calls(fn, seconds: float, min_calls: int) -> list[float]:
+    """Latência de cada chamada (µs), por ~`seconds` e ao menos `min_calls`."""
+    clock = time.perf_counter
+    times = []
+    deadline = clock() + seconds
+    while len(times) < MAX_CALLS and (len(times) < min_calls or clock() < deadline):
+        t0 = clock()
+        fn()
+        times.append((clock() - t0) * 1e6)
+    return times
+
+
+def _summary(times: list[float], alloc_kb: float, samples: int = SAMPLES) -> dict:
+    # amostra aleatória das chamadas (não quantis: o Mann-Whitney supõe
+    # observações independentes da distribuição, não um resumo dela)
+    picked = random.Random(len(times)).sample(times, min(samples, len(times)))
+    times = sorted(times)
+    return {
+        "samples_us": sorted(round(t, 3) for t in picked),
+        "calls": len(times),
+        "p50_us": round(_percentile(times, 0.50), 3),
+        "p95_us": round(_percentile(times, 0.95), 3),
+        "alloc_kb": alloc_kb,
+    }
+
+
+def measure_all(benches: dict, samples: int = SAMPLES) -> dict:
+    """
+    Mede vários benchmarks em ROUNDS rodadas intercaladas (a, b, c, a, b, c...):
+    uma oscilação da máquina se espalha por todos em vez de cair num só.
+    p50/p95 são de todas as chamadas; `samples` delas, sorteadas, vão para o
+    teste estatístico.
+    """
+    times = {name: [] for name in benches}
+    for fn in benches.values():
+        for _ in range(3):
+            fn()                           # aquece caches/conexões
+    for _ in range(ROUNDS):
+        for name, fn in benches.items():
+            times[name] += _time_calls(fn, MEASURE_SECONDS / ROUNDS, -(-MIN_CALLS // ROUNDS))
+    return {name: _summary(times[name], _alloc_kb(fn), samples) for name, fn in benches.items()}
+
+
+def mann_whitney_greater(base: list[float], new: list[float]) -> float:
+    """p-valor (aprox. normal, com correção de empates) para 'new' > 'base'."""
+    n1, n2 = len(base), len(new)
+    if not n1 or not n2:
+        return 1.0
+    pooled = sorted([(v, 0) for v in base] + [(v, 1) for v in new])
+    ranks = [0.0] * len(pooled)
+    ties = 0.0
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        r = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[k] = r
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    r_new = sum(r for r, (_, grp) in zip(ranks, pooled) if grp == 1)
+    u = r_new - n2 * (n2 + 1) / 2
+    mu = n1 * n2 / 2
+    n = n1 + n2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    z = (u - mu - 0.5) / sigma
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+# ---------- comparação ----------
+def _judge(old: dict, cur: dict) -> tuple[list[str], bool, float, float]:
+    delta = cur["p95_us"] / old["p95_us"] - 1 if old["p95_us"] else 0.0
+    p = mann_whitney_greater(old["samples_us"], cur["samples_us"])
+    verdict, regressed = [], False
+    if delta > P95_THRESHOLD and p < ALPHA:
+        verdict.append(f"REGRESSÃO p95 (+{delta:.0%})")
+        regressed = True
+    alloc_delta = cur["alloc_kb"] - old["alloc_kb"]
+    if alloc_delta > 0.5 and old["alloc_kb"] and alloc_delta / old["alloc_kb"] > ALLOC_THRESHOLD:
+        verdict.append(f"REGRESSÃO alocação (+{alloc_delta / old['alloc_kb']:.0%})")
+        regressed = True
+    if not regressed and delta < -P95_THRESHOLD and mann_whitney_greater(cur["samples_us"], old["samples_us"]) < ALPHA:
+        verdict.append("melhorou")
+    return verdict, regressed, delta, p
+
+
+def compare(base: dict, new: dict) -> tuple[list[str], bool]:
+    """
+    Tabela legível + se houve regressão. `new`: {nome: [medições]}; com mais de
+    uma medição (remedição), reprova se a maioria delas regrediu e a tabela
+    mostra a medição mediana (pelo p95).
+    """
+    lines = [f"{'benchmark':<16}{'p95 base':>11}{'p95 novo':>11}{'Δ':>8}{'p':>9}"
+             f"{'KB base':>9}{'KB novo':>9}  resultado"]
+    failed = False
+    for name, runs in new.items():
+        cur = sorted(runs, key=lambda r: r["p95_us"])[len(runs) // 2]
+        old = base.get(name)
+        if old is None:
+            lines.append(f"{name:<16}{'—':>11}{cur['p95_us']:>11.1f}{'':>8}{'':>9}{'—':>9}"
+                         f"{cur['alloc_kb']:>9.1f}  novo (sem baseline)")
+            continue
+        verdict, _, delta, p = _judge(old, cur)
+        votes = sum(_judge(old, r)[1] for r in runs)
+        regressed = votes * 2 > len(runs)
+        failed |= regressed
+        if len(runs) > 1:
+            verdict = [v for v in verdict if regressed or not v.startswith("REGRESSÃO")]
+            verdict.append(f"{votes}/{len(runs)} medições regrediram")
+        lines.append(f"{name:<16}{old['p95_us']:>11.1f}{cur['p95_us']:>11.1f}{delta:>+8.0%}{p:>9.3f}"
+                     f"{old['alloc_kb']:>9.1f}{cur['alloc_kb']:>9.1f}  {', '.join(verdict) or 'ok'}")
+    return lines, failed
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as fh:
+            for line in fh:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def _machine() -> dict:
+    return {"python": platform.python_version(), "platform": platform.platform(terse=True),
+            "cpu": platform.machine(), "cpu_model": _cpu_model(), "cpus": os.cpu_count()}
+
+
+def _report(name: str, r: dict):
+    print(f"  {name:<16} p50={r['p50_us']:>9.1f}µs  p95={r['p95_us']:>9.1f}µs  "
+          f"alloc={r['alloc_kb']:>7.1f}KB  ({r['calls']} chamadas)", file=sys.stderr)
+
+
+def run(only=None, samples: int = SAMPLES, base: dict | None = None) -> dict:
+    """
+    Mede tudo: {nome: [medições]}. Com `base`, benchmark que parecer regredido
+    é medido mais RETRIES vezes; o veredito é por maioria (ver compare), sem
+    escolher a melhor medição.
+    """
+    with tempfile.TemporaryDirectory(prefix="quiz-bench-") as tmp:
+        benches = {name: fn for name, fn in _environment(tmp).items() if not only or name in only}
+        results = {}
+        for name, r in measure_all(benches, samples).items():
+            _report(name, r)
+            results[name] = [r]
+        suspect = {name: benches[name] for name, runs in results.items()
+                   if name in (base or {}) and _judge(base[name], runs[0])[1]}
+        for _ in range(RETRIES if suspect else 0):
+            for name, r in measure_all(suspect, samples).items():
+                _report(name + " (bis)", r)
+                results[name].append(r)
+        from models import engine
+        engine.dispose()
+    return results
+
+
+def main(argv) -> int:
+    args = argv[1:]
+    if not args or args[0] not in ("run", "save", "check"):
+        print("uso: python bench.py run|save|check [--only a,b] [--samples N]")
+        return 2
+    cmd, only, samples = args[0], None, SAMPLES
+    if "--only" in args:
+        only = set(args[args.index("--only") + 1].split(","))
+    if "--samples" in args:
+        samples = int(args[args.index("--samples") + 1])
+
+    if cmd == "run":
+        run(only, samples)
+        return 0
+    if cmd == "save":
+        results = {name: runs[0] for name, runs in run(only, samples).items()}
+        doc = {"machine": _machine(), "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+               "benchmarks": results}
+        if only and os.path.exists(BASELINE):
+            # atualiza só os escolhidos
+            with open(BASELINE, encoding="utf-8") as fh:
+                prev = json.load(fh)
+            doc["benchmarks"] = {**prev.get("benchmarks", {}), **results}
+        with open(BASELINE, "w", encoding="utf-8") as fh:
+            json.dump(doc, fh, indent=1, sort_keys=True)
+            fh.write("\n")
+        print(f"baseline gravado em {BASELINE} ({len(results)} benchmarks)")
+        return 0
+
+    try:
+        with open(BASELINE, encoding="utf-8") as fh:
+            doc = json.load(fh)
+    except FileNotFoundError:
+        print(f"sem baseline em {BASELINE}; rode `python bench.py save` primeiro")
+        return 2
+    if doc.get("machine") != _machine():
+        print(f"baseline gravado em outra máquina ({doc.get('machine')}, esta: {_machine()}); "
+              "rode `python bench.py save` nesta máquina antes do check")
+        return 2
+    base = doc.get("benchmarks", {})
+    results = run(only, samples, base)
+    lines, failed = compare(base, results)
+    print("\n".join(lines))
+    if failed:
+        print(f"\nFALHOU: regressão acima de {P95_THRESHOLD:.0%} no p95 (p < {ALPHA}) "
+              f"ou de {ALLOC_THRESHOLD:.0%} em alocação")
+        return 1
+    print("\nok: sem regressões")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
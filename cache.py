@@ -0,0 +1,272 @@
+# cache.py
+# Cache com backend plugável, dividido em namespaces com TTL próprio.
+#
+#   CACHE_URL=""/"local"   LRU em processo (padrão; um por worker)
+#   CACHE_URL=redis://...  Redis (ou compatível) compartilhado entre nós;
+#                          precisa do pacote `redis`
+#   CACHE_URL=fake://      stand-in em processo que fala a mesma API do cliente
+#                          Redis (bytes, TTL, pipeline): exercita o caminho
+#                          remoto em dev/testes sem servidor. É um por
+#                          processo, então NÃO é compartilhado (shared=False):
+#                          cada worker ainda precisa limpar o seu na invalidação
+#
+# `remote` diz se os valores são serializados; `shared` se todos os workers
+# enxergam o mesmo cache (quem publica uma invalidação já limpou para todos).
+#
+# get_multi({namespace: [chaves]}) busca tudo num único round-trip (MGET no
+# Redis). Valores vão como JSON no backend remoto; cada namespace pode
+# converter de volta (ex.: tupla nomeada) com `load`.
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_URL  = os.getenv("CACHE_URL", "").strip()
+LOCAL_SIZE = int(os.getenv("CACHE_LOCAL_SIZE", "10000"))
+PREFIX     = os.getenv("CACHE_PREFIX", "quiz")
+
+
+# ---------- backends ----------
+class LocalBackend:
+    """LRU com TTL por item; guarda os objetos como estão (sem serializar)."""
+    remote = False
+    shared = False
+
+    def __init__(self, max_items: int = LOCAL_SIZE, clock=time.monotonic):
+        self.max_items = max_items
+        self.clock = clock
+        self._data = OrderedDict()      # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: list[str]) -> list:
+        now = self.clock()
+        out = []
+        with self._lock:
+            for k in keys:
+                item = self._data.get(k)
+                if item is None or item[0] <= now:
+                    if item is not None:
+                        del self._data[k]
+                    out.append(None)
+                else:
+                    self._data.move_to_end(k)
+                    out.append(item[1])
+        return out
+
+    def set_many(self, items: dict, ttl: float):
+        exp = self.clock() + ttl
+        with self._lock:
+            for k, v in items.items():
+                self._data[k] = (exp, v)
+                self._data.move_to_end(k)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys: list[str]):
+        with self._lock:
+            for k in keys:
+                self._data.pop(k, None)
+
+    def delete_prefix(self, prefix: str):
+        with self._lock:
+            for k in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[k]
+
+
+class RedisBackend:
+    """Qualquer cliente com a API do redis-py (get/mget/pipeline/delete/scan_iter)."""
+    remote = True
+
+    def __init__(self, client, shared: bool = True):
+        self.client = client
+        self.shared = shared
+
+    def get_many(self, keys: list[str]) -> list:
+        if not keys:
+            return []
+        return [None if v is None else json.loads(v) for v in self.client.mget(keys)]
+
+    def set_many(self, items: dict, ttl: float):
+        pipe = self.client.pipeline(transaction=False)
+        for k, v in items.items():
+            pipe.set(k, json.dumps(v, separators=(",", ":"), ensure_ascii=False), px=int(ttl * 1000))
+        pipe.execute()
+
+    def delete_many(self, keys: list[str]):
+        if keys:
+            self.client.delete(*keys)
+
+    def delete_prefix(self, prefix: str):
+        keys = list(self.client.scan_iter(match=prefix + "*", count=500))
+        for i in range(0, len(keys), 500):
+            self.client.delete(*keys[i:i + 500])
+
+
+class FakeRedis:
+    """Subconjunto do redis-py em memória: valores em bytes, expiração em ms."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._data = {}
+        self._lock = threading.Lock()
+        self.round_trips = 0
+
+    def _live(self, k):
+        item = self._data.get(k)
+        if item is not None and item[0] is not None and item[0] <= self.clock():
+            del self._data[k]
+            return None
+        return item
+
+    def get(self, k):
+        return self.mget([k])[0]
+
+    def mget(self, keys):
+        with self._lock:
+            self.round_trips += 1
+            return [(item[1] if (item := self._live(k)) else None) for k in keys]
+
+    def set(self, k, v, px=None):
+        with self._lock:
+            self._set(k, v, px)
+        return True
+
+    def _set(self, k, v, px):
+        v = v.encode("utf-8") if isinstance(v, str) else v
+        self._data[k] = (self.clock() + px / 1000 if px else None, v)
+
+    def delete(self, *keys):
+        with self._lock:
+            self.round_trips += 1
+            return sum(self._data.pop(k, None) is not None for k in keys)
+
+    def scan_iter(self, match="*", count=None):
+        prefix = match.rstrip("*")
+        with self._lock:
+            return [k for k in list(self._data) if k.startswith(prefix) and self._live(k)]
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self._ops = []
+
+    def set(self, k, v, px=None):
+        self._ops.append((k, v, px))
+        return self
+
+    def execute(self):
+        with self.redis._lock:
+            self.redis.round_trips += 1
+            for op in self._ops:
+                self.redis._set(*op)
+        n, self._ops = len(self._ops), []
+        return [True] * n
+
+
+def make_backend(url: str = CACHE_URL, logger=None):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError:
+            if logger:
+                logger.warning("[CACHE] pacote redis não instalado; usando cache local")
+            return LocalBackend()
+        return RedisBackend(redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5))
+    if url.startswith("fake://"):
+        return RedisBackend(FakeRedis(), shared=False)
+    return LocalBackend()
+
+
+# ---------- fachada ----------
+class Namespace:
+    __slots__ = ("name", "ttl", "load", "hits", "misses")
+
+    def __init__(self, name: str, ttl: float, load=None):
+        self.name = name
+        self.ttl = ttl
+        self.load = load
+        self.hits = 0
+        self.misses = 0
+
+
+class Cache:
+    def __init__(self, backend=None, prefix: str = PREFIX, logger=None):
+        self.backend = backend if backend is not None else LocalBackend()
+        self.prefix = prefix
+        self.logger = logger
+        self.namespaces = {}
+        self.errors = 0
+
+    def namespace(self, name: str, ttl: float, load=None) -> Namespace:
+        # CACHE_TTL_<NAMESPACE>=segundos sobrescreve o padrão do código
+        ttl = float(os.getenv(f"CACHE_TTL_{name.upper()}", ttl))
+        ns = self.namespaces[name] = Namespace(name, ttl, load)
+        return ns
+
+    def _key(self, ns: str, key) -> str:
+        return f"{self.prefix}:{ns}:{key}"
+
+    def get_multi(self, wanted: dict) -> dict:
+        """{ns: [chaves]} → {ns: {chave: valor}} (só os encontrados), num round-trip."""
+        flat = [(ns, k) for ns, keys in wanted.items() for k in keys]
+        if not flat:
+            return {ns: {} for ns in wanted}
+        try:
+            values = self.backend.get_many([self._key(ns, k) for ns, k in flat])
+        except Exception as e:
+            # cache fora do ar não derruba o request: vira miss
+            self.errors += 1
+            if self.logger:
+                self.logger.warning(f"[CACHE] get falhou: {e}")
+            values = [None] * len(flat)
+        out = {ns: {} for ns in wanted}
+        for (ns, k), v in zip(flat, values):
+            space = self.namespaces[ns]
+            if v is None:
+                space.misses += 1
+                continue
+            space.hits += 1
+            out[ns][k] = space.load(v) if (space.load and self.backend.remote) else v
+        return out
+
+    def get(self, ns: str, key):
+        return self.get_multi({ns: [key]})[ns].get(key)
+
+    def set_many(self, ns: str, items: dict):
+        if not items:
+            return
+        try:
+            self.backend.set_many({self._key(ns, k): v for k, v in items.items()},
+                                  self.namespaces[ns].ttl)
+        except Exception as e:
+            self.errors += 1
+            if self.logger:
+                self.logger.warning(f"[CACHE] set falhou: {e}")
+
+    def set(self, ns: str, key, value):
+        self.set_many(ns, {key: value})
+
+    def delete(self, ns: str, key=None):
+        """Remove uma chave; sem chave, o namespace inteiro."""
+        try:
+            if key is None:
+                self.backend.delete_prefix(f"{self.prefix}:{ns}:")
+            else:
+                self.backend.delete_many([self._key(ns, key)])
+        except Exception as e:
+            self.errors += 1
+            if self.logger:
+                self.logger.warning(f"[CACHE] delete falhou: {e}")
+
+    def stats(self) -> dict:
+        out = {"backend": type(self.backend).__name__, "errors": self.errors}
+        for name, ns in self.namespaces.items():
+            total = ns.hits + ns.misses
+            out[name] = {"ttl": ns.ttl, "hits": ns.hits, "misses": ns.misses,
+                         "hit_ratio": round(ns.hits / total, 3) if total else None}
+        return out
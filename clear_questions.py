@@ -1,10 +1,13 @@
 from models import SessionLocal, Question, Base, engine
+from invalidation import InvalidationBus
 
 def main():
     Base.metadata.create_all(engine)  # garante que as tabelas existem
     db = SessionLocal()
     try:
         deleted = db.query(Question).delete()
+        # workers no ar descartam o cache de perguntas
+        InvalidationBus(engine).publish(db, "question")
         db.commit()
         print(f"✅ {deleted} perguntas removidas da tabela.")
     finally:
@@ -0,0 +1,209 @@
+# compression.py
+# Compressão das respostas (gzip; brotli se o pacote `brotli` estiver instalado).
+#
+# Um after_request negocia pelo Accept-Encoding e comprime:
+#   - HTML/JSON/CSS/JS/SVG acima de COMPRESS_MIN_SIZE bytes;
+#   - respostas em streaming (menos SSE) pedaço a pedaço, com flush a cada
+#     pedaço para não segurar o que o gerador já produziu;
+#   - arquivos de /static com cache dos bytes comprimidos por ETag.
+# Respostas totalmente estáticas (version.json) usam Precompressed: cada
+# codificação é calculada uma vez e reaproveitada.
+#
+# Quando o corpo é comprimido, o ETag vira fraco (W/"..."): o If-None-Match
+# continua batendo na comparação fraca do werkzeug.
+import gzip
+import hashlib
+import os
+import threading
+import zlib
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:   # opcional: sem o pacote, só gzip
+    brotli = None
+
+MIN_SIZE      = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL    = int(os.getenv("COMPRESS_LEVEL", "6"))
+BR_QUALITY    = int(os.getenv("COMPRESS_BR_QUALITY", "5"))
+STATIC_MAX    = int(os.getenv("COMPRESS_STATIC_MAX", str(2 << 20)))   # maior estático comprimido
+STATIC_CACHE  = 256
+
+COMPRESSIBLE = frozenset({
+    "text/html", "text/css", "text/plain", "text/javascript", "application/javascript",
+    "application/json", "image/svg+xml",
+})
+
+
+def pick_encoding(accept: str | None) -> str | None:
+    """'br' ou 'gzip' conforme o Accept-Encoding (respeita q=0); None = identity."""
+    if not accept:
+        return None
+    prefs = {}
+    for part in accept.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        prefs[token.strip().lower()] = q
+    star = prefs.get("*", 0.0)
+    order = ("br", "gzip") if brotli is not None else ("gzip",)
+    best = max(order, key=lambda e: prefs.get(e, star))
+    return best if prefs.get(best, star) > 0 else None
+
+
+def compress(data: bytes, encoding: str, level: int = GZIP_LEVEL, quality: int = BR_QUALITY) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=quality)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _stream(chunks, encoding: str, level: int, quality: int):
+    chunks = (x.encode("utf-8") if isinstance(x, str) else x for x in chunks)
+    if encoding == "br":
+        c = brotli.Compressor(quality=quality)
+        for chunk in chunks:
+            if chunk:
+                out = c.process(chunk) + c.flush()
+                if out:
+                    yield out
+        yield c.finish()
+        return
+    c = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)   # cabeçalho gzip
+    for chunk in chunks:
+        if chunk:
+            out = c.compress(chunk)
+            out += c.flush(zlib.Z_SYNC_FLUSH)
+            if out:
+                yield out
+    yield c.flush()
+
+
+def _weak(resp: Response):
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(etag, weak=True)
+
+
+class Precompressed:
+    """
+    Corpo fixo com as variantes comprimidas calculadas sob demanda, uma vez.
+    ETag forte pelo conteúdo ("<hash>", "<hash>-gzip", "<hash>-br" por variante);
+    If-None-Match com qualquer uma delas responde 304.
+    """
+
+    def __init__(self, body: bytes | str, mimetype: str, level: int = GZIP_LEVEL, quality: int = BR_QUALITY):
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.mimetype = mimetype
+        self.level = level
+        self.quality = quality
+        self._variants = {None: self.body}
+        self._lock = threading.Lock()
+        self.etag = hashlib.blake2b(self.body, digest_size=12).hexdigest()
+        self._tags = (self.etag, f"{self.etag}-gzip", f"{self.etag}-br")
+
+    def variant(self, encoding: str | None) -> bytes:
+        data = self._variants.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._variants.get(encoding)
+                if data is None:
+                    data = self._variants[encoding] = compress(self.body, encoding, self.level, self.quality)
+        return data
+
+    def response(self, status: int = 200) -> Response:
+        enc = pick_encoding(request.headers.get("Accept-Encoding")) if len(self.body) >= MIN_SIZE else None
+        tag = f"{self.etag}-{enc}" if enc else self.etag
+        inm = request.if_none_match
+        if status == 200 and inm and (inm.star_tag or any(inm.contains(t) for t in self._tags)):
+            resp = Response(status=304)
+        else:
+            resp = Response(self.variant(enc), status=status, mimetype=self.mimetype)
+            if enc:
+                resp.headers["Content-Encoding"] = enc
+        resp.set_etag(tag)
+        resp.vary.add("Accept-Encoding")
+        return resp
+
+
+class Compressor:
+    def __init__(self, app=None, min_size=MIN_SIZE, level=GZIP_LEVEL, quality=BR_QUALITY):
+        self.min_size = min_size
+        self.level = level
+        self.quality = quality
+        self._static = {}     # (etag, codificação) -> bytes
+        self._lock = threading.Lock()
+        self.stats = {"responses": 0, "bytes_in": 0, "bytes_out": 0, "streams": 0, "static_hits": 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self.after_request)
+
+    def _count(self, before: int, after: int):
+        s = self.stats
+        s["responses"] += 1
+        s["bytes_in"] += before
+        s["bytes_out"] += after
+
+    def after_request(self, resp: Response):
+        if resp.mimetype not in COMPRESSIBLE or "Content-Encoding" in resp.headers:
+            return resp
+        resp.vary.add("Accept-Encoding")
+        if resp.status_code < 200 or resp.status_code in (204, 206, 304):
+            return resp
+        enc = pick_encoding(request.headers.get("Accept-Encoding"))
+        if enc is None:
+            return resp
+
+        if resp.direct_passthrough:
+            return self._static_file(resp, enc)
+        if resp.is_streamed:
+            resp.response = _stream(resp.response, enc, self.level, self.quality)
+            resp.headers.pop("Content-Length", None)
+            resp.headers["Content-Encoding"] = enc
+            _weak(resp)
+            self.stats["streams"] += 1
+            return resp
+
+        data = resp.get_data()
+        if len(data) < self.min_size:
+            return resp
+        out = compress(data, enc, self.level, self.quality)
+        resp.set_data(out)
+        resp.headers["Content-Encoding"] = enc
+        _weak(resp)
+        self._count(len(data), len(out))
+        return resp
+
+    def _static_file(self, resp: Response, enc: str):
+        # send_file: corpo é um wrapper de arquivo; o ETag (mtime/tamanho) identifica a versão
+        etag = resp.get_etag()[0]
+        size = resp.content_length or 0
+        if not etag or size < self.min_size or size > STATIC_MAX:
+            return resp
+        key = (etag, enc)
+        out = self._static.get(key)
+        if out is None:
+            data = b"".join(resp.response)
+            if hasattr(resp.response, "close"):
+                resp.response.close()
+            out = compress(data, enc, self.level, self.quality)
+            with self._lock:
+                if len(self._static) >= STATIC_CACHE:
+                    self._static.pop(next(iter(self._static)))
+                self._static[key] = out
+            self._count(len(data), len(out))
+        else:
+            if hasattr(resp.response, "close"):
+                resp.response.close()
+            self.stats["static_hits"] += 1
+        resp.direct_passthrough = False
+        resp.set_data(out)
+        resp.headers["Content-Encoding"] = enc
+        _weak(resp)
+        return resp
@@ -0,0 +1,133 @@
+# deck.py
+# Montagem do baralho da partida com rampa de dificuldade (fácil → difícil).
+#
+# Em segundo plano, as perguntas de cada tema são ordenadas pela taxa de acerto
+# (question_stats, suavizada para perguntas com poucas respostas) e divididas
+# em TIERS faixas. Montar um baralho só sorteia dentro das faixas já prontas:
+# O(DECK_SIZE), sem tocar no banco durante o request.
+#
+# Com `shared` (shm_cache.SharedDeckIndex), as faixas ficam em memória
+# compartilhada: só o worker com o lock de escritor reconstrói e publica, e
+# todos sorteiam direto do segmento (uma cópia por host, não por worker).
+import os
+import random
+import threading
+import time
+from sqlalchemy import select
+from models import SessionLocal, Question, QuestionStat
+
+DECK_SIZE      = 50
+TIERS          = int(os.getenv("DECK_TIERS", "5"))
+REBUILD_EVERY  = float(os.getenv("DECK_REBUILD_SECONDS", "300"))
+# prior da suavização: pergunta nova "vale" PRIOR_N respostas com PRIOR_RATE de acerto
+PRIOR_RATE     = 0.6
+PRIOR_N        = 10
+
+
+def _ease(correct: int, answers: int) -> float:
+    return (correct + PRIOR_RATE * PRIOR_N) / (answers + PRIOR_N)
+
+
+def build_tiers(rows, tiers: int = TIERS) -> dict:
+    """rows: (id, tema, acertos, respostas). Retorna {tema: (faixa_fácil, ..., faixa_difícil)}."""
+    by_theme = {}
+    for qid, theme, correct, answers in rows:
+        by_theme.setdefault(theme, []).append((-_ease(correct or 0, answers or 0), qid))
+    out = {}
+    for theme, items in by_theme.items():
+        items.sort()  # mais fácil (maior taxa de acerto) primeiro
+        ids = [qid for _, qid in items]
+        n = len(ids)
+        out[theme] = tuple(tuple(ids[n * k // tiers: n * (k + 1) // tiers]) for k in range(tiers))
+    return out
+
+
+class DeckSampler:
+    def __init__(self, session_factory=SessionLocal, rebuild_every=REBUILD_EVERY, logger=None,
+                 shared=None, writer=None):
+        self._session_factory = session_factory
+        self.rebuild_every = rebuild_every
+        self.logger = logger
+        self.shared = shared      # SharedDeckIndex ou None (faixas locais)
+        self.writer = writer      # WriterLock: quem publica no segmento
+        self._tiers = None        # trocado inteiro a cada rebuild (leitura sem lock)
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def rebuild(self):
+        answered = QuestionStat.correct + QuestionStat.wrong + QuestionStat.timeout
+        with self._session_factory() as db:
+            rows = db.execute(
+                select(Question.id, Question.theme, QuestionStat.correct, answered)
+                .outerjoin(QuestionStat, QuestionStat.question_id == Question.id)
+            ).all()
+        tiers = build_tiers(rows)
+        if self.shared is not None:
+            self.shared.publish(tiers)
+        else:
+            self._tiers = tiers
+
+    def _run(self):
+        while True:
+            try:
+                # compartilhado: só o escritor reconstrói; os outros só tentam o lock
+                if self.shared is None or self.writer.try_acquire():
+                    self.rebuild()
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"[DECK] rebuild falhou: {e}")
+            time.sleep(self.rebuild_every)
+
+    def start(self):
+        # um thread de rebuild por processo (recriado após fork)
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            threading.Thread(target=self._run, name="deck-rebuild", daemon=True).start()
+
+    @property
+    def ready(self) -> bool:
+        if self.shared is not None:
+            return self.shared.snapshot() is not None
+        return self._tiers is not None
+
+    def deck(self, theme: str, size: int = DECK_SIZE, rng=random) -> list[int] | None:
+        """Baralho com rampa fácil → difícil; None se as faixas ainda não existem."""
+        self.start()
+        if self.shared is None:
+            tiers = self._tiers
+            if tiers is None or theme not in tiers:
+                return None
+            return self._sample(tiers[theme], size, rng)
+        for _ in range(3):
+            snap = self.shared.snapshot()
+            if snap is None:
+                return None
+            seq, tiers = snap
+            if theme not in tiers:
+                return None
+            out = self._sample(tiers[theme], size, rng)
+            # o escritor pode ter republicado durante o sorteio: refaz
+            if self.shared.valid(seq):
+                return out
+        return None
+
+    @staticmethod
+    def _sample(bands, size: int, rng) -> list[int]:
+        k = len(bands)
+        out, used = [], set()
+        for t in range(k):
+            want = size * (t + 1) // k - size * t // k
+            band = bands[t]
+            picked = rng.sample(band, min(want, len(band)))
+            out.extend(picked)
+            used.update(picked)
+        if len(out) < size:
+            # faixas curtas: completa com o que sobrou, em ordem de dificuldade
+            rest = [q for band in bands for q in band if q not in used]
+            out.extend(rest[: size - len(out)])
+        return out
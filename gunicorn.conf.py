@@ -0,0 +1,55 @@
+# gunicorn.conf.py
+# Produção:  gunicorn app:app        (este arquivo é lido automaticamente)
+#
+# Com preload (padrão), o app.py é importado UMA vez no master: create_all,
+# OAuth, templates compilados, manifesto de estáticos e cache de perguntas
+# (warm_state) ficam prontos antes do fork e são herdados pelos workers por
+# copy-on-write. Para isso funcionar:
+#   - o GC fica desligado no master e os objetos são congelados (gc.freeze)
+#     antes do primeiro fork, então o coletor dos workers não reescreve essas
+#     páginas;
+#   - o master não guarda conexões (app.py faz engine.dispose() após o warm) e
+#     cada worker descarta o pool herdado em post_fork (app.after_fork), que
+#     também inicia as threads de fundo.
+#
+#   GUNICORN_PRELOAD=False  volta ao modo antigo (cada worker importa o app)
+import gc
+import os
+import uuid
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() == "true"
+
+# lido pelo app.py na importação
+os.environ["APP_PRELOAD"] = "1" if preload_app else "0"
+# geração dos segmentos de memória compartilhada: a mesma em todos os workers
+# deste master, diferente a cada deploy (ver shm_cache.py)
+os.environ.setdefault("SHM_GENERATION", uuid.uuid4().hex)
+
+if preload_app:
+    # nada de coleta no master enquanto o app é importado e aquecido
+    gc.disable()
+
+
+def when_ready(server):
+    if preload_app:
+        # tudo o que existe agora vai para a geração permanente
+        gc.freeze()
+        server.log.info("gc.freeze(): %d objetos congelados", gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    gc.enable()
+    import app as quiz_app
+    quiz_app.after_fork()
+
+
+def worker_exit(server, worker):
+    # grava os placares ainda no buffer antes do worker sair (restart/deploy)
+    import app as quiz_app
+    quiz_app.score_buffer.close()
@@ -0,0 +1,216 @@
+# hashing.py
+# Hash de senhas fora da thread do request: pool de processos limitado,
+# custo fixo (igual em todos os workers) e rehash no login de hashes mais
+# fracos que ele.
+#
+# O request ainda espera o resultado de verify/hash (precisa dele para
+# responder), mas com prazo: HASH_RUN_TIMEOUT estourado vira HashingBusy. O
+# rehash do login não é esperado (hash_password_later). Os processos do pool
+# nascem do forkserver: fork direto de um worker com vários threads pode
+# herdar um lock preso (logging, pool do banco).
+#
+# O custo NÃO é calibrado por processo: workers que medissem diferente
+# ficariam regravando a mesma conta um contra o outro. Para mudar, use
+# PASSWORD_HASH_METHOD (ex.: "scrypt:65536:8:1"); N abaixo de 2^15 (o padrão
+# do Werkzeug) sobe para 2^15. Hash gravado com custo maior é mantido.
+import multiprocessing as mp
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import generate_password_hash, check_password_hash
+
+HASH_WORKERS      = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+HASH_MAX_PENDING  = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+HASH_WAIT_TIMEOUT = float(os.getenv("PASSWORD_HASH_WAIT_TIMEOUT", "5"))
+HASH_RUN_TIMEOUT  = float(os.getenv("PASSWORD_HASH_RUN_TIMEOUT", "10"))
+
+# piso do scrypt: o padrão do Werkzeug (N=2^15, r=8, p=1)
+SCRYPT_MIN_N = 2 ** 15
+
+
+class HashingBusy(RuntimeError):
+    """Fila de hashing cheia: o request deve responder 'tente novamente'."""
+
+
+_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_MAX_PENDING)
+_pool = None
+_pool_pid = None
+
+_stats = {
+    "submitted": 0,
+    "rejected": 0,
+    "inline": 0,
+    "timeouts": 0,
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "wait_ms_total": 0.0,
+    "run_ms_total": 0.0,
+}
+
+
+def _scrypt_method(n: int, r: int = 8, p: int = 1) -> str:
+    return f"scrypt:{n}:{r}:{p}"
+
+
+def _parse(method: str) -> tuple[str, int]:
+    """(algoritmo, custo) de um prefixo do Werkzeug; custo 0 = desconhecido."""
+    name, *args = method.split(":")
+    try:
+        if name == "scrypt":
+            n, r, p = map(int, args) if args else (2 ** 15, 8, 1)
+            return name, n * r * p
+        if name == "pbkdf2":
+            return name, int(args[1]) if len(args) > 1 else 0
+    except ValueError:
+        pass
+    return name, 0
+
+
+def _pinned_method(raw: str) -> str:
+    raw = raw.strip()
+    if not raw or raw == "scrypt":
+        return _scrypt_method(SCRYPT_MIN_N)
+    name, *args = raw.split(":")
+    if name == "scrypt" and len(args) == 3:
+        n, r, p = map(int, args)
+        return _scrypt_method(max(n, SCRYPT_MIN_N), r, p)
+    return raw
+
+
+_method = _pinned_method(os.getenv("PASSWORD_HASH_METHOD", ""))
+
+
+def current_method() -> str:
+    return _method
+
+
+def needs_rehash(pwhash: str | None) -> bool:
+    # o Werkzeug grava "metodo$salt$hash"; só regrava se o custo gravado for
+    # menor (pbkdf2 → scrypt também conta como upgrade)
+    if not pwhash or "$" not in pwhash:
+        return False
+    stored, stored_cost = _parse(pwhash.split("$", 1)[0])
+    wanted, wanted_cost = _parse(_method)
+    if stored != wanted:
+        return stored == "pbkdf2" and wanted == "scrypt"
+    return stored_cost < wanted_cost
+
+
+def _mp_context():
+    methods = mp.get_all_start_methods()
+    return mp.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _get_pool():
+    # pool criado sob demanda e recriado após fork (cada worker do gunicorn tem o seu)
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _lock:
+            if _pool is None or _pool_pid != pid:
+                try:
+                    _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=_mp_context())
+                except (OSError, NotImplementedError, ValueError):
+                    _pool = False
+                _pool_pid = pid
+    return _pool
+
+
+def _acquire(timeout: float) -> float:
+    t0 = time.perf_counter()
+    ok = _slots.acquire(timeout=timeout) if timeout > 0 else _slots.acquire(blocking=False)
+    if not ok:
+        with _lock:
+            _stats["rejected"] += 1
+        raise HashingBusy("fila de hashing cheia")
+    t1 = time.perf_counter()
+    with _lock:
+        _stats["submitted"] += 1
+        _stats["in_flight"] += 1
+        _stats["max_in_flight"] = max(_stats["max_in_flight"], _stats["in_flight"])
+        _stats["wait_ms_total"] += (t1 - t0) * 1000
+    return t1
+
+
+def _release(t1: float):
+    with _lock:
+        _stats["in_flight"] -= 1
+        _stats["run_ms_total"] += (time.perf_counter() - t1) * 1000
+    _slots.release()
+
+
+def _submit(fn, *args, wait: float | None = None):
+    """Future do cálculo; a vaga só volta quando o processo termina (mesmo após timeout)."""
+    t1 = _acquire(HASH_WAIT_TIMEOUT if wait is None else wait)
+    pool = _get_pool()
+    if pool:
+        try:
+            fut = pool.submit(fn, *args)
+        except Exception:
+            _release(t1)
+            raise
+    else:
+        # sem suporte a processos (ex.: sandbox): thread próprio, ainda limitado
+        from concurrent.futures import Future
+        with _lock:
+            _stats["inline"] += 1
+        fut = Future()
+
+        def _inline():
+            try:
+                fut.set_result(fn(*args))
+            except BaseException as e:
+                fut.set_exception(e)
+        threading.Thread(target=_inline, name="hash-inline", daemon=True).start()
+    fut.add_done_callback(lambda _f: _release(t1))
+    return fut
+
+
+def _run(fn, *args):
+    fut = _submit(fn, *args)
+    try:
+        return fut.result(timeout=HASH_RUN_TIMEOUT)
+    except FutureTimeout:
+        fut.cancel()
+        with _lock:
+            _stats["timeouts"] += 1
+        raise HashingBusy("hash de senha demorou demais") from None
+
+
+def hash_password(password: str) -> str:
+    return _run(generate_password_hash, password, current_method())
+
+
+def hash_password_later(password: str, on_done) -> bool:
+    """
+    Calcula o hash sem prender o request; on_done(novo_hash) roda num thread
+    próprio quando terminar. False (nada agendado) se a fila está cheia.
+    """
+    try:
+        fut = _submit(generate_password_hash, password, current_method(), wait=0)
+    except HashingBusy:
+        return False
+
+    def _deliver(f):
+        # fora do thread de gerenciamento do pool: on_done grava no banco
+        if not f.cancelled() and f.exception() is None:
+            threading.Thread(target=on_done, args=(f.result(),), name="rehash", daemon=True).start()
+    fut.add_done_callback(_deliver)
+    return True
+
+
+def verify_password(pwhash: str, password: str) -> bool:
+    return _run(check_password_hash, pwhash, password)
+
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_stats)
+    out["method"] = _method
+    out["queue_depth"] = max(0, out["in_flight"] - HASH_WORKERS)
+    done = out["submitted"] or 1
+    out["avg_wait_ms"] = round(out["wait_ms_total"] / done, 2)
+    out["avg_run_ms"] = round(out["run_ms_total"] / done, 2)
+    return out
@@ -0,0 +1,247 @@
+# invalidation.py
+# Barramento de invalidação dos caches em processo, entre workers e nós.
+#
+# Eventos são strings curtas "<tipo>:<chave>" ou só "<tipo>":
+#   question:<id>   user:<nickname>   leaderboard:<mode>   week-reset
+# publish(db, evento) entra na transação de quem chamou: só é entregue se ela
+# fizer commit.
+#
+# Postgres: NOTIFY no canal INVALIDATION_CHANNEL; cada worker tem um thread com
+# uma conexão própria (fora do pool) em LISTEN. Entrega em milissegundos.
+# Outros bancos (SQLite em dev): contador de versão em meta + anel de
+# RING_SLOTS entradas; cada worker consulta a cada INVALIDATION_POLL_SECONDS.
+# Todo publish() incrementa a MESMA linha de meta (os eventos de uma chamada
+# vão juntos numa entrada só): é um ponto único de escrita, aceitável no
+# SQLite de dev, que já serializa escritas, mas não para produção.
+# Se ficou para trás do anel, ou a conexão do LISTEN caiu e voltou, tudo é
+# invalidado (handlers recebem a chave None). A primeira conexão não invalida:
+# o worker acabou de nascer com o estado aquecido no master.
+#
+# Cada processo marca seus eventos com uma origem e ignora os próprios: quem
+# publica já aplicou a mudança localmente.
+#
+#   python invalidation.py question:12     # publica à mão (ex.: após seed)
+import os
+import secrets
+import select as _select
+import sys
+import threading
+import time
+from sqlalchemy import text
+
+CHANNEL       = os.getenv("INVALIDATION_CHANNEL", "quiz_invalidate")
+POLL_SECONDS  = float(os.getenv("INVALIDATION_POLL_SECONDS", "2"))
+RING_SLOTS    = 64
+
+_VERSION_KEY = "invalidation:version"
+_SLOT_KEY    = "invalidation:slot:{}"
+
+
+def parse(payload: str) -> tuple[str, str | None, str | None]:
+    """'leaderboard:best|ab12' → ('leaderboard', 'best', 'ab12')."""
+    event, _, origin = payload.partition("|")
+    kind, _, key = event.partition(":")
+    return kind, (key or None), (origin or None)
+
+
+class InvalidationBus:
+    def __init__(self, engine, poll_seconds=POLL_SECONDS, channel=CHANNEL, logger=None):
+        self.engine = engine
+        self.channel = channel
+        self.poll_seconds = poll_seconds
+        self.logger = logger
+        self.notify = engine.dialect.name == "postgresql"
+        self._handlers = {}            # tipo -> [fn(chave | None)]
+        self._pid = None
+        self._origin = None
+        self._lock = threading.Lock()
+        self._seen = None              # última versão aplicada (modo polling)
+        self._thread_pid = None
+        self.stats = {"published": 0, "received": 0, "applied": 0, "flush_all": 0, "errors": 0}
+
+    # ----- assinatura / aplicação -----
+    def subscribe(self, kind: str, fn):
+        self._handlers.setdefault(kind, []).append(fn)
+
+    @property
+    def origin(self) -> str:
+        # por processo: o fork herda o objeto, mas não a identidade
+        if self._pid != os.getpid():
+            self._origin = secrets.token_hex(3)
+            self._pid = os.getpid()
+        return self._origin
+
+    def apply(self, payload: str):
+        kind, key, origin = parse(payload)
+        self.stats["received"] += 1
+        if origin == self.origin:
+            return
+        fns = self._handlers.get(kind, ())
+        for fn in fns:
+            try:
+                fn(key)
+            except Exception as e:
+                self.stats["errors"] += 1
+                if self.logger:
+                    self.logger.warning(f"[INVAL] handler {kind} falhou: {e}")
+        if fns:
+            self.stats["applied"] += 1
+
+    def flush_all(self):
+        self.stats["flush_all"] += 1
+        for kind, fns in self._handlers.items():
+            for fn in fns:
+                try:
+                    fn(None)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    if self.logger:
+                        self.logger.warning(f"[INVAL] handler {kind} falhou: {e}")
+
+    # ----- publicação -----
+    def publish(self, db, *events: str):
+        """Enfileira eventos na transação de `db` (entregues no commit)."""
+        origin = self.origin
+        payloads = [f"{event}|{origin}" for event in events]
+        if not payloads:
+            return
+        if self.notify:
+            for payload in payloads:
+                db.execute(text("SELECT pg_notify(:c, :p)"), {"c": self.channel, "p": payload})
+        else:
+            # uma versão por chamada: menos escritas na linha do contador
+            self._append(db, "\n".join(payloads))
+        self.stats["published"] += len(payloads)
+
+    def _ensure_version(self, db):
+        from models import Meta, dialect_insert
+        insert = dialect_insert(db.get_bind())
+        db.execute(insert(Meta).values(key=_VERSION_KEY, value="0")
+                   .on_conflict_do_nothing(index_elements=[Meta.key]))
+
+    def _append(self, db, payload: str):
+        from models import Meta, dialect_insert
+        self._ensure_version(db)
+        # o UPDATE trava a linha do contador até o commit: versões não se repetem
+        db.execute(text("UPDATE meta SET value = CAST(CAST(value AS INTEGER) + 1 AS TEXT) WHERE key = :k"),
+                   {"k": _VERSION_KEY})
+        version = int(db.execute(text("SELECT value FROM meta WHERE key = :k"), {"k": _VERSION_KEY}).scalar())
+        insert = dialect_insert(db.get_bind())
+        stmt = insert(Meta).values(key=_SLOT_KEY.format(version % RING_SLOTS), value=f"{version}|{payload}")
+        db.execute(stmt.on_conflict_do_update(index_elements=[Meta.key], set_={"value": stmt.excluded.value}))
+
+    # ----- recepção -----
+    def start(self):
+        # um thread por processo (recriado após fork)
+        pid = os.getpid()
+        if self._thread_pid == pid:
+            return
+        with self._lock:
+            if self._thread_pid == pid:
+                return
+            self._thread_pid = pid
+            target = self._listen_loop if self.notify else self._poll_loop
+            threading.Thread(target=target, name="invalidation", daemon=True).start()
+
+    def _listen_loop(self):
+        delay = 1.0
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                # conexão dedicada, fora do pool (fica presa no LISTEN)
+                cargs, cparams = self.engine.dialect.create_connect_args(self.engine.url)
+                conn = self.engine.dialect.loaded_dbapi.connect(*cargs, **cparams)
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f'LISTEN "{self.channel}"')
+                # reconexão: o que passou enquanto estávamos desconectados se perdeu.
+                # Na primeira não há o que perder (e esvaziar o cache de perguntas
+                # herdado do master quebraria o copy-on-write)
+                if connected_before:
+                    self.flush_all()
+                connected_before = True
+                delay = 1.0
+                while True:
+                    for payload in self._wait(conn, 30.0):
+                        self.apply(payload)
+            except Exception as e:
+                self.stats["errors"] += 1
+                if self.logger:
+                    self.logger.warning(f"[INVAL] LISTEN caiu: {e}; nova tentativa em {delay:.0f}s")
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    @staticmethod
+    def _wait(conn, timeout: float):
+        if hasattr(conn, "notifies") and callable(conn.notifies):
+            # psycopg 3
+            return [n.payload for n in conn.notifies(timeout=timeout, stop_after=64)]
+        # psycopg2
+        if _select.select([conn], [], [], timeout)[0]:
+            conn.poll()
+        out = [n.payload for n in conn.notifies]
+        del conn.notifies[:]
+        return out
+
+    def _poll_loop(self):
+        while True:
+            try:
+                self.poll_once()
+            except Exception as e:
+                self.stats["errors"] += 1
+                if self.logger:
+                    self.logger.warning(f"[INVAL] polling falhou: {e}")
+            time.sleep(self.poll_seconds)
+
+    def poll_once(self):
+        with self.engine.connect() as conn:
+            raw = conn.execute(text("SELECT value FROM meta WHERE key = :k"), {"k": _VERSION_KEY}).scalar()
+            version = int(raw or 0)
+            if self._seen is None or version < self._seen:
+                self._seen = version          # início (ou contador zerado): só acompanha
+                return
+            if version == self._seen:
+                return
+            if version - self._seen > RING_SLOTS:
+                self._seen = version
+                self.flush_all()
+                return
+            keys = [_SLOT_KEY.format(v % RING_SLOTS) for v in range(self._seen + 1, version + 1)]
+            rows = dict(conn.execute(
+                text("SELECT key, value FROM meta WHERE key IN ({})".format(
+                    ", ".join(f":k{i}" for i in range(len(keys))))),
+                {f"k{i}": k for i, k in enumerate(keys)},
+            ).all())
+        for v in range(self._seen + 1, version + 1):
+            stamp, _, payload = (rows.get(_SLOT_KEY.format(v % RING_SLOTS)) or "").partition("|")
+            if stamp != str(v):
+                # slot já reaproveitado por uma versão mais nova
+                self.flush_all()
+                break
+            for line in payload.split("\n"):
+                self.apply(line)
+        self._seen = version
+
+
+def main(argv) -> int:
+    if len(argv) < 2:
+        print("uso: python invalidation.py evento [evento ...]   (ex.: question:12 week-reset)")
+        return 2
+    from models import SessionLocal, engine
+    bus = InvalidationBus(engine)
+    with SessionLocal() as db:
+        bus.publish(db, *argv[1:])
+        db.commit()
+    print(f"{len(argv) - 1} evento(s) publicados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
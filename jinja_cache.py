@@ -0,0 +1,55 @@
+# jinja_cache.py
+# Cache de bytecode dos templates Jinja em disco.
+#
+# Compilar base.html (e os que herdam dele) custa caro no primeiro render de
+# cada processo. Com o FileSystemBytecodeCache, o código compilado fica em
+# JINJA_CACHE_DIR e os próximos processos (workers novos, deploy, autoscale) só
+# carregam o bytecode. A chave é nome + caminho do template e o conteúdo é
+# validado pelo checksum do fonte: template editado recompila sozinho.
+#
+# Em produção o auto_reload fica desligado (sem stat() do arquivo a cada
+# render); TEMPLATES_AUTO_RELOAD=True ou debug religam.
+#
+#   python jinja_cache.py    # passo de build: compila tudo para o cache
+import os
+import sys
+import time
+from jinja2 import FileSystemBytecodeCache
+
+ROOT        = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR   = os.getenv("JINJA_CACHE_DIR") or os.path.join(ROOT, ".jinja_cache")
+AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "").lower()
+
+
+def configure(app):
+    """Chamar antes do primeiro uso de app.jinja_env (o ambiente é criado sob demanda)."""
+    # "" → segue app.debug (padrão do Flask)
+    app.config["TEMPLATES_AUTO_RELOAD"] = AUTO_RELOAD == "true" if AUTO_RELOAD else None
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+    except OSError as e:
+        app.logger.warning(f"[JINJA] sem cache de bytecode: {e}")
+        return
+    app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache(CACHE_DIR)}
+
+
+def compile_all(app) -> list[str]:
+    names = app.jinja_env.list_templates(extensions=("html",))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
+
+
+def main():
+    # app mínimo com a mesma pasta de templates: não importa app.py (sem banco)
+    from flask import Flask
+    app = Flask("app", root_path=ROOT)
+    configure(app)
+    t0 = time.perf_counter()
+    names = compile_all(app)
+    print(f"{len(names)} templates compilados em {(time.perf_counter() - t0) * 1000:.0f} ms → {CACHE_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# leaderboard_hub.py
+# Publicador em processo para o ranking ao vivo (Server-Sent Events).
+#
+# Os eventos ficam num único buffer circular já serializado; cada assinante só
+# guarda o cursor (último id lido). Um broadcast custa O(1) independente do
+# número de conexões, e um cliente lento que fica para trás do buffer recebe um
+# snapshot completo em vez de acumular memória.
+#
+# Cada conexão SSE prende um thread do worker (gthread) enquanto dura. Por isso
+# há um teto de assinantes por processo (max_subscribers): acima dele
+# subscribe() devolve None, a rota responde 204 e a página passa a consultar
+# /leaderboard/top periodicamente, sem ocupar thread.
+# O hub é por processo; mudanças feitas em outros workers/nós chegam pelo
+# barramento de invalidação (evento leaderboard, ver app._on_leaderboard).
+import json
+import threading
+import time
+from collections import deque
+
+MODES = ("total", "best")
+
+
+def _sse(event: str, data, event_id: int | None = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'), ensure_ascii=False)}\n\n"
+
+
+class LeaderboardHub:
+    def __init__(self, top_n: int = 10, backlog: int = 256,
+                 heartbeat: float = 15.0, max_stream: float = 300.0, max_subscribers: int = 2):
+        self.top_n = top_n
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.max_stream = max_stream          # fecha e deixa o EventSource reconectar
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=backlog)  # (id, texto SSE)
+        self._seq = 0
+        self._snap = {m: None for m in MODES}
+        self.subscribers = 0
+        self.rejected = 0
+
+    # ---------- publicação ----------
+    def observe(self, mode: str, rows) -> bool:
+        """
+        Recebe o top N atual de um modo como [(nickname, valor, partidas), ...].
+        Só publica (um diff compacto) se algo mudou em relação ao último snapshot.
+        """
+        rows = [tuple(r) for r in rows[: self.top_n]]
+        with self._cond:
+            prev = self._snap.get(mode)
+            if prev == rows:
+                return False
+            self._snap[mode] = rows
+            prev = prev or []
+            changed = [[i, *r] for i, r in enumerate(rows) if i >= len(prev) or prev[i] != r]
+            self._seq += 1
+            self._events.append((self._seq, _sse("diff", {"m": mode, "set": changed, "n": len(rows)}, self._seq)))
+            self._cond.notify_all()
+            return True
+
+    def seeded(self) -> bool:
+        """True depois que os dois modos receberam algum observe()."""
+        return all(rows is not None for rows in self._snap.values())
+
+    def _snapshot_event(self) -> str:
+        data = {m: [list(r) for r in (rows or [])] for m, rows in self._snap.items()}
+        return _sse("snapshot", data, self._seq)
+
+    # ---------- assinatura ----------
+    def subscribe(self, last_event_id: str | None = None):
+        """Reserva uma vaga e devolve o gerador SSE; None se o processo está cheio."""
+        with self._cond:
+            if self.subscribers >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self.subscribers += 1
+        return _Subscription(self, self._stream(last_event_id))
+
+    def _release(self):
+        with self._cond:
+            self.subscribers -= 1
+
+    def _stream(self, last_event_id: str | None):
+        try:
+            cursor = int(last_event_id) if last_event_id else None
+        except ValueError:
+            cursor = None
+
+        with self._cond:
+            oldest = self._events[0][0] if self._events else self._seq + 1
+            if cursor is None or cursor > self._seq or cursor < oldest - 1:
+                # sem id (ou fora do buffer): começa do snapshot atual
+                first = self._snapshot_event()
+                cursor = self._seq
+            else:
+                first = None
+
+        yield "retry: 3000\n\n"
+        if first:
+            yield first
+        deadline = time.monotonic() + self.max_stream
+        while time.monotonic() < deadline:
+            with self._cond:
+                if cursor >= self._seq:
+                    self._cond.wait(timeout=self.heartbeat)
+                oldest = self._events[0][0] if self._events else self._seq + 1
+                if cursor < oldest - 1:
+                    # ficou para trás do buffer circular: reenvia o estado inteiro
+                    pending = [self._snapshot_event()]
+                else:
+                    pending = [txt for (eid, txt) in self._events if eid > cursor]
+                cursor = self._seq
+            if pending:
+                for txt in pending:
+                    yield txt
+            else:
+                yield ": hb\n\n"
+
+
+class _Subscription:
+    """Iterável da resposta: devolve a vaga no close() (chamado pelo WSGI),
+    mesmo que o gerador nunca tenha começado."""
+
+    def __init__(self, hub: LeaderboardHub, gen):
+        self._hub = hub
+        self._gen = gen
+        self._open = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._gen)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        if self._open:
+            self._open = False
+            self._gen.close()
+            self._hub._release()
@@ -0,0 +1,119 @@
+# match_history.py
+# Histórico de partidas (append-only) e estatísticas incrementais do perfil.
+#
+# record() roda na transação do /end: um INSERT em matches e dois upserts
+# (player_stats e player_theme_stats) com os agregados já somados no banco —
+# a página de perfil só lê essas linhas, sem varrer o histórico. A sequência
+# de dias jogados (streak) também é atualizada no upsert, pelo dia local.
+#
+# As perguntas da partida vão compactadas: deltas em zigzag + varint, na ordem
+# em que foram jogadas (50 ids ≈ 60-100 bytes).
+from datetime import datetime
+from sqlalchemy import select, case
+from models import Match, PlayerStats, PlayerThemeStats, dialect_insert
+
+RECENT = 10
+
+
+def encode_ids(ids) -> bytes:
+    out = bytearray()
+    prev = 0
+    for qid in ids:
+        d = int(qid) - prev
+        prev = int(qid)
+        z = (d << 1) ^ (d >> 63)          # zigzag: deltas negativos viram ímpares
+        while z >= 0x80:
+            out.append((z & 0x7F) | 0x80)
+            z >>= 7
+        out.append(z)
+    return bytes(out)
+
+
+def decode_ids(raw: bytes) -> list[int]:
+    ids, prev, z, shift = [], 0, 0, 0
+    for b in raw or b"":
+        z |= (b & 0x7F) << shift
+        if b & 0x80:
+            shift += 7
+            continue
+        prev += (z >> 1) ^ -(z & 1)
+        ids.append(prev)
+        z = shift = 0
+    return ids
+
+
+def record(db, nickname: str, theme: str, score: int, question_ids, duration_ms: int | None,
+           end_reason: str, played_at_ms: int, tz):
+    """Grava a partida e soma nos agregados (na transação de `db`)."""
+    db.add(Match(
+        nickname=nickname, played_at=played_at_ms, theme=theme, score=score,
+        duration_ms=duration_ms, end_reason=(end_reason or "")[:16],
+        question_ids=encode_ids(question_ids),
+    ))
+    insert = dialect_insert(db.get_bind())
+
+    stmt = insert(PlayerThemeStats).values(nickname=nickname, theme=theme, games=1,
+                                           total_score=score, best_score=score)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[PlayerThemeStats.nickname, PlayerThemeStats.theme],
+        set_={
+            "games": PlayerThemeStats.games + 1,
+            "total_score": PlayerThemeStats.total_score + stmt.excluded.total_score,
+            "best_score": case((stmt.excluded.best_score > PlayerThemeStats.best_score, stmt.excluded.best_score),
+                               else_=PlayerThemeStats.best_score),
+        },
+    ))
+
+    today = datetime.fromtimestamp(played_at_ms / 1000, tz).date().toordinal()
+    stmt = insert(PlayerStats).values(nickname=nickname, games=1, total_score=score, best_score=score,
+                                      total_ms=duration_ms or 0, streak=1, best_streak=1, last_day=today)
+    streak = case(
+        (PlayerStats.last_day == today, PlayerStats.streak),
+        (PlayerStats.last_day == today - 1, PlayerStats.streak + 1),
+        else_=1,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[PlayerStats.nickname],
+        set_={
+            "games": PlayerStats.games + 1,
+            "total_score": PlayerStats.total_score + stmt.excluded.total_score,
+            "best_score": case((stmt.excluded.best_score > PlayerStats.best_score, stmt.excluded.best_score),
+                               else_=PlayerStats.best_score),
+            "total_ms": PlayerStats.total_ms + stmt.excluded.total_ms,
+            "streak": streak,
+            "best_streak": case((streak > PlayerStats.best_streak, streak), else_=PlayerStats.best_streak),
+            "last_day": case((PlayerStats.last_day > today, PlayerStats.last_day), else_=today),
+        },
+    ))
+
+
+def profile(db, nickname: str, today: int, recent: int = RECENT) -> dict | None:
+    """Agregados + últimas partidas. `today`: date.toordinal() local (streak expira)."""
+    stats = db.get(PlayerStats, nickname)
+    if stats is None:
+        return None
+    themes = db.execute(
+        select(PlayerThemeStats).where(PlayerThemeStats.nickname == nickname)
+        .order_by(PlayerThemeStats.games.desc(), PlayerThemeStats.theme)
+    ).scalars().all()
+    matches = db.execute(
+        select(Match.played_at, Match.theme, Match.score, Match.duration_ms, Match.end_reason)
+        .where(Match.nickname == nickname)
+        .order_by(Match.played_at.desc())
+        .limit(recent)
+    ).all()
+    return {
+        "games": stats.games,
+        "avg_score": round(stats.total_score / stats.games, 1) if stats.games else 0,
+        "best_score": stats.best_score,
+        "avg_seconds": round(stats.total_ms / stats.games / 1000) if stats.games else 0,
+        # sem jogar ontem nem hoje, a sequência já acabou
+        "streak": stats.streak if stats.last_day >= today - 1 else 0,
+        "best_streak": stats.best_streak,
+        "themes": [
+            {"theme": t.theme, "games": t.games, "best_score": t.best_score,
+             "avg_score": round(t.total_score / t.games, 1) if t.games else 0}
+            for t in themes
+        ],
+        "recent": [m._asdict() for m in matches],
+    }
@@ -0,0 +1,151 @@
+# matchmaking.py
+# Fila de pareamento do modo batalha, em memória.
+#
+# Uma fila FIFO por (tema, faixa de habilidade). A habilidade é o best_score do
+# ranking (0..50) agrupado em faixas de BUCKET_SIZE pontos. Inserir e remover
+# são O(1) (dict ordenado por chegada); a busca olha a própria faixa e, quanto
+# mais tempo o jogador espera, mais faixas vizinhas passam a valer. Quem passa
+# de max_wait sai da fila e volta para o modo solo.
+import os
+import time
+from collections import deque
+
+BUCKET_SIZE  = int(os.getenv("MATCH_BUCKET_SIZE", "5"))
+WIDEN_EVERY  = float(os.getenv("MATCH_WIDEN_EVERY", "5"))
+MAX_WAIT     = float(os.getenv("MATCH_MAX_WAIT", "30"))
+MAX_SKILL    = 50
+ANY_THEME    = "*"
+
+
+class _Ticket:
+    __slots__ = ("key", "theme", "bucket", "since")
+
+    def __init__(self, key, theme, bucket, since):
+        self.key = key
+        self.theme = theme
+        self.bucket = bucket
+        self.since = since
+
+
+class Matchmaker:
+    def __init__(self, bucket_size=BUCKET_SIZE, widen_every=WIDEN_EVERY,
+                 max_wait=MAX_WAIT, clock=time.monotonic, samples=1024):
+        self.bucket_size = bucket_size
+        self.widen_every = widen_every
+        self.max_wait = max_wait
+        self.clock = clock
+        self.max_bucket = MAX_SKILL // bucket_size
+        self._queues = {}              # (tema, faixa) -> {key: _Ticket}
+        self._tickets = {}             # key -> _Ticket (ordem de chegada)
+        self._waits = deque(maxlen=samples)
+        self.matched = 0
+        self.timeouts = 0
+
+    def __len__(self):
+        return len(self._tickets)
+
+    def __contains__(self, key):
+        return key in self._tickets
+
+    def _bucket(self, skill) -> int:
+        skill = min(max(int(skill or 0), 0), MAX_SKILL)
+        return skill // self.bucket_size
+
+    def _radius(self, waited: float) -> int:
+        return min(int(waited // self.widen_every), self.max_bucket) if self.widen_every > 0 else 0
+
+    # ----- fila -----
+    def _insert(self, t: _Ticket):
+        self._queues.setdefault((t.theme, t.bucket), {})[t.key] = t
+        self._tickets[t.key] = t
+
+    def _discard(self, t: _Ticket):
+        q = self._queues.get((t.theme, t.bucket))
+        if q is not None:
+            q.pop(t.key, None)
+            if not q:
+                del self._queues[(t.theme, t.bucket)]
+        self._tickets.pop(t.key, None)
+
+    def remove(self, key) -> bool:
+        t = self._tickets.get(key)
+        if t is None:
+            return False
+        self._discard(t)
+        return True
+
+    def _find(self, t: _Ticket, now: float):
+        radius = self._radius(now - t.since)
+        # o mais antigo da fila tem a maior janela; não adianta olhar além dela
+        oldest = next(iter(self._tickets.values()), None)
+        limit = max(radius, self._radius(now - oldest.since) if oldest else 0)
+        for d in range(limit + 1):
+            for b in {t.bucket - d, t.bucket + d}:
+                q = self._queues.get((t.theme, b))
+                if not q:
+                    continue
+                # o mais antigo da faixa (pulando o próprio ticket na varredura)
+                other = next((o for o in q.values() if o is not t), None)
+                if other is None:
+                    continue
+                # vale se a distância cabe na janela de qualquer um dos dois
+                if d <= radius or d <= self._radius(now - other.since):
+                    return other
+        return None
+
+    def _pair(self, t: _Ticket, other: _Ticket, now: float):
+        self._discard(other)
+        self._discard(t)
+        self._waits.append(now - other.since)
+        self._waits.append(now - t.since)
+        self.matched += 1
+        return other.key
+
+    def enqueue(self, key, skill=0, theme=None, now=None):
+        """Entra na fila. Retorna a chave do adversário se já houver par, senão None."""
+        now = self.clock() if now is None else now
+        self.remove(key)
+        t = _Ticket(key, theme or ANY_THEME, self._bucket(skill), now)
+        other = self._find(t, now)
+        if other is not None:
+            return self._pair(t, other, now)
+        self._insert(t)
+        return None
+
+    def sweep(self, now=None):
+        """
+        Chamado periodicamente: alarga as faixas de quem está esperando e expira
+        quem passou de max_wait. Retorna (pares, expirados); cada par é
+        (chave, chave, tema), com tema None se ninguém escolheu.
+        """
+        now = self.clock() if now is None else now
+        pairs, expired = [], []
+        for t in list(self._tickets.values()):
+            if t.key not in self._tickets:
+                continue                      # já pareado nesta varredura
+            if now - t.since >= self.max_wait:
+                self._discard(t)
+                self.timeouts += 1
+                expired.append(t.key)
+                continue
+            if self._radius(now - t.since) == 0:
+                continue
+            other = self._find(t, now)
+            if other is not None:
+                theme = None if t.theme == ANY_THEME else t.theme
+                pairs.append((self._pair(t, other, now), t.key, theme))
+        return pairs, expired
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        depth = {}
+        for (theme, _b), q in self._queues.items():
+            depth[theme] = depth.get(theme, 0) + len(q)
+        return {
+            "waiting": len(self._tickets),
+            "depth": depth,
+            "matched": self.matched,
+            "timeouts": self.timeouts,
+            "wait_avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "wait_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+        }
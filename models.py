@@ -1,7 +1,7 @@
 # models.py
 import os
-from sqlalchemy import (create_engine, Column, String, Text, Boolean, Integer, CHAR,
-                        CheckConstraint)
+from sqlalchemy import (create_engine, Column, String, Text, Boolean, Integer, BigInteger, CHAR,
+                        CheckConstraint, Index, LargeBinary)
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.pool import NullPool
 from sqlalchemy.orm import declarative_base
@@ -21,7 +21,7 @@ def make_engine(url: str):
     # Postgres (Neon): pool pequeno e pre_ping
     return create_engine(
         url,
-        pool_size=int(os.getenv("DB_POOL_SIZE", "5  ")),
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
         max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "5")),
         pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "30")),
         pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
@@ -32,6 +32,14 @@ def make_engine(url: str):
 
 engine = make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False, future=True)
+
+# Réplica de leitura (opcional): usada por db_readonly() via replica.ReplicaRouter
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+replica_engine = make_engine(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None
+ReplicaSessionLocal = (
+    sessionmaker(bind=replica_engine, autoflush=False, autocommit=False, expire_on_commit=False, future=True)
+    if replica_engine is not None else None
+)
 Base = declarative_base()
 
 THEMES = ('Esportes','TV/Cinema','Jogos','Música','Lógica','História','Diversos')
@@ -45,6 +53,11 @@ class User(Base, UserMixin):
     facebook_id = Column(String(128), unique=True, nullable=True)
     is_active = Column(Boolean, default=True)
     avatar_url = Column(String(512), nullable=True)
+    __table_args__ = (
+        # busca por prefixo ("Lucas Silva %") na alocação de nickname
+        Index("ix_users_nickname_prefix", "nickname",
+              postgresql_ops={"nickname": "varchar_pattern_ops"}),
+    )
     
     def get_id(self):
         return self.nickname
@@ -75,7 +88,83 @@ class Leaderboard(Base):
     total_points = Column(Integer, nullable=False, default=0)
     games_played = Column(Integer, nullable=False, default=0)
 
+# keyset do ranking: (score DESC, nickname ASC) para as páginas e o "perto de mim"
+Index("ix_leaderboard_total", Leaderboard.total_points.desc(), Leaderboard.nickname)
+Index("ix_leaderboard_best", Leaderboard.best_score.desc(), Leaderboard.nickname)
+
+class QuestionStat(Base):
+    __tablename__ = "question_stats"
+    question_id = Column(Integer, primary_key=True)
+    shown   = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+    wrong   = Column(Integer, nullable=False, default=0)
+    timeout = Column(Integer, nullable=False, default=0)
+    total_ms = Column(Integer, nullable=False, default=0)   # soma dos tempos de resposta
+    # histograma do tempo de resposta (limite superior de cada faixa, em segundos)
+    t_2s  = Column(Integer, nullable=False, default=0)
+    t_4s  = Column(Integer, nullable=False, default=0)
+    t_6s  = Column(Integer, nullable=False, default=0)
+    t_9s  = Column(Integer, nullable=False, default=0)
+    t_12s = Column(Integer, nullable=False, default=0)
+    t_15s = Column(Integer, nullable=False, default=0)
+
+class ScoreHistogram(Base):
+    # contagem de jogadores por faixa de pontuação ("best" 0..50, "total" semanal)
+    __tablename__ = "score_histogram"
+    kind   = Column(String(8), primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    count  = Column(Integer, nullable=False, default=0)
+
 class Meta(Base):
     __tablename__ = "meta"
     key   = Column(String, primary_key=True)
     value = Column(String, nullable=False)
+
+class Match(Base):
+    # histórico: uma linha por partida, só INSERT (ver match_history.py)
+    __tablename__ = "matches"
+    id           = Column(Integer, primary_key=True, autoincrement=True)
+    nickname     = Column(String(16), nullable=False)
+    played_at    = Column(BigInteger, nullable=False)        # epoch ms do fim da partida
+    theme        = Column(Text, nullable=False)
+    score        = Column(Integer, nullable=False)
+    duration_ms  = Column(Integer, nullable=True)
+    end_reason   = Column(String(16), nullable=False, default="")
+    question_ids = Column(LargeBinary, nullable=False)       # varints dos deltas, na ordem jogada
+
+# "últimas partidas de X" (keyset por played_at)
+Index("ix_matches_nickname_played", Match.nickname, Match.played_at.desc())
+
+class PlayerStats(Base):
+    # agregados por jogador, atualizados a cada partida (nunca recalculados do histórico)
+    __tablename__ = "player_stats"
+    nickname    = Column(String(16), primary_key=True)
+    games       = Column(Integer, nullable=False, default=0)
+    total_score = Column(Integer, nullable=False, default=0)
+    best_score  = Column(Integer, nullable=False, default=0)
+    total_ms    = Column(BigInteger, nullable=False, default=0)
+    streak      = Column(Integer, nullable=False, default=0)  # dias seguidos jogando
+    best_streak = Column(Integer, nullable=False, default=0)
+    last_day    = Column(Integer, nullable=False, default=0)  # date.toordinal() da última partida
+
+class PlayerThemeStats(Base):
+    __tablename__ = "player_theme_stats"
+    nickname    = Column(String(16), primary_key=True)
+    theme       = Column(Text, primary_key=True)
+    games       = Column(Integer, nullable=False, default=0)
+    total_score = Column(Integer, nullable=False, default=0)
+    best_score  = Column(Integer, nullable=False, default=0)
+
+def dialect_insert(bind):
+    """insert() com suporte a ON CONFLICT no dialeto do engine (Postgres ou SQLite)."""
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def ensure_indexes(bind):
+    """create_all não cria índices novos em tabelas já existentes; faz isso aqui."""
+    for table in Base.metadata.sorted_tables:
+        for ix in table.indexes:
+            ix.create(bind, checkfirst=True)
@@ -0,0 +1,91 @@
+# oidc.py
+# Cache do JWKS do provedor OpenID (Google) com TTL e rotação de chaves.
+# O Authlib valida o id_token chamando client.fetch_jwk_set(); aqui trocamos
+# esse fetch por um cache compartilhado pelo worker.
+import os
+import re
+import threading
+import time
+import requests
+
+JWKS_DEFAULT_TTL = int(os.getenv("OIDC_JWKS_TTL", "3600"))
+# intervalo mínimo entre refresh forçados (kid desconhecido)
+JWKS_MIN_REFRESH = int(os.getenv("OIDC_JWKS_MIN_REFRESH", "60"))
+# depois de um fetch que falhou, ninguém tenta de novo antes disso (cache negativo)
+JWKS_FAIL_BACKOFF = int(os.getenv("OIDC_JWKS_FAIL_BACKOFF", "30"))
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class JWKSCache:
+    def __init__(self, jwks_uri_getter, ttl: int = JWKS_DEFAULT_TTL,
+                 min_refresh: int = JWKS_MIN_REFRESH, fail_backoff: int = JWKS_FAIL_BACKOFF,
+                 http=requests, clock=time.monotonic):
+        # jwks_uri vem do discovery; resolvido sob demanda (não bloqueia o import)
+        self._jwks_uri_getter = jwks_uri_getter
+        self._ttl = ttl
+        self._min_refresh = min_refresh
+        self._fail_backoff = fail_backoff
+        self._http = http
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._keys = None
+        self._expires_at = 0.0
+        self._attempted_at = None     # último fetch, com ou sem sucesso
+        self._retry_at = 0.0          # cache negativo após falha
+        self._error = None
+        self.fetches = 0
+
+    def _fetch(self):
+        resp = self._http.get(self._jwks_uri_getter(), timeout=5)
+        resp.raise_for_status()
+        ttl = self._ttl
+        m = _MAX_AGE_RE.search(resp.headers.get("Cache-Control", ""))
+        if m:
+            ttl = int(m.group(1))
+        self._keys = resp.json()
+        self._expires_at = self._clock() + ttl
+
+    def get(self, force: bool = False) -> dict:
+        now = self._clock()
+        if self._keys is not None and now < self._expires_at and not force:
+            return self._keys
+        with self._lock:
+            now = self._clock()
+            stale = self._keys is None or now >= self._expires_at
+            # force (kid não encontrado → provável rotação) respeita um intervalo
+            # mínimo, para um token forjado não virar um fetch por request
+            can_force = force and (self._attempted_at is None
+                                   or now - self._attempted_at >= self._min_refresh)
+            if (stale or can_force) and now >= self._retry_at:
+                self._attempted_at = now
+                self.fetches += 1
+                try:
+                    self._fetch()
+                    self._retry_at, self._error = 0.0, None
+                except Exception as e:
+                    # provedor fora: nem expiração nem kid desconhecido tentam de
+                    # novo antes do backoff (cada tentativa pode levar o timeout todo)
+                    self._retry_at, self._error = now + self._fail_backoff, e
+            if self._keys is None:
+                raise self._error
+            # mantém as chaves antigas se o provedor estiver fora
+            return self._keys
+
+    def invalidate(self):
+        with self._lock:
+            self._expires_at = 0.0
+
+
+def install_jwks_cache(client, **kwargs) -> JWKSCache:
+    """Faz o client do Authlib usar o cache no lugar do fetch_jwk_set padrão."""
+    cache = JWKSCache(lambda: client.load_server_metadata()["jwks_uri"], **kwargs)
+    client.fetch_jwk_set = lambda force=False: cache.get(force=force)
+    return cache
+
+
+REQUIRED_CLAIMS = ("sub", "email")
+
+
+def claims_complete(claims: dict | None) -> bool:
+    return bool(claims) and all(claims.get(k) for k in REQUIRED_CLAIMS)
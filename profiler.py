@@ -0,0 +1,223 @@
+# profiler.py
+# Profiler estatístico por request, ligado sob demanda em produção.
+#
+# Um único thread amostrador por processo lê sys._current_frames() a cada
+# PROFILE_INTERVAL_MS e soma a pilha dos threads que estão sendo perfilados
+# (só existe custo enquanto há algum request marcado). No fim do request são
+# gravados dois arquivos em PROFILE_DIR:
+#   <id>.collapsed        formato "a;b;c N" (flamegraph.pl, speedscope, etc.)
+#   <id>.speedscope.json  abre direto em https://www.speedscope.app
+# O diretório é um anel: só os últimos PROFILE_KEEP perfis ficam. Request mais
+# curto que o intervalo pode terminar sem amostra (e sem arquivo).
+#
+# Quem liga (ver app.py): header X-Profile assinado, cookie de preview com
+# ?profile=1, ou sorteio com PROFILE_SAMPLE_RATE (0 = desligado).
+#
+#   python profiler.py token [minutos]   # valor do header X-Profile (usa SECRET_KEY)
+import hashlib
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_DIR      = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP     = int(os.getenv("PROFILE_KEEP", "50"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+MAX_DEPTH        = 256
+
+_SAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack(frame) -> tuple:
+    out = []
+    while frame is not None and len(out) < MAX_DEPTH:
+        out.append(frame.f_code)
+        frame = frame.f_back
+    out.reverse()      # raiz → folha
+    return tuple(out)
+
+
+def make_token(secret: str, ttl: float = 3600) -> str:
+    """Header assinado '<expira>.<hmac>'; vale até `ttl` segundos."""
+    exp = str(int(time.time() + ttl))
+    return exp + "." + hmac.new(secret.encode(), exp.encode(), hashlib.sha256).hexdigest()
+
+
+def check_token(secret: str, token: str) -> bool:
+    exp, _, sig = (token or "").partition(".")
+    if not exp.isdigit() or int(exp) < time.time():
+        return False
+    good = hmac.new(secret.encode(), exp.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(sig, good)
+
+
+class _Run:
+    __slots__ = ("ident", "label", "started", "samples")
+
+    def __init__(self, ident, label):
+        self.ident = ident
+        self.label = label
+        self.started = time.perf_counter()
+        self.samples = Counter()     # pilha (tupla de code objects) -> amostras
+
+
+class Profiler:
+    def __init__(self, directory=PROFILE_DIR, keep=PROFILE_KEEP, interval=PROFILE_INTERVAL, logger=None):
+        self.directory = directory
+        self.keep = keep
+        self.interval = interval
+        self.logger = logger
+        self._active = {}               # ident do thread -> _Run
+        self._cond = threading.Condition()
+        self._pid = None
+        self._seq = 0
+        self.written = 0
+
+    # ----- amostragem -----
+    def _ensure_thread(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            self._active = {}
+            threading.Thread(target=self._run, name="profiler", daemon=True).start()
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._cond:
+                while not self._active:
+                    self._cond.wait()
+                runs = list(self._active.values())
+            frames = sys._current_frames()
+            for run in runs:
+                if run.ident == me:
+                    continue
+                frame = frames.get(run.ident)
+                if frame is not None:
+                    run.samples[_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+    def begin(self, label: str) -> _Run:
+        run = _Run(threading.get_ident(), label)
+        with self._cond:
+            self._ensure_thread()
+            self._active[run.ident] = run
+            self._cond.notify()
+        return run
+
+    def end(self, run: _Run) -> str | None:
+        """Para a amostragem do request e grava os arquivos; retorna o id do perfil."""
+        with self._cond:
+            self._active.pop(run.ident, None)
+        elapsed_ms = (time.perf_counter() - run.started) * 1000
+        if not run.samples:
+            return None
+        self._seq += 1
+        name = (f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._seq}-"
+                f"{_SAFE.sub('_', run.label)[:40]}-{elapsed_ms:.0f}ms")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._write(name, run, elapsed_ms)
+            self._trim()
+        except OSError as e:
+            if self.logger:
+                self.logger.warning(f"[PROFILE] não gravou {name}: {e}")
+            return None
+        self.written += 1
+        return name
+
+    # ----- arquivos -----
+    def _write(self, name: str, run: _Run, elapsed_ms: float):
+        base = os.path.join(self.directory, name)
+        with open(base + ".collapsed", "w", encoding="utf-8") as fh:
+            for stack, n in run.samples.most_common():
+                fh.write(";".join(_frame_name(c) for c in stack) + f" {n}\n")
+
+        index, frames = {}, []
+        samples, weights = [], []
+        step = self.interval * 1000
+        for stack, n in run.samples.items():
+            ids = []
+            for code in stack:
+                i = index.get(code)
+                if i is None:
+                    i = index[code] = len(frames)
+                    frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+                ids.append(i)
+            samples.append(ids)
+            weights.append(n * step)
+        doc = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": run.label,
+            "exporter": "quiz profiler",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled", "name": run.label, "unit": "milliseconds",
+                "startValue": 0, "endValue": round(elapsed_ms, 3),
+                "samples": samples, "weights": weights,
+            }],
+        }
+        with open(base + ".speedscope.json", "w", encoding="utf-8") as fh:
+            json.dump(doc, fh, separators=(",", ":"))
+
+    def _trim(self):
+        ids = self.list()
+        for old in ids[self.keep:]:
+            for ext in (".collapsed", ".speedscope.json"):
+                try:
+                    os.remove(os.path.join(self.directory, old + ext))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> list[str]:
+        """Ids dos perfis gravados, do mais novo para o mais antigo."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        stamped = []
+        for n in names:
+            if not n.endswith(".collapsed"):
+                continue
+            try:
+                mtime = os.path.getmtime(os.path.join(self.directory, n))
+            except FileNotFoundError:
+                continue           # apagado pelo _trim de outro worker
+            stamped.append((mtime, n[:-len(".collapsed")]))
+        stamped.sort(reverse=True)
+        return [i for _, i in stamped]
+
+    def path(self, profile_id: str, fmt: str) -> str | None:
+        ext = {"collapsed": ".collapsed", "speedscope": ".speedscope.json"}.get(fmt)
+        if ext is None or _SAFE.sub("_", profile_id) != profile_id:
+            return None
+        p = os.path.join(self.directory, profile_id + ext)
+        return p if os.path.isfile(p) else None
+
+
+def main(argv) -> int:
+    if len(argv) < 2 or argv[1] != "token":
+        print("uso: python profiler.py token [minutos]")
+        return 2
+    from dotenv import load_dotenv
+    load_dotenv()
+    secret = os.getenv("SECRET_KEY", "")
+    if not secret:
+        print("SECRET_KEY não definida")
+        return 1
+    minutes = float(argv[2]) if len(argv) > 2 else 60
+    print(f"X-Profile: {make_token(secret, minutes * 60)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
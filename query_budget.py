@@ -0,0 +1,185 @@
+# query_budget.py
+# Orçamento de consultas SQL por request (guarda contra N+1 nos caminhos quentes).
+#
+# Conta statements e tempo de banco via eventos do SQLAlchemy no engine. Só o
+# que roda no contexto do request/teste é contado (ContextVar): threads de fundo
+# (flush do placar, polling, deck) ficam de fora.
+#
+# No app (install): QUERY_BUDGET=off | warn | raise. Em "warn" estourar o
+# orçamento vira um [QUERY] no log; em "raise" vira QueryBudgetExceeded (é o
+# modo dos testes: o test client propaga a exceção). Toda resposta ganha
+# X-DB-Queries: "<n>;<ms>" quando o modo não é off.
+#
+# Em testes:
+#   with query_budget.budget(1, "/game"):
+#       client.get("/game")
+#
+#   @query_budget.limit(3)
+#   def test_end(client): ...
+#
+#   # fixture `query_budget` em tests/conftest.py: with query_budget(1, "/game"): ...
+import contextvars
+import functools
+import os
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from sqlalchemy import event
+
+MODE = os.getenv("QUERY_BUDGET", "off").strip().lower()
+
+# consultas por request com caches quentes (QUERY_BUDGET_<ENDPOINT> sobrescreve)
+BUDGETS = {
+    "game": 1,
+    "answer": 1,
+    "continue": 0,
+    "end": 5,          # + histórico da partida (1 insert, 2 upserts)
+    "start": 1,
+    "leaderboard": 1,
+    "home": 1,
+    "profile": 3,
+}
+
+Statement = namedtuple("Statement", "sql params ms")
+
+_active = contextvars.ContextVar("query_budget_logs", default=())
+_instrumented = set()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryLog:
+    __slots__ = ("statements",)
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(s.ms for s in self.statements)
+
+    def format(self) -> str:
+        lines = [f"{self.count} consulta(s), {self.total_ms:.1f} ms"]
+        for i, s in enumerate(self.statements, 1):
+            sql = " ".join(s.sql.split())
+            lines.append(f"  {i:>2}. [{s.ms:.1f} ms] {sql[:300]}  {s.params!r:.120}")
+        return "\n".join(lines)
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    if _active.get():
+        conn.info.setdefault("query_budget_t0", []).append(time.perf_counter())
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    logs = _active.get()
+    if not logs:
+        return
+    starts = conn.info.get("query_budget_t0")
+    ms = (time.perf_counter() - starts.pop()) * 1000 if starts else 0.0
+    stmt = Statement(statement, parameters, ms)
+    for log in logs:
+        log.statements.append(stmt)
+
+
+def instrument(*engines):
+    """Liga os contadores nos engines (idempotente; None é ignorado)."""
+    for eng in engines:
+        if eng is None or id(eng) in _instrumented:
+            continue
+        event.listen(eng, "before_cursor_execute", _before)
+        event.listen(eng, "after_cursor_execute", _after)
+        _instrumented.add(id(eng))
+
+
+def _default_engines():
+    from models import engine, replica_engine
+    return engine, replica_engine
+
+
+@contextmanager
+def count_queries(*engines):
+    """Conta as consultas do bloco; aninha (cada bloco vê as suas)."""
+    instrument(*(engines or _default_engines()))
+    log = QueryLog()
+    token = _active.set(_active.get() + (log,))
+    try:
+        yield log
+    finally:
+        _active.reset(token)
+
+
+def check(log: QueryLog, max_queries: int | None, label: str = "", max_ms: float | None = None):
+    over = []
+    if max_queries is not None and log.count > max_queries:
+        over.append(f"{log.count} consultas > orçamento {max_queries}")
+    if max_ms is not None and log.total_ms > max_ms:
+        over.append(f"{log.total_ms:.1f} ms de banco > orçamento {max_ms:g} ms")
+    if over:
+        raise QueryBudgetExceeded(f"{label or 'bloco'}: {'; '.join(over)}\n{log.format()}")
+
+
+@contextmanager
+def budget(max_queries: int | None, label: str = "", max_ms: float | None = None, engines=()):
+    with count_queries(*engines) as log:
+        yield log
+    check(log, max_queries, label, max_ms)
+
+
+def limit(max_queries: int | None, max_ms: float | None = None):
+    """Decorador: a função inteira (ex.: um teste) tem de caber no orçamento."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with budget(max_queries, fn.__name__, max_ms):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def budget_for(endpoint: str | None) -> int | None:
+    if endpoint is None:
+        return None
+    raw = os.getenv(f"QUERY_BUDGET_{endpoint.upper()}")
+    return int(raw) if raw else BUDGETS.get(endpoint)
+
+
+def install(app, *engines, mode: str = MODE):
+    """Conta as consultas de cada request e aplica BUDGETS por endpoint."""
+    if mode not in ("warn", "raise"):
+        return
+    from flask import g, request
+    instrument(*engines)
+
+    @app.before_request
+    def _query_budget_begin():
+        g.query_log = log = QueryLog()
+        g.query_budget_token = _active.set(_active.get() + (log,))
+
+    @app.after_request
+    def _query_budget_check(resp):
+        log = g.get("query_log")
+        if log is None:
+            return resp
+        resp.headers["X-DB-Queries"] = f"{log.count};{log.total_ms:.1f}"
+        try:
+            check(log, budget_for(request.endpoint), f"{request.method} {request.path}")
+        except QueryBudgetExceeded as e:
+            if mode == "raise":
+                raise
+            app.logger.warning("[QUERY] %s", e)
+        return resp
+
+    @app.teardown_request
+    def _query_budget_end(exc):
+        token = g.pop("query_budget_token", None)
+        g.pop("query_log", None)
+        if token is not None:
+            _active.reset(token)
+
@@ -0,0 +1,79 @@
+# question_cache.py
+# Banco de perguntas em memória, carregado uma vez.
+#
+# Com o gunicorn em --preload, load() roda no master antes do fork e os workers
+# herdam o dicionário por copy-on-write (o gc.freeze() do gunicorn.conf.py evita
+# que o coletor toque nessas páginas). Os objetos são tuplas imutáveis: o
+# template lê q.statement, q.opt_a... como faria com o modelo do SQLAlchemy.
+# Com `shared` (cache.Cache, namespace "q"), uma falta aqui consulta o cache
+# compartilhado antes do banco.
+from collections import namedtuple
+from sqlalchemy import select
+from models import SessionLocal, Question
+
+CachedQuestion = namedtuple(
+    "CachedQuestion",
+    "id theme statement opt_a opt_b opt_c opt_d correct image_url",
+)
+
+
+def _row(q) -> CachedQuestion:
+    return CachedQuestion(q.id, q.theme, q.statement, q.opt_a, q.opt_b,
+                          q.opt_c, q.opt_d, q.correct, q.image_url)
+
+
+class QuestionCache:
+    def __init__(self, session_factory=SessionLocal, shared=None):
+        self._session_factory = session_factory
+        self.shared = shared
+        self._by_id = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def load(self) -> int:
+        with self._session_factory() as db:
+            rows = db.execute(select(Question)).scalars().all()
+        # troca o dicionário inteiro (leitores nunca veem um meio-termo)
+        self._by_id = {q.id: _row(q) for q in rows}
+        return len(self._by_id)
+
+    def __contains__(self, qid):
+        return qid in self._by_id
+
+    def put(self, q: CachedQuestion):
+        self._by_id[q.id] = q
+
+    def get(self, db, qid: int, ask_shared: bool = True):
+        """
+        Pergunta do cache; se faltar (pergunta nova), busca em `db` e guarda.
+        ask_shared=False: o chamador já consultou o cache compartilhado.
+        """
+        q = self._by_id.get(qid)
+        if q is not None:
+            self.hits += 1
+            return q
+        self.misses += 1
+        if self.shared is not None and ask_shared:
+            q = self.shared.get("q", qid)
+            if q is not None:
+                self._by_id[qid] = q
+                return q
+        row = db.get(Question, qid)
+        if row is None:
+            return None
+        q = self._by_id[qid] = _row(row)
+        if self.shared is not None:
+            self.shared.set("q", qid, q)
+        return q
+
+    def invalidate(self, qid: int | None = None):
+        if qid is None:
+            self._by_id = {}
+        else:
+            self._by_id.pop(qid, None)
+
+    def stats(self) -> dict:
+        return {"size": len(self._by_id), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,166 @@
+# question_stats.py
+# Estatísticas por pergunta (exibida / acerto / erro / tempo esgotado + histograma
+# do tempo de resposta).
+#
+# No request só fazemos um deque.append (thread-safe no CPython, sem lock); um
+# thread por worker drena a fila a cada QSTATS_FLUSH_SECONDS e grava tudo num
+# único upsert em lote na tabela question_stats.
+#
+#   python question_stats.py [tema]   # relatório para calibrar o banco do seed.py
+import os
+import sys
+import threading
+from collections import deque
+from sqlalchemy import select
+from models import SessionLocal, Question, QuestionStat, dialect_insert
+
+FLUSH_SECONDS = float(os.getenv("QSTATS_FLUSH_SECONDS", "5"))
+
+# (limite em ms, coluna) do histograma de tempo de resposta
+TIME_BUCKETS = ((2000, "t_2s"), (4000, "t_4s"), (6000, "t_6s"),
+                (9000, "t_9s"), (12000, "t_12s"), (None, "t_15s"))
+COUNTERS = ("shown", "correct", "wrong", "timeout", "total_ms") + tuple(c for _, c in TIME_BUCKETS)
+
+
+def _bucket(ms: int) -> str:
+    for limit, col in TIME_BUCKETS:
+        if limit is None or ms < limit:
+            return col
+
+
+class QuestionStatsRecorder:
+    def __init__(self, session_factory=SessionLocal, flush_seconds=FLUSH_SECONDS, logger=None):
+        self._session_factory = session_factory
+        self.flush_seconds = flush_seconds
+        self.logger = logger
+        self._events = deque()
+        self._carry = {}          # agregado de um flush que falhou
+        self._pid = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # um thread de flush por processo (recriado após fork); o lock evita
+        # dois threads e uma fila zerada depois que outro já registrou eventos
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._events = deque()
+            self._pid = pid
+            threading.Thread(target=self._run, name="qstats-flush", daemon=True).start()
+
+    # ----- caminho quente -----
+    def shown(self, qid: int):
+        self._ensure_started()
+        self._events.append((qid, None, 0))
+
+    def answered(self, qid: int, outcome: str, elapsed_ms: int | None):
+        # outcome: "correct" | "wrong" | "timeout"
+        self._ensure_started()
+        self._events.append((qid, outcome, elapsed_ms if elapsed_ms is not None else -1))
+
+    # ----- flush -----
+    def _drain(self) -> dict:
+        agg, self._carry = self._carry, {}
+        pop = self._events.popleft
+        while True:
+            try:
+                qid, outcome, ms = pop()
+            except IndexError:
+                break
+            row = agg.get(qid)
+            if row is None:
+                row = agg[qid] = dict.fromkeys(COUNTERS, 0)
+            if outcome is None:
+                row["shown"] += 1
+                continue
+            row[outcome] += 1
+            # tempo esgotado não entra no tempo médio nem no histograma
+            # (report divide total_ms só pelas respostas dadas)
+            if ms >= 0 and outcome != "timeout":
+                row["total_ms"] += ms
+                row[_bucket(ms)] += 1
+        return agg
+
+    def flush(self) -> int:
+        agg = self._drain()
+        if not agg:
+            return 0
+        rows = [{"question_id": qid, **c} for qid, c in sorted(agg.items())]
+        db = self._session_factory()
+        try:
+            insert = dialect_insert(db.get_bind())
+            for i in range(0, len(rows), 50):  # 12 colunas × 50 linhas cabe no limite do SQLite
+                stmt = insert(QuestionStat).values(rows[i:i + 50])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[QuestionStat.question_id],
+                    set_={c: getattr(QuestionStat, c) + getattr(stmt.excluded, c) for c in COUNTERS},
+                )
+                db.execute(stmt)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            # guarda para somar no próximo flush
+            self._carry = agg
+            if self.logger:
+                self.logger.error(f"[QSTATS] flush falhou: {e}")
+            return 0
+        finally:
+            db.close()
+        return len(rows)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+
+def report(db, theme: str | None = None, min_answers: int = 1):
+    """Visão agregada: taxa de acerto, tempo médio e contagens por pergunta."""
+    answered = QuestionStat.correct + QuestionStat.wrong + QuestionStat.timeout
+    stmt = (
+        select(Question.id, Question.theme, Question.statement, QuestionStat)
+        .join(QuestionStat, QuestionStat.question_id == Question.id)
+        .where(answered >= min_answers)
+    )
+    if theme:
+        stmt = stmt.where(Question.theme == theme)
+    out = []
+    for qid, qtheme, statement, st in db.execute(stmt).all():
+        n = st.correct + st.wrong + st.timeout
+        timed = n - st.timeout
+        out.append({
+            "id": qid,
+            "theme": qtheme,
+            "statement": statement,
+            "shown": st.shown,
+            "answers": n,
+            "correct_rate": st.correct / n if n else 0.0,
+            "timeout_rate": st.timeout / n if n else 0.0,
+            "avg_ms": st.total_ms // timed if timed > 0 else None,
+            "hist": [getattr(st, c) for _, c in TIME_BUCKETS],
+        })
+    out.sort(key=lambda r: r["correct_rate"])
+    return out
+
+
+def main():
+    theme = sys.argv[1] if len(sys.argv) > 1 else None
+    with SessionLocal() as db:
+        rows = report(db, theme)
+    if not rows:
+        print("Sem estatísticas ainda.")
+        return
+    print(f"{'id':>5} {'tema':<10} {'resp':>5} {'acerto':>7} {'tempo':>6} {'médio':>7}  pergunta")
+    for r in rows:
+        avg = f"{r['avg_ms'] / 1000:.1f}s" if r["avg_ms"] is not None else "-"
+        print(f"{r['id']:>5} {r['theme']:<10} {r['answers']:>5} {r['correct_rate']:>7.0%} "
+              f"{r['timeout_rate']:>6.0%} {avg:>7}  {r['statement'][:60]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# replica.py
+# Roteamento de leituras para a réplica (DATABASE_REPLICA_URL).
+#
+# db_readonly() pergunta ao router qual sessionmaker usar: a réplica só é usada
+# se estiver saudável e dentro do orçamento de atraso (staleness); caso
+# contrário, e para quem acabou de escrever (read-your-writes), vai ao primário.
+#
+# A medição (conectar + consultar o atraso) roda num thread de fundo: o request
+# nunca paga o connect timeout de uma réplica fora do ar, só lê o último
+# resultado. Até a primeira medição terminar, as leituras vão ao primário.
+import os
+import threading
+import time
+from sqlalchemy import text
+
+STALENESS_BUDGET = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+HEALTH_TTL       = float(os.getenv("DB_REPLICA_HEALTH_TTL", "2"))
+STICKY_SECONDS   = float(os.getenv("DB_REPLICA_STICKY", "5"))
+
+# Atraso em segundos. now() - último replay cresce sozinho com o primário
+# ocioso; por isso, se a réplica está recebendo (streaming) e já aplicou tudo o
+# que recebeu, o atraso é 0. Sem receiver ativo vale o tempo desde o replay.
+_LAG_SQL = {
+    "postgresql": """
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+                 AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM (now() - pg_last_xact_replay_timestamp())), 0)
+        END
+    """,
+}
+
+
+class ReplicaRouter:
+    def __init__(self, primary_factory, replica_factory=None, replica_engine=None,
+                 max_lag=STALENESS_BUDGET, health_ttl=HEALTH_TTL, logger=None):
+        self.primary = primary_factory
+        self.replica = replica_factory
+        self._engine = replica_engine
+        self.max_lag = max_lag
+        self.health_ttl = health_ttl
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._thread = None
+        self._checked_at = 0.0
+        self._ok = False
+        self.lag = 0.0
+        self.reads = {"replica": 0, "primary": 0, "fallback": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.replica is not None
+
+    def _check(self):
+        sql = _LAG_SQL.get(self._engine.dialect.name)
+        try:
+            with self._engine.connect() as conn:
+                # sem medida de atraso no dialeto (ex.: SQLite local): só conectividade
+                lag = float(conn.execute(text(sql or "SELECT 0")).scalar() or 0)
+            ok = lag <= self.max_lag
+            if not ok and self.logger:
+                self.logger.warning(f"[REPLICA] atraso {lag:.1f}s acima de {self.max_lag}s; lendo do primário")
+        except Exception as e:
+            lag, ok = float("inf"), False
+            if self.logger:
+                self.logger.warning(f"[REPLICA] indisponível: {e}")
+        self.lag, self._ok = lag, ok
+
+    def check(self):
+        """Mede agora, no thread de quem chamou (startup e testes)."""
+        with self._lock:
+            self._check()
+            self._checked_at = time.monotonic()
+
+    def _probe(self):
+        try:
+            self._check()
+        finally:
+            self._checked_at = time.monotonic()
+            self._lock.release()
+
+    def healthy(self) -> bool:
+        if not self.enabled:
+            return False
+        if self._pid != os.getpid():
+            # fork com uma medição em andamento: o lock do pai não vale aqui
+            self._pid, self._lock = os.getpid(), threading.Lock()
+        if time.monotonic() - self._checked_at >= self.health_ttl and self._lock.acquire(blocking=False):
+            # uma medição por vez, em segundo plano; o request usa o último resultado
+            self._thread = threading.Thread(target=self._probe, name="replica-probe", daemon=True)
+            self._thread.start()
+        return self._ok
+
+    def mark_failed(self):
+        # erro usando a réplica: volta ao primário até a próxima checagem
+        self._ok = False
+        self._checked_at = time.monotonic()
+
+    def factory_for(self, sticky_until: float = 0.0):
+        if not self.enabled or time.time() < sticky_until:
+            self.reads["primary"] += 1
+            return self.primary, False
+        if not self.healthy():
+            self.reads["fallback"] += 1
+            return self.primary, False
+        self.reads["replica"] += 1
+        return self.replica, True
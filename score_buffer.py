@@ -0,0 +1,262 @@
+# score_buffer.py
+# Agregador write-behind das partidas terminadas.
+#
+# O end() só registra o evento aqui; os eventos são agrupados por nickname
+# (max para best_score, soma para total_points/games_played) e gravados num
+# único upsert multi-linha a cada SCORE_FLUSH_MS ou SCORE_FLUSH_EVENTS eventos.
+# Cada evento também vai para um arquivo de spill (um por processo), reaplicado
+# no start() do próximo worker se este morrer antes do flush. Na saída do processo
+# (atexit / worker_exit do gunicorn) o pendente é gravado e o spill apagado.
+# Flush que falha é retentado com backoff exponencial (até FLUSH_MAX_BACKOFF).
+import atexit
+import json
+import os
+import threading
+import time
+
+FLUSH_MS     = int(os.getenv("SCORE_FLUSH_MS", "300"))
+FLUSH_EVENTS = int(os.getenv("SCORE_FLUSH_EVENTS", "200"))
+SPILL_DIR    = os.getenv("SCORE_SPILL_DIR", "spill")
+SPILL_FSYNC  = os.getenv("SCORE_SPILL_FSYNC", "False").lower() == "true"
+FLUSH_MAX_BACKOFF = 30.0
+
+
+def _merge(into: dict, nick: str, best: int, total: int, games: int):
+    cur = into.get(nick)
+    if cur is None:
+        into[nick] = [best, total, games]
+    else:
+        cur[0] = max(cur[0], best)
+        cur[1] += total
+        cur[2] += games
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ScoreAggregator:
+    def __init__(self, flush_fn, flush_ms=FLUSH_MS, flush_events=FLUSH_EVENTS,
+                 spill_dir=SPILL_DIR, logger=None):
+        # flush_fn(batch) grava {nick: [best, total, games]} numa transação
+        self._flush_fn = flush_fn
+        self.flush_ms = flush_ms
+        self.flush_events = flush_events
+        self.spill_dir = spill_dir
+        self.logger = logger
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._inflight = {}
+        self._events = 0
+        self._spill = None
+        self._pid = None
+        self._thread = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.errors = 0
+
+    # ----- spill -----
+    def _spill_path(self, pid=None) -> str:
+        return os.path.join(self.spill_dir, f"scores-{pid or os.getpid()}.jsonl")
+
+    def _write_spill(self, rows):
+        if self._spill is None:
+            return
+        self._spill.write("".join(json.dumps([n, *v], separators=(",", ":")) + "\n" for n, v in rows))
+        self._spill.flush()
+        if SPILL_FSYNC:
+            os.fsync(self._spill.fileno())
+
+    def _recover(self):
+        # reaplica spills de processos que já morreram (o rename garante um dono só).
+        # Arquivo com o PID deste processo também é de um morto: depois de um
+        # restart do container o PID se repete. Entrega "pelo menos uma vez": um
+        # crash entre o commit e a remoção do ".flushing" reaplica aquele lote.
+        claimed_files = []
+        for name in os.listdir(self.spill_dir):
+            if not name.startswith("scores-"):
+                continue
+            try:
+                pid = int(name.split("-", 1)[1].split(".", 1)[0])
+            except ValueError:
+                continue
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            # o nome de origem entra no claim: "scores-P.jsonl" e
+            # "scores-P.jsonl.flushing" não podem cair no mesmo arquivo
+            claimed = self._spill_path() + f".claim-{name}"
+            try:
+                os.rename(os.path.join(self.spill_dir, name), claimed)
+            except FileNotFoundError:
+                continue
+            with open(claimed, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        nick, best, total, games = json.loads(line)
+                    except ValueError:
+                        continue
+                    _merge(self._pending, nick, best, total, games)
+            claimed_files.append(claimed)
+        return claimed_files
+
+    def _ensure_started(self):
+        # thread e arquivo por processo: recria após fork do gunicorn
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        self._pid = pid
+        self._pending, self._inflight, self._events = {}, {}, 0
+        self._failures, self._retry_at = 0, 0.0
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            claimed_files = self._recover()
+            self._spill = open(self._spill_path(), "a", encoding="utf-8")
+            # o que foi recuperado passa a viver no spill deste processo
+            self._write_spill(list(self._pending.items()))
+            for claimed in claimed_files:
+                self._drop(claimed)
+        except OSError as e:
+            self._spill = None
+            if self.logger:
+                self.logger.warning(f"[SCORES] spill desativado: {e}")
+        self._thread = threading.Thread(target=self._run, name="score-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ----- API -----
+    def start(self):
+        """Recupera spills órfãos e sobe o thread de flush (no início do worker)."""
+        with self._cond:
+            self._ensure_started()
+
+    def add(self, nickname: str, score: int):
+        with self._cond:
+            self._ensure_started()
+            _merge(self._pending, nickname, score, score, 1)
+            self._write_spill([(nickname, [score, score, 1])])
+            self._events += 1
+            if self._events >= self.flush_events:
+                self._cond.notify()
+
+    def pending_view(self) -> dict:
+        """Deltas ainda não gravados (inclui o lote em gravação)."""
+        with self._cond:
+            view = {n: list(v) for n, v in self._inflight.items()}
+            for n, v in self._pending.items():
+                _merge(view, n, *v)
+            return view
+
+    def overlay(self, rows: list[dict]) -> list[dict]:
+        """Aplica os deltas pendentes sobre linhas de _load_ranking e reordena."""
+        view = self.pending_view()
+        if not view:
+            return rows
+        out, seen = [], set()
+        for r in rows:
+            d = view.get(r["nickname"])
+            if d:
+                seen.add(r["nickname"])
+                r = {**r,
+                     "best_score": max(r["best_score"], d[0]),
+                     "total_points": r["total_points"] + d[1],
+                     "games_played": r["games_played"] + d[2]}
+            out.append(r)
+        for n, (best, total, games) in view.items():
+            if n not in seen:
+                out.append({"nickname": n, "best_score": best, "total_points": total, "games_played": games})
+        out.sort(key=lambda r: (-r["best_score"], r["nickname"]))
+        return out
+
+    def reset_week(self):
+        # reset semanal: o acumulado pendente pertence à semana que acabou.
+        # O spill é reescrito junto, senão um restart reaplicaria os totais velhos.
+        with self._cond:
+            for v in self._pending.values():
+                v[1] = v[2] = 0
+            if self._spill is not None and self._pid == os.getpid():
+                self._spill.seek(0)
+                self._spill.truncate()
+                self._write_spill(list(self._pending.items()))
+
+    def close(self):
+        """Flush final do processo; sem nada pendente, o spill vazio é apagado."""
+        if self._pid != os.getpid():
+            return
+        self.flush(force=True)
+        with self._cond:
+            if self._spill is not None and not self._pending:
+                self._spill.close()
+                self._spill = None
+                self._drop(self._spill_path())
+
+    def flush(self, force: bool = False) -> int:
+        with self._cond:
+            if not self._pending:
+                return 0
+            if not force and time.monotonic() < self._retry_at:
+                return 0
+            batch, self._pending, self._events = self._pending, {}, 0
+            self._inflight = batch
+            # o lote fica no arquivo ".flushing" até o commit; o spill novo
+            # recebe só o que chegar depois
+            flushing = self._rotate_spill()
+        try:
+            self._flush_fn(batch)
+        except Exception as e:
+            with self._cond:
+                for n, v in batch.items():
+                    _merge(self._pending, n, *v)
+                self._write_spill(list(batch.items()))
+                self._inflight = {}
+                self.errors += 1
+                self._failures += 1
+                backoff = min(self.flush_ms / 1000 * 2 ** self._failures, FLUSH_MAX_BACKOFF)
+                self._retry_at = time.monotonic() + backoff
+            self._drop(flushing)
+            if self.logger:
+                self.logger.error(f"[SCORES] flush falhou ({len(batch)} linhas, "
+                                  f"nova tentativa em {backoff:.1f}s): {e}")
+            return 0
+        with self._cond:
+            self._inflight = {}
+            self._failures, self._retry_at = 0, 0.0
+            self.flushes += 1
+            self.flushed_rows += len(batch)
+        self._drop(flushing)
+        return len(batch)
+
+    def _rotate_spill(self):
+        if self._spill is None:
+            return None
+        path = self._spill_path()
+        self._spill.close()
+        os.replace(path, path + ".flushing")
+        self._spill = open(path, "a", encoding="utf-8")
+        return path + ".flushing"
+
+    @staticmethod
+    def _drop(path):
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait(timeout=self.flush_ms / 1000)
+            self.flush()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"pending": len(self._pending), "events": self._events,
+                    "flushes": self.flushes, "rows": self.flushed_rows, "errors": self.errors}
@@ -0,0 +1,133 @@
+# score_hist.py
+# Histograma das pontuações do ranking: 51 contadores para best_score (0..50)
+# e faixas de TOTAL_WIDTH pontos para o total semanal. Atualizado em cada
+# flush do score_buffer (na mesma transação do upsert) e refeito no reset
+# semanal. Percentil e gráfico saem daqui, sem varrer a tabela leaderboard.
+import os
+import threading
+import time
+from sqlalchemy import select, func, delete
+from models import Leaderboard, ScoreHistogram, dialect_insert
+
+MAX_BEST      = 50
+TOTAL_WIDTH   = 10
+TOTAL_BUCKETS = 100          # a última faixa acumula tudo acima de 990
+CACHE_TTL     = float(os.getenv("SCORE_HIST_TTL", "5"))
+
+
+def bucket_of(kind: str, value: int) -> int:
+    value = max(int(value or 0), 0)
+    if kind == "best":
+        return min(value, MAX_BEST)
+    return min(value // TOTAL_WIDTH, TOTAL_BUCKETS - 1)
+
+
+def bucket_range(kind: str, bucket: int) -> tuple[int, int | None]:
+    """Valores [lo, hi) de uma faixa; a última não tem teto (hi None)."""
+    last = MAX_BEST if kind == "best" else TOTAL_BUCKETS - 1
+    width = 1 if kind == "best" else TOTAL_WIDTH
+    return bucket * width, (None if bucket >= last else (bucket + 1) * width)
+
+
+def moves_for(old: tuple[int, int] | None, new: tuple[int, int]) -> dict:
+    """Deltas de contagem quando um jogador vai de (best, total) antigo para o novo."""
+    moves = {}
+    for i, kind in enumerate(("best", "total")):
+        nb = bucket_of(kind, new[i])
+        if old is not None:
+            ob = bucket_of(kind, old[i])
+            if ob == nb:
+                continue
+            moves[(kind, ob)] = moves.get((kind, ob), 0) - 1
+        moves[(kind, nb)] = moves.get((kind, nb), 0) + 1
+    return moves
+
+
+def apply_moves(db, moves: dict):
+    moves = {k: d for k, d in moves.items() if d}
+    if not moves:
+        return
+    insert = dialect_insert(db.get_bind())
+    rows = [{"kind": k, "bucket": b, "count": d} for (k, b), d in sorted(moves.items())]
+    stmt = insert(ScoreHistogram).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ScoreHistogram.kind, ScoreHistogram.bucket],
+        set_={"count": ScoreHistogram.count + stmt.excluded.count},
+    )
+    db.execute(stmt)
+
+
+def _insert_counts(db, kind: str, expr):
+    merged = {}
+    for b, n in db.execute(select(expr, func.count()).select_from(Leaderboard).group_by(expr)).all():
+        b = min(max(int(b or 0), 0), MAX_BEST if kind == "best" else TOTAL_BUCKETS - 1)
+        merged[b] = merged.get(b, 0) + n
+    if merged:
+        db.execute(dialect_insert(db.get_bind())(ScoreHistogram).values(
+            [{"kind": kind, "bucket": b, "count": n} for b, n in sorted(merged.items())]))
+
+
+def rebuild(db, kinds=("best", "total")):
+    """Refaz o histograma a partir da tabela (boot inicial e reset semanal)."""
+    for kind in kinds:
+        db.execute(delete(ScoreHistogram).where(ScoreHistogram.kind == kind))
+        if kind == "best":
+            _insert_counts(db, kind, Leaderboard.best_score)
+        else:
+            # `//` gera divisão inteira nos dois dialetos; `/` no SQLAlchemy 2 é
+            # divisão real (total_points / (? + 0.0))
+            _insert_counts(db, kind, Leaderboard.total_points // TOTAL_WIDTH)
+
+
+def ensure(db):
+    # primeira execução: tabela vazia mas ranking já existente
+    if db.execute(select(ScoreHistogram.kind).limit(1)).first() is None:
+        rebuild(db)
+
+
+class HistogramCache:
+    """Leitura dos contadores com TTL curto: uma consulta pequena a cada CACHE_TTL s."""
+
+    def __init__(self, session_factory, ttl: float = CACHE_TTL):
+        self._session_factory = session_factory
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = None
+        self._at = 0.0
+
+    def counts(self) -> dict:
+        now = time.monotonic()
+        if self._data is None or now - self._at >= self.ttl:
+            with self._lock:
+                if self._data is None or now - self._at >= self.ttl:
+                    data = {"best": [0] * (MAX_BEST + 1), "total": [0] * TOTAL_BUCKETS}
+                    with self._session_factory() as db:
+                        for kind, b, n in db.execute(
+                            select(ScoreHistogram.kind, ScoreHistogram.bucket, ScoreHistogram.count)
+                        ).all():
+                            if kind in data and 0 <= b < len(data[kind]):
+                                data[kind][b] = max(n, 0)
+                    self._data, self._at = data, time.monotonic()
+        return self._data
+
+    def invalidate(self):
+        self._at = 0.0
+
+
+def chart(kind: str, counts: list[int], bars: int = 10) -> list[dict]:
+    """Agrupa as faixas em barras para o gráfico da página de ranking."""
+    if kind == "best":
+        width, step, used = 5, 1, len(counts)           # 0–4, 5–9, ..., 50
+    else:
+        used = max((i for i, n in enumerate(counts) if n), default=0) + 1
+        width, step = max(1, -(-used // bars)), TOTAL_WIDTH
+    groups = []
+    for start in range(0, used, width):
+        end = min(start + width, used)
+        lo, hi = start * step, end * step - 1
+        label = str(lo) if hi <= lo else f"{lo}–{hi}"
+        groups.append({"label": label, "count": sum(counts[start:end])})
+    peak = max((g["count"] for g in groups), default=0) or 1
+    for g in groups:
+        g["pct"] = round(100 * g["count"] / peak)
+    return groups
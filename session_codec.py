@@ -0,0 +1,317 @@
+# session_codec.py
+# Sessão Flask em cookie com codificação binária compacta.
+#
+# O formato padrão do Flask é JSON com tags → zlib → itsdangerous (HMAC-SHA1)
+# → base64, refeito a cada request que mexe na sessão. Aqui:
+#   - escalares com tag de 1 byte e tamanho mínimo (struct);
+#   - listas só de inteiros (queue_ids/asked_ids) viram um array.array (B/H/I/q)
+#     serializado em C, sem parsing número a número;
+#   - MAC BLAKE2b com chave (16 bytes) e timestamp de 4 bytes;
+#   - sessão não modificada não é recodificada: o refresh do cookie só re-assina
+#     os bytes já lidos.
+# Cookies no formato antigo continuam sendo lidos (migram no próximo save).
+#
+#   python session_codec.py    # compara tamanho/tempo com o formato padrão
+import base64
+import hashlib
+import hmac
+import struct
+import time
+from array import array
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface
+
+PREFIX = "b1."
+MAC_SIZE = 16
+
+_u8 = struct.Struct("<B")
+_u16 = struct.Struct("<H")
+_i32 = struct.Struct("<i")
+_u32 = struct.Struct("<I")
+_i64 = struct.Struct("<q")
+_f64 = struct.Struct("<d")
+
+_ARRAY_CODES = (("B", 0, 0xFF), ("H", 0, 0xFFFF), ("I", 0, 0xFFFFFFFF),
+                ("q", -(1 << 63), (1 << 63) - 1))
+
+# strings conhecidas (chaves da sessão e valores frequentes) viram 1 byte.
+# SÓ ACRESCENTE no fim: a posição é o código gravado nos cookies já emitidos.
+INTERNED = (
+    "_user_id", "_fresh", "_id", "_flashes", "_permanent", "_remember", "_remember_seconds",
+    "nickname", "theme", "score", "queue_ids", "asked_ids", "roulette_shown",
+    "current_qid", "current_token", "current_shown_at", "ended", "feedback_state",
+    "qid", "was_correct", "timed_out", "picked", "correct", "post_auth_next", "rw_until",
+    "A", "B", "C", "D", "ok", "warn", "error", "message",
+    "Esportes", "TV/Cinema", "Jogos", "Música", "Lógica", "História", "Diversos",
+)
+_INTERN_CODE = {k: i for i, k in enumerate(INTERNED)}
+_HEX = frozenset("0123456789abcdef")
+
+
+# ---------- codificação ----------
+def _enc(v, out: list):
+    t = type(v)
+    if v is None:
+        out.append(b"N")
+    elif t is bool:
+        out.append(b"T" if v else b"F")
+    elif t is int:
+        if -128 <= v < 128:
+            out.append(b"b" + struct.pack("<b", v))
+        elif -(1 << 31) <= v < (1 << 31):
+            out.append(b"i" + _i32.pack(v))
+        else:
+            out.append(b"q" + _i64.pack(v))
+    elif isinstance(v, str):
+        v = str(v)    # subclasses (ex.: markupsafe.Markup do flash) viram str
+        code = _INTERN_CODE.get(v)
+        if code is not None:
+            out.append(b"K" + _u8.pack(code))
+            return
+        if 16 <= len(v) < 512 and not len(v) % 2 and _HEX.issuperset(v):
+            # hash hex (ex.: _id do Flask-Login) ocupa metade em bytes
+            out.append(b"h" + _u8.pack(len(v) // 2) + bytes.fromhex(v))
+            return
+        raw = v.encode("utf-8")
+        if len(raw) < 256:
+            out.append(b"s" + _u8.pack(len(raw)) + raw)
+        else:
+            out.append(b"S" + _u32.pack(len(raw)) + raw)
+    elif t is float:
+        out.append(b"d" + _f64.pack(v))
+    elif t is list or t is tuple:
+        if t is list and v and len(v) < 0x10000 and all(type(x) is int for x in v):
+            lo, hi = min(v), max(v)
+            for code, cmin, cmax in _ARRAY_CODES:
+                if cmin <= lo and hi <= cmax:
+                    out.append(b"A" + code.encode() + _u16.pack(len(v)) + array(code, v).tobytes())
+                    return
+        if len(v) >= 0x10000:
+            raise TypeError("lista grande demais para a sessão")
+        out.append((b"l" if t is list else b"t") + _u16.pack(len(v)))
+        for x in v:
+            _enc(x, out)
+    elif t is dict:
+        if len(v) >= 0x10000:
+            raise TypeError("dict grande demais para a sessão")
+        out.append(b"m" + _u16.pack(len(v)))
+        for k, x in v.items():
+            _enc(k, out)
+            _enc(x, out)
+    elif t is bytes:
+        out.append(b"x" + _u32.pack(len(v)) + v)
+    else:
+        raise TypeError(f"tipo não suportado na sessão: {t.__name__}")
+
+
+def encode(data: dict) -> bytes:
+    out = []
+    _enc(data, out)
+    return b"".join(out)
+
+
+# ---------- decodificação ----------
+def _dec(buf: bytes, i: int):
+    tag = buf[i]
+    i += 1
+    if tag == 0x4E:    # N
+        return None, i
+    if tag == 0x54:    # T
+        return True, i
+    if tag == 0x46:    # F
+        return False, i
+    if tag == 0x62:    # b
+        return struct.unpack_from("<b", buf, i)[0], i + 1
+    if tag == 0x69:    # i
+        return _i32.unpack_from(buf, i)[0], i + 4
+    if tag == 0x71:    # q
+        return _i64.unpack_from(buf, i)[0], i + 8
+    if tag == 0x73:    # s
+        n = buf[i]
+        return buf[i + 1:i + 1 + n].decode("utf-8"), i + 1 + n
+    if tag == 0x53:    # S
+        n = _u32.unpack_from(buf, i)[0]
+        return buf[i + 4:i + 4 + n].decode("utf-8"), i + 4 + n
+    if tag == 0x4B:    # K
+        return INTERNED[buf[i]], i + 1
+    if tag == 0x68:    # h
+        n = buf[i]
+        return buf[i + 1:i + 1 + n].hex(), i + 1 + n
+    if tag == 0x64:    # d
+        return _f64.unpack_from(buf, i)[0], i + 8
+    if tag == 0x41:    # A
+        code = chr(buf[i])
+        n = _u16.unpack_from(buf, i + 1)[0]
+        arr = array(code)
+        end = i + 3 + n * arr.itemsize
+        arr.frombytes(buf[i + 3:end])
+        return arr.tolist(), end
+    if tag == 0x6C or tag == 0x74:    # l / t
+        n = _u16.unpack_from(buf, i)[0]
+        i += 2
+        items = []
+        for _ in range(n):
+            x, i = _dec(buf, i)
+            items.append(x)
+        return (items if tag == 0x6C else tuple(items)), i
+    if tag == 0x6D:    # m
+        n = _u16.unpack_from(buf, i)[0]
+        i += 2
+        d = {}
+        for _ in range(n):
+            k, i = _dec(buf, i)
+            d[k], i = _dec(buf, i)
+        return d, i
+    if tag == 0x78:    # x
+        n = _u32.unpack_from(buf, i)[0]
+        return bytes(buf[i + 4:i + 4 + n]), i + 4 + n
+    raise ValueError(f"tag inválida: {tag:#x}")
+
+
+def decode(buf: bytes) -> dict:
+    data, end = _dec(buf, 0)
+    if end != len(buf) or type(data) is not dict:
+        raise ValueError("payload de sessão inválido")
+    return data
+
+
+# ---------- cookie ----------
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _unb64(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+
+class BinarySession(SecureCookieSession):
+    # bytes do payload como chegaram no cookie (evita recodificar no refresh)
+    raw = None
+
+
+class BinarySessionInterface(SecureCookieSessionInterface):
+    session_class = BinarySession
+
+    def _key(self, app) -> bytes:
+        secret = app.secret_key
+        if isinstance(secret, str):
+            secret = secret.encode("utf-8")
+        return hashlib.sha256(b"session-b1:" + secret).digest()
+
+    def _mac(self, key: bytes, body: bytes) -> bytes:
+        return hashlib.blake2b(body, key=key, digest_size=MAC_SIZE).digest()
+
+    def sign(self, app, payload: bytes) -> str:
+        body = _u32.pack(int(time.time())) + payload
+        return PREFIX + _b64(body + self._mac(self._key(app), body))
+
+    def unsign(self, app, val: str) -> bytes | None:
+        try:
+            raw = _unb64(val[len(PREFIX):])
+        except (ValueError, TypeError):
+            return None
+        if len(raw) < 4 + MAC_SIZE:
+            return None
+        body, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+        if not hmac.compare_digest(mac, self._mac(self._key(app), body)):
+            return None
+        issued = _u32.unpack_from(body)[0]
+        if time.time() - issued > app.permanent_session_lifetime.total_seconds():
+            return None
+        return body[4:]
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        val = request.cookies.get(self.get_cookie_name(app))
+        if not val:
+            return self.session_class()
+        if not val.startswith(PREFIX):
+            # cookie no formato padrão do Flask (antes da troca)
+            legacy = super().open_session(app, request)
+            sess = self.session_class(dict(legacy or {}))
+            sess.modified = bool(sess)   # regrava já no formato novo
+            return sess
+        payload = self.unsign(app, val)
+        if payload is None:
+            return self.session_class()
+        try:
+            sess = self.session_class(decode(payload))
+        except (ValueError, struct.error, UnicodeDecodeError, IndexError):
+            return self.session_class()
+        sess.raw = payload
+        return sess
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+        extra = {}
+        if hasattr(self, "get_cookie_partitioned"):
+            extra["partitioned"] = self.get_cookie_partitioned(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.modified:
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly, **extra)
+                response.vary.add("Cookie")
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        payload = session.raw if (not session.modified and session.raw is not None) else encode(dict(session))
+        response.set_cookie(
+            name,
+            self.sign(app, payload),
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            samesite=samesite,
+            **extra,
+        )
+        response.vary.add("Cookie")
+
+
+def _bench(n: int = 20000):
+    """Sessão típica do meio de uma partida: formato padrão x binário."""
+    import random
+    import timeit
+    from flask import Flask
+
+    app = Flask(__name__)
+    app.secret_key = "bench"
+    ids = random.sample(range(1, 400), 50)
+    data = {
+        "_user_id": "Lucas Silva", "_fresh": True, "_id": hashlib.sha512(b"user-agent").hexdigest(),
+        "nickname": "Lucas Silva", "theme": "Música", "score": 0,
+        "queue_ids": ids, "asked_ids": ids[:20], "roulette_shown": True,
+        "current_qid": ids[20], "current_token": "Qm9vbGVhbkxvZ2ljMTIz", "current_shown_at": int(time.time() * 1000),
+        "feedback_state": {"qid": ids[19], "was_correct": True, "timed_out": False, "picked": "B", "correct": "B"},
+    }
+    legacy = SecureCookieSessionInterface().get_signing_serializer(app)
+    iface = BinarySessionInterface()
+    old = legacy.dumps(data)
+    new = iface.sign(app, encode(data))
+    assert decode(iface.unsign(app, new)) == data
+    t_old_enc = timeit.timeit(lambda: legacy.dumps(data), number=n) / n * 1e6
+    t_old_dec = timeit.timeit(lambda: legacy.loads(old), number=n) / n * 1e6
+    t_new_enc = timeit.timeit(lambda: iface.sign(app, encode(data)), number=n) / n * 1e6
+    t_new_dec = timeit.timeit(lambda: decode(iface.unsign(app, new)), number=n) / n * 1e6
+    return {
+        "cookie_bytes": (len(old), len(new)),
+        "encode_us": (round(t_old_enc, 1), round(t_new_enc, 1)),
+        "decode_us": (round(t_old_dec, 1), round(t_new_dec, 1)),
+    }
+
+
+if __name__ == "__main__":
+    for k, (old, new) in _bench().items():
+        print(f"{k:<13} padrão={old:<8} binário={new:<8} ({new / old:.0%})")
@@ -0,0 +1,173 @@
+# settings.py
+# Configuração lida uma vez e trocada inteira (snapshot imutável).
+#
+# O caminho do request só lê atributos de `settings.current` (ex.: o
+# maintenance_gate olha `current.maintenance`), sem os.getenv nem montar sets.
+# Recarregar gera um snapshot novo a partir de:
+#   1. variáveis de ambiente (e do .env, relido com override);
+#   2. overrides no banco: linhas da tabela meta com chave "setting:<VAR>".
+# Os overrides são consultados por um thread em cada worker a cada
+# SETTINGS_POLL_SECONDS, então ligar a manutenção vale para o cluster todo em
+# segundos, sem redeploy:
+#
+#   python settings.py set MAINTENANCE_MODE true
+#   python settings.py unset MAINTENANCE_MODE
+#   python settings.py show
+#
+# SIGHUP também recarrega quando o app roda sozinho (python app.py). Sob o
+# gunicorn com preload, HUP no master recria os workers mas NÃO reimporta o
+# app: cada worker novo relê o .env só para este snapshot (app.after_fork).
+# O resto da configuração lida na importação (banco, OAuth, pools, ...) só
+# muda reiniciando o master.
+import os
+import signal
+import sys
+import threading
+import time
+from email.utils import parseaddr
+from typing import NamedTuple
+from dotenv import load_dotenv
+from sqlalchemy import select
+
+META_PREFIX  = "setting:"
+POLL_SECONDS = float(os.getenv("SETTINGS_POLL_SECONDS", "5"))
+
+# endpoints liberados durante a manutenção (assets/callback OAuth/preview)
+MAINTENANCE_ALLOWED = frozenset({
+    "static",
+    "healthcheck",
+    "auth_google",
+    "auth_google_cb",
+    "__preview_on",
+    "__preview_off",
+})
+
+
+def _bool(v: str | None, default: bool = False) -> bool:
+    if v is None:
+        return default
+    return v.strip().lower() in ("1", "true", "yes", "on")
+
+
+class Settings(NamedTuple):
+    maintenance: bool
+    maintenance_allowed: frozenset
+    preview_token: str
+    brevo_api_key: str
+    mail_sender: str                 # "Nome <email>" ou só o e-mail
+    mail_sender_name: str | None
+    mail_sender_email: str | None
+    preferred_url_scheme: str
+    battle_ws_url: str
+    profile_sample_rate: float       # fração dos requests perfilados (0 = só sob demanda)
+    version: int = 0                 # incrementa a cada reload (útil em logs)
+
+    @classmethod
+    def from_env(cls, env, version: int = 0) -> "Settings":
+        sender = env.get("MAIL_DEFAULT_SENDER", "") or env.get("MAIL_USERNAME", "")
+        name, email = parseaddr(sender) if sender else ("", "")
+        extra = frozenset(e.strip() for e in env.get("MAINTENANCE_ALLOWED", "").split(",") if e.strip())
+        return cls(
+            maintenance=_bool(env.get("MAINTENANCE_MODE")),
+            maintenance_allowed=MAINTENANCE_ALLOWED | extra,
+            preview_token=env.get("PREVIEW_TOKEN", ""),
+            brevo_api_key=env.get("BREVO_API_KEY", "").strip(),
+            mail_sender=sender,
+            mail_sender_name=name or None,
+            mail_sender_email=((email or sender).strip() or None) if sender else None,
+            preferred_url_scheme=env.get("PREFERRED_URL_SCHEME", "https"),
+            battle_ws_url=env.get("BATTLE_WS_URL", "ws://localhost:8765"),
+            profile_sample_rate=float(env.get("PROFILE_SAMPLE_RATE", "0") or 0),
+            version=version,
+        )
+
+
+def read_overrides(db) -> dict:
+    from models import Meta
+    rows = db.execute(select(Meta.key, Meta.value).where(Meta.key.like(META_PREFIX + "%"))).all()
+    return {k[len(META_PREFIX):]: v for k, v in rows}
+
+
+class SettingsStore:
+    def __init__(self, session_factory=None, poll_seconds=POLL_SECONDS, logger=None):
+        self._session_factory = session_factory
+        self.poll_seconds = poll_seconds
+        self.logger = logger
+        self._overrides = {}
+        self._pid = None
+        self._lock = threading.Lock()
+        self.current = Settings.from_env(os.environ)
+
+    def _rebuild(self):
+        prev = self.current
+        cur = Settings.from_env({**os.environ, **self._overrides}, prev.version + 1)
+        if cur[:-1] != prev[:-1]:
+            self.current = cur
+            if self.logger:
+                changed = [f for f in Settings._fields[:-1] if getattr(cur, f) != getattr(prev, f)]
+                self.logger.info("[SETTINGS] v%d: %s", cur.version, ", ".join(changed))
+
+    def reload(self, reread_env: bool = True):
+        """Relê o .env (SIGHUP) e os overrides do banco, e troca o snapshot."""
+        if reread_env:
+            load_dotenv(override=True)
+        if self._session_factory is not None:
+            try:
+                with self._session_factory() as db:
+                    self._overrides = read_overrides(db)
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"[SETTINGS] overrides indisponíveis: {e}")
+        self._rebuild()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            self.reload(reread_env=False)
+
+    def start(self):
+        # um thread de polling por processo (recriado após fork)
+        pid = os.getpid()
+        if self._pid == pid or self._session_factory is None or self.poll_seconds <= 0:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            threading.Thread(target=self._run, name="settings-poll", daemon=True).start()
+
+    def install_sighup(self) -> bool:
+        # só o thread principal pode instalar handlers
+        if threading.current_thread() is not threading.main_thread() or not hasattr(signal, "SIGHUP"):
+            return False
+        signal.signal(signal.SIGHUP, lambda *_: self.reload())
+        return True
+
+
+def main(argv) -> int:
+    from models import SessionLocal, Meta
+    wanted = {"set": 4, "unset": 3, "show": 2}
+    if len(argv) < 2 or len(argv) != wanted.get(argv[1]):
+        print("uso: python settings.py set VAR valor | unset VAR | show")
+        return 2
+    with SessionLocal() as db:
+        if argv[1] == "show":
+            for k, v in sorted(read_overrides(db).items()):
+                print(f"{k}={v}")
+            return 0
+        key = META_PREFIX + argv[2]
+        row = db.get(Meta, key)
+        if argv[1] == "set":
+            if row:
+                row.value = argv[3]
+            else:
+                db.add(Meta(key=key, value=argv[3]))
+        elif row:
+            db.delete(row)
+        db.commit()
+    print(f"ok (workers aplicam em até {POLL_SECONDS:g}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,285 @@
+# shm_cache.py
+# Caches compartilhados entre os workers do gunicorn (um por host).
+#
+# Cada cache é um segmento de multiprocessing.shared_memory com um seqlock no
+# cabeçalho: o escritor deixa o contador ímpar enquanto grava e par quando
+# termina; o leitor lê o contador, os dados e o contador de novo — se mudou (ou
+# estava ímpar), descarta e tenta outra vez. Leitura sem IPC e sem lock.
+#
+# Só um processo escreve: quem conseguir o flock de SHM_LOCK_PATH (os outros
+# tentam de novo a cada ciclo; se o escritor morre, o lock é liberado).
+#
+#   SharedDeckIndex  faixas de dificuldade por tema (ids em array uint32, lidos
+#                    direto do segmento, sem cópia por worker)
+#
+# O segmento sobrevive a um deploy; as faixas levam a GENERATION de quem as
+# publicou e um leitor ignora as de outra geração (ids de um banco antigo).
+# O gunicorn.conf.py sorteia SHM_GENERATION no master, herdado pelos workers.
+#   SharedTop        top N do ranking nos dois modos (JSON pequeno)
+import fcntl
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from array import array
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+ENABLED   = os.getenv("SHM_CACHE", "True").lower() == "true"
+# nome por instalação: dois apps no mesmo host não compartilham segmentos
+PREFIX    = os.getenv("SHM_PREFIX") or "quiz-" + hashlib.blake2b(
+    os.path.dirname(os.path.abspath(__file__)).encode(), digest_size=4).hexdigest()
+LOCK_PATH = os.getenv("SHM_LOCK_PATH") or os.path.join(tempfile.gettempdir(), PREFIX + ".lock")
+DECK_BYTES = int(os.getenv("SHM_DECK_BYTES", str(1 << 20)))
+TOP_BYTES  = int(os.getenv("SHM_TOP_BYTES", str(64 << 10)))
+TOP_REFRESH = float(os.getenv("SHM_TOP_REFRESH", "2"))
+GENERATION = os.getenv("SHM_GENERATION") or uuid.uuid4().hex
+
+_HEADER = struct.Struct("<QI4x")   # seq, tamanho do payload
+_U32 = struct.Struct("<I")
+_RETRIES = 5
+
+TopRow = namedtuple("TopRow", "nickname best_score total_points games_played")
+
+
+def _open(name: str, size: int, create: bool):
+    try:
+        if create:
+            try:
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                # segmento de uma execução anterior: reaproveita se couber
+                shm = shared_memory.SharedMemory(name=name)
+                if shm.size < size:
+                    shm.close()
+                    shared_memory.SharedMemory(name=name).unlink()
+                    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return None
+    # o resource_tracker apagaria o segmento quando este worker saísse;
+    # o segmento deve sobreviver aos workers (o escritor pode trocar)
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+class WriterLock:
+    """flock não bloqueante; um processo por host fica com ele até morrer."""
+
+    def __init__(self, path: str = LOCK_PATH):
+        self.path = path
+        self._fd = None
+        self._pid = None
+
+    def try_acquire(self) -> bool:
+        pid = os.getpid()
+        if self._pid == pid:
+            return True
+        # fd herdado do fork não vale: o lock é do processo que o abriu
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd, self._pid = fd, pid
+        return True
+
+    @property
+    def held(self) -> bool:
+        return self._pid == os.getpid()
+
+
+class SharedBlob:
+    """Segmento com seqlock: um escritor, leitores sem lock."""
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self._shm = None
+        self.writes = 0
+        self.retries = 0
+
+    def _segment(self, create: bool = False):
+        if self._shm is None:
+            self._shm = _open(self.name, self.size + _HEADER.size, create)
+        return self._shm
+
+    def seq(self) -> int | None:
+        shm = self._segment()
+        if shm is None:
+            return None
+        return _HEADER.unpack_from(shm.buf)[0]
+
+    def payload(self):
+        """memoryview do payload atual (validar com seq() depois de usar)."""
+        shm = self._segment()
+        n = _HEADER.unpack_from(shm.buf)[1]
+        return shm.buf[_HEADER.size:_HEADER.size + n]
+
+    def write(self, data: bytes):
+        if len(data) > self.size:
+            raise ValueError(f"{self.name}: {len(data)} bytes não cabem em {self.size}")
+        buf = self._segment(create=True).buf
+        seq = _HEADER.unpack_from(buf)[0]
+        seq += 1 if seq % 2 == 0 else 0          # escritor anterior morreu no meio
+        struct.pack_into("<Q", buf, 0, seq)      # ímpar: gravando
+        buf[_HEADER.size:_HEADER.size + len(data)] = data
+        _HEADER.pack_into(buf, 0, seq, len(data))
+        struct.pack_into("<Q", buf, 0, seq + 1)  # par: pronto
+        self.writes += 1
+
+    def read(self) -> tuple[int, bytes] | None:
+        """(seq, cópia do payload) consistente, ou None se não há dados."""
+        for _ in range(_RETRIES):
+            s1 = self.seq()
+            if not s1:
+                return None
+            if s1 % 2:
+                self.retries += 1
+                time.sleep(0)
+                continue
+            data = bytes(self.payload())
+            if self.seq() == s1:
+                return s1, data
+            self.retries += 1
+        return None
+
+
+class SharedDeckIndex:
+    """
+    Layout: u32 tamanho do cabeçalho |
+    JSON {"gen": geração, "index": {tema: [[início, n], ...]}} |
+    array uint32 com os ids de todas as faixas, em sequência.
+    """
+
+    def __init__(self, name: str = PREFIX + "-deck", size: int = DECK_BYTES,
+                 generation: str = GENERATION):
+        self.blob = SharedBlob(name, size)
+        self.generation = generation
+        # (seq, índice decodificado ou None se de outra geração, início dos ids);
+        # trocado inteiro, então threads do mesmo worker nunca veem metade
+        self._decoded = (None, None, 0)
+
+    def publish(self, tiers: dict):
+        index, ids = {}, array("I")
+        for theme, bands in tiers.items():
+            index[theme] = []
+            for band in bands:
+                index[theme].append((len(ids), len(band)))
+                ids.extend(band)
+        head = json.dumps({"gen": self.generation, "index": index}, separators=(",", ":")).encode("utf-8")
+        head += b" " * (-len(head) % 4)   # ids alinhados em 4 bytes
+        self.blob.write(_U32.pack(len(head)) + head + ids.tobytes())
+
+    def snapshot(self):
+        """(seq, {tema: (faixa, ...)}) com faixas como memoryview; None se vazio."""
+        for _ in range(_RETRIES):
+            seq = self.blob.seq()
+            if not seq:
+                return None
+            if seq % 2:
+                time.sleep(0)
+                continue
+            view = self.blob.payload()
+            decoded = self._decoded
+            if decoded[0] != seq:
+                n = _U32.unpack_from(view)[0]
+                try:
+                    head = json.loads(bytes(view[4:4 + n]))
+                except ValueError:
+                    head = None
+                if self.blob.seq() != seq:
+                    continue
+                index = head.get("index") if isinstance(head, dict) and head.get("gen") == self.generation else None
+                self._decoded = decoded = (seq, index, 4 + n)
+            _, index, start_ids = decoded
+            if index is None:
+                return None    # segmento de outro deploy: espera o escritor republicar
+            ids = view[start_ids:].cast("I")
+            return seq, {
+                theme: tuple(ids[start:start + n] for start, n in bands)
+                for theme, bands in index.items()
+            }
+        return None
+
+    def valid(self, seq: int) -> bool:
+        return self.blob.seq() == seq
+
+
+class SharedTop:
+    """Top N dos dois modos do ranking; decodificado uma vez por versão."""
+
+    def __init__(self, name: str = PREFIX + "-top", size: int = TOP_BYTES):
+        self.blob = SharedBlob(name, size)
+        self._seq = None
+        self._rows = None
+        self.published_at = 0.0
+
+    def publish(self, rows_by_mode: dict):
+        data = {"at": time.time(),
+                "rows": {m: [tuple(r) for r in rows] for m, rows in rows_by_mode.items()}}
+        self.blob.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+    def rows(self, mode: str, max_age: float | None = None) -> list | None:
+        seq = self.blob.seq()
+        if not seq or seq % 2:
+            return None
+        if seq != self._seq:
+            got = self.blob.read()
+            if got is None:
+                return None
+            data = json.loads(got[1])
+            self._seq, self.published_at = got[0], data["at"]
+            self._rows = {m: [TopRow(*r) for r in rows] for m, rows in data["rows"].items()}
+        if max_age is not None and time.time() - self.published_at > max_age:
+            return None    # escritor parado: melhor ir ao banco
+        return self._rows.get(mode)
+
+
+class WriterLoop:
+    """Thread por processo que chama fn() a cada `every` s enquanto tiver o lock."""
+
+    def __init__(self, lock: WriterLock, every: float, fn, name: str, logger=None):
+        self.lock = lock
+        self.every = every
+        self.fn = fn
+        self.name = name
+        self.logger = logger
+        self._pid = None
+        self._guard = threading.Lock()
+
+    def _run(self):
+        while True:
+            try:
+                if self.lock.try_acquire():
+                    self.fn()
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"[SHM] {self.name} falhou: {e}")
+            time.sleep(self.every)
+
+    def start(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._guard:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            threading.Thread(target=self._run, name=f"shm-{self.name}", daemon=True).start()
+
+
+def stats(*caches) -> dict:
+    return {
+        c.blob.name: {"seq": c.blob.seq(), "writes": c.blob.writes, "retries": c.blob.retries}
+        for c in caches
+    }
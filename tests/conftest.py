@@ -0,0 +1,62 @@
+# tests/conftest.py
+# Roda com `python -m pytest` na raiz. Banco SQLite temporário: models.py cria o
+# engine na importação, então o ambiente tem de valer antes de qualquer import.
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="quiz-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_tmp, 'quiz.db')}",
+    "SCORE_SPILL_DIR": os.path.join(_tmp, "spill"),
+    "PROFILE_DIR": os.path.join(_tmp, "profiles"),
+    "APP_PRELOAD": "1",          # sem threads de fundo no import
+    "SHM_CACHE": "False",
+    "CACHE_URL": "",
+    "QUERY_BUDGET": "off",       # os testes medem com query_budget.budget()
+    "MAINTENANCE_MODE": "false",
+})
+os.environ.pop("DATABASE_REPLICA_URL", None)
+os.environ.setdefault("SECRET_KEY", "testes")
+
+
+@pytest.fixture(scope="session")
+def quiz_app():
+    """app.py importado contra o banco temporário, com as perguntas do seed."""
+    import seed
+    from models import Base, engine, SessionLocal, Question
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        if not db.query(Question).count():
+            for theme, rows in seed.SEED.items():
+                for st, a, b, c, d, corr, img in rows:
+                    db.add(Question(theme=theme, statement=st, opt_a=a, opt_b=b, opt_c=c, opt_d=d,
+                                    correct=corr, image_url=img))
+            db.commit()
+    import app as A
+    A.app.config.update(SESSION_COOKIE_SECURE=False, REMEMBER_COOKIE_SECURE=False, TESTING=True)
+    A.question_cache.load()
+    A.deck_sampler.rebuild()
+    return A
+
+
+@pytest.fixture
+def client(quiz_app):
+    """Test client com um usuário registrado e logado."""
+    c = quiz_app.app.test_client()
+    c.post("/register", data=dict(nickname="teste", email="teste@example.com",
+                                  password="teste123", confirmPassword="teste123"))
+    c.post("/login/email", data=dict(email="teste@example.com", password="teste123"))
+    return c
+
+
+@pytest.fixture
+def query_budget():
+    """`with query_budget(1, "/game"): client.get("/game")`."""
+    from query_budget import budget
+    return budget
@@ -0,0 +1,196 @@
+# tests/test_battle.py
+# Motor da batalha 1v1 com um loop falso (relógio manual) e, no fim, muitas
+# salas num event loop asyncio de verdade.
+import asyncio
+import heapq
+import itertools
+import json
+import time
+
+import pytest
+
+import battle
+from battle import BattleEngine, Player, QuestionBank
+
+
+class FakeHandle:
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeLoop:
+    """Só o que o motor usa: time() e call_later(), avançados à mão."""
+
+    def __init__(self):
+        self.now = 0.0
+        self._seq = itertools.count()
+        self._timers = []
+
+    def time(self):
+        return self.now
+
+    def call_later(self, delay, fn, *args):
+        h = FakeHandle()
+        heapq.heappush(self._timers, (self.now + delay, next(self._seq), h, fn, args))
+        return h
+
+    def advance(self, dt):
+        end = self.now + dt
+        while self._timers and self._timers[0][0] <= end:
+            at, _, h, fn, args = heapq.heappop(self._timers)
+            self.now = at
+            if not h.cancelled:
+                fn(*args)
+        self.now = end
+
+    def pending(self):
+        return [t for t in self._timers if not t[2].cancelled]
+
+
+class Inbox(list):
+    def __call__(self, txt):
+        self.append(json.loads(txt))
+
+    def last(self, kind):
+        return [m for m in self if m["t"] == kind][-1]
+
+
+def _bank(n=5):
+    bank = QuestionBank()
+    for i in range(1, n + 1):
+        bank.add(i, "Jogos", f"Pergunta {i}?", ("a", "b", "c", "d"), "ABCD"[i % 4])
+    return bank
+
+
+@pytest.fixture
+def game():
+    loop = FakeLoop()
+    engine = BattleEngine(_bank(), loop=loop, round_seconds=10, next_delay=2)
+    ana, bia = Player("ana", Inbox()), Player("bia", Inbox())
+    for p in (ana, bia):
+        assert engine.connect(p)
+    assert engine.join(ana, 10, "Jogos") is None
+    room = engine.join(bia, 10, "Jogos")
+    assert room is not None
+    return engine, loop, room, ana, bia
+
+
+def _qid(player):
+    return player.send.last("q")["q"]["id"]
+
+
+def test_question_payload_has_no_answer(game):
+    engine, _, room, ana, _ = game
+    assert ana.send[0]["t"] == "wait"
+    assert ana.send.last("start")["opp"] == "bia"
+    q = ana.send.last("q")
+    assert set(q["q"]) == {"id", "st", "o", "img"}
+    assert q["q"]["id"] == room.deck[0]
+
+
+def test_answer_is_checked_on_the_server(game):
+    engine, _, room, ana, bia = game
+    qid = _qid(ana)
+    right = engine.bank.correct(qid)
+    wrong = next(c for c in "ABCD" if c != right)
+    engine.answer(ana, qid + 100, right)        # pergunta errada: ignorada
+    assert ana.picked is None
+    engine.answer(ana, qid, right.lower())
+    engine.answer(ana, qid, wrong)              # segunda resposta: ignorada
+    engine.answer(bia, qid, wrong)
+    res = ana.send.last("res")
+    assert res["correct"] == right
+    assert res["r"] == {"ana": {"ok": True, "picked": right, "score": 1},
+                        "bia": {"ok": False, "picked": wrong, "score": 0}}
+    end = bia.send.last("end")
+    assert (end["winner"], end["reason"]) == ("ana", "eliminado")
+    assert engine.rooms == {}
+
+
+def test_round_timeout_eliminates_who_did_not_answer(game):
+    engine, loop, room, ana, bia = game
+    qid = _qid(ana)
+    engine.answer(ana, qid, engine.bank.correct(qid))
+    loop.advance(10)
+    assert room.open                            # ainda dentro da tolerância de rede
+    loop.advance(battle.ROUND_GRACE)
+    res = bia.send.last("res")
+    assert res["r"]["bia"] == {"ok": False, "picked": None, "score": 0}
+    assert ana.send.last("end")["winner"] == "ana"
+    engine.answer(bia, qid, "A")                # resposta atrasada não reabre a rodada
+    assert not loop.pending()
+
+
+def test_both_timing_out_ends_without_winner(game):
+    engine, loop, _, ana, _ = game
+    loop.advance(10 + battle.ROUND_GRACE)
+    end = ana.send.last("end")
+    assert (end["winner"], end["reason"]) == (None, "eliminado")
+
+
+def test_correct_rounds_continue_until_the_deck_ends(game):
+    engine, loop, room, ana, bia = game
+    for n in range(1, len(room.deck) + 1):
+        qid = _qid(ana)
+        assert ana.send.last("q")["n"] == n
+        for p in (ana, bia):
+            engine.answer(p, qid, engine.bank.correct(qid))
+        loop.advance(2)                         # next_delay
+    end = ana.send.last("end")
+    assert end == {"t": "end", "winner": None, "reason": "completou",
+                   "score": {"ana": 5, "bia": 5}}
+
+
+def test_opponent_abandoning_gives_the_win(game):
+    engine, loop, room, ana, bia = game
+    engine.leave(bia)
+    end = ana.send.last("end")
+    assert (end["winner"], end["reason"]) == ("ana", "abandono")
+    assert ana.room is None and engine.rooms == {}
+    assert not loop.pending()                   # timer da rodada cancelado
+    assert "bia" not in engine.players
+    assert engine.connect(Player("bia", Inbox()))
+
+
+def test_second_tab_is_refused(game):
+    engine, *_ = game
+    assert not engine.connect(Player("ana", Inbox()))
+
+
+def test_many_rooms_on_one_loop():
+    # alvo do desenho: ~10k salas por núcleo. Cada sala joga 3 rodadas com as
+    # respostas chegando pelo próprio loop, como viriam do WebSocket.
+    rooms = 10_000
+    loop = asyncio.new_event_loop()
+    try:
+        engine = BattleEngine(_bank(3), loop=loop, round_seconds=5, next_delay=0)
+        ends = []
+
+        def client(nick):
+            def send(txt):
+                msg = json.loads(txt)
+                if msg["t"] == "q":
+                    qid = msg["q"]["id"]
+                    loop.call_soon(engine.answer, player, qid, engine.bank.correct(qid))
+                elif msg["t"] == "end":
+                    ends.append(msg)
+            player = Player(nick, send)
+            return player
+
+        t0 = time.perf_counter()
+        for i in range(rooms):
+            engine.create_room(client(f"a{i}"), client(f"b{i}"), "Jogos")
+        loop.run_until_complete(asyncio.sleep(0.05))
+        while engine.rooms and time.perf_counter() - t0 < 30:
+            loop.run_until_complete(asyncio.sleep(0.05))
+        elapsed = time.perf_counter() - t0
+    finally:
+        loop.close()
+    assert engine.rooms == {}
+    assert len(ends) == 2 * rooms
+    assert all(e["reason"] == "completou" and e["score"] == {k: 3 for k in e["score"]} for e in ends)
+    print(f"{rooms} salas x 3 rodadas em {elapsed:.2f}s")
+    assert elapsed < 30
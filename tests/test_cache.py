@@ -0,0 +1,132 @@
+# tests/test_cache.py
+# Cache em namespaces sobre os backends local e "Redis" (FakeRedis, a mesma API
+# do cliente redis-py): TTL, LRU, get_multi num round-trip e falhas viram miss.
+import sys
+from collections import namedtuple
+from types import SimpleNamespace
+
+import pytest
+
+from cache import Cache, FakeRedis, LocalBackend, RedisBackend, make_backend
+
+Row = namedtuple("Row", "nick score")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["local", "fake"])
+def setup(request):
+    clock = Clock()
+    if request.param == "local":
+        backend = LocalBackend(max_items=100, clock=clock)
+    else:
+        backend = RedisBackend(FakeRedis(clock=clock), shared=False)
+    cache = Cache(backend, prefix="t")
+    cache.namespace("user", ttl=10)
+    cache.namespace("row", ttl=60, load=lambda v: Row(*v))
+    return cache, clock
+
+
+def test_get_set_and_ttl(setup):
+    cache, clock = setup
+    assert cache.get("user", "ana") is None
+    cache.set("user", "ana", {"best": 7, "nome": "Ana Lú"})
+    assert cache.get("user", "ana") == {"best": 7, "nome": "Ana Lú"}
+    clock.now += 9.9
+    assert cache.get("user", "ana") is not None
+    clock.now += 0.2
+    assert cache.get("user", "ana") is None
+    s = cache.stats()["user"]
+    assert (s["hits"], s["misses"], s["hit_ratio"]) == (2, 2, 0.5)
+
+
+def test_get_multi_and_load(setup):
+    cache, _ = setup
+    cache.set_many("user", {"ana": 1, "bia": 2})
+    cache.set("row", "ana", Row("ana", 30))
+    got = cache.get_multi({"user": ["ana", "bia", "caio"], "row": ["ana"], "vazio": []})
+    assert got == {"user": {"ana": 1, "bia": 2}, "row": {"ana": Row("ana", 30)}, "vazio": {}}
+    assert type(got["row"]["ana"]) is Row           # remoto volta de JSON pela `load`
+    if isinstance(cache.backend, RedisBackend):
+        before = cache.backend.client.round_trips
+        cache.get_multi({"user": ["ana", "bia"], "row": ["ana"]})
+        assert cache.backend.client.round_trips == before + 1
+
+
+def test_delete_key_and_namespace(setup):
+    cache, _ = setup
+    cache.set_many("user", {"ana": 1, "bia": 2})
+    cache.set("row", "ana", Row("ana", 1))
+    cache.delete("user", "ana")
+    assert cache.get_multi({"user": ["ana", "bia"]})["user"] == {"bia": 2}
+    cache.delete("user")
+    assert cache.get("user", "bia") is None
+    assert cache.get("row", "ana") == Row("ana", 1)   # outro namespace intacto
+
+
+def test_local_backend_evicts_least_recently_used():
+    b = LocalBackend(max_items=2)
+    b.set_many({"a": 1, "b": 2}, ttl=60)
+    assert b.get_many(["a"]) == [1]                  # "a" fica mais recente
+    b.set_many({"c": 3}, ttl=60)
+    assert b.get_many(["a", "b", "c"]) == [1, None, 3]
+
+
+def test_local_backend_keeps_objects_as_they_are():
+    cache = Cache(LocalBackend())
+    cache.namespace("row", ttl=60, load=lambda v: pytest.fail("load só no remoto"))
+    obj = Row("ana", 1)
+    cache.set("row", "ana", obj)
+    assert cache.get("row", "ana") is obj
+
+
+def test_fake_redis_stores_bytes_with_expiry():
+    clock = Clock()
+    r = FakeRedis(clock=clock)
+    r.set("k", "é", px=1500)
+    r.set("sem-ttl", b"x")
+    assert r.get("k") == "é".encode()
+    clock.now += 1.5
+    assert r.mget(["k", "sem-ttl"]) == [None, b"x"]
+    assert r.delete("k", "sem-ttl", "nada") == 1
+    assert r.scan_iter("s*") == []
+
+
+def test_backend_errors_become_misses():
+    def down(*_a, **_k):
+        raise ConnectionError("redis fora")
+
+    client = SimpleNamespace(mget=down, pipeline=down, delete=down, scan_iter=down)
+    cache = Cache(RedisBackend(client))
+    cache.namespace("user", ttl=10)
+    cache.set("user", "ana", 1)
+    assert cache.get("user", "ana") is None
+    cache.delete("user", "ana")
+    cache.delete("user")
+    assert cache.errors == 4
+    assert cache.stats()["user"]["misses"] == 1
+
+
+def test_ttl_override_from_env(monkeypatch):
+    monkeypatch.setenv("CACHE_TTL_USER", "2.5")
+    assert Cache().namespace("user", ttl=60).ttl == 2.5
+
+
+def test_make_backend(monkeypatch):
+    assert type(make_backend("")) is LocalBackend
+    assert type(make_backend("local")) is LocalBackend
+    fake = make_backend("fake://")
+    assert isinstance(fake, RedisBackend) and isinstance(fake.client, FakeRedis)
+    assert fake.remote and not fake.shared
+    # sem o pacote redis: cai no cache local com aviso
+    monkeypatch.setitem(sys.modules, "redis", None)
+    warned = []
+    logger = SimpleNamespace(warning=warned.append)
+    assert type(make_backend("redis://localhost:6379/0", logger)) is LocalBackend
+    assert warned and "redis" in warned[0]
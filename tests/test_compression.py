@@ -0,0 +1,109 @@
+# tests/test_compression.py
+# Negociação do Accept-Encoding, corpo pré-comprimido com ETag/304 e compressão
+# das respostas dinâmicas.
+import gzip
+
+import pytest
+from flask import Flask, Response
+
+import compression
+from compression import Compressor, Precompressed, pick_encoding
+
+
+@pytest.mark.parametrize("accept, want", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate, br", "gzip"),
+    ("GZIP;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "gzip"),
+    ("*;q=0", None),
+    ("*, gzip;q=0", None),
+    ("gzip;q=lixo", None),
+])
+def test_pick_encoding_without_brotli(monkeypatch, accept, want):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert pick_encoding(accept) == want
+
+
+@pytest.mark.parametrize("accept, want", [
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip;q=0.1", "gzip"),
+    ("gzip;q=0.2, *", "br"),
+])
+def test_pick_encoding_prefers_brotli_when_available(monkeypatch, accept, want):
+    monkeypatch.setattr(compression, "brotli", object())
+    assert pick_encoding(accept) == want
+
+
+BODY = '{"itens": [' + ", ".join(f'"item {i}"' for i in range(400)) + "]}"
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    a = Flask(__name__)
+    body = Precompressed(BODY, "application/json")
+    Compressor(a)
+
+    @a.get("/fixo")
+    def fixo():
+        return body.response()
+
+    @a.get("/dinamico")
+    def dinamico():
+        return Response(BODY, mimetype="application/json")
+
+    @a.get("/pequeno")
+    def pequeno():
+        return {"ok": True}
+
+    a.body = body
+    return a
+
+
+def test_precompressed_variants_and_etags(app):
+    c = app.test_client()
+    plain = c.get("/fixo")
+    assert plain.data == BODY.encode() and "Content-Encoding" not in plain.headers
+    assert plain.headers["ETag"] == f'"{app.body.etag}"'
+    assert plain.headers["Vary"] == "Accept-Encoding"
+
+    gz = c.get("/fixo", headers={"Accept-Encoding": "gzip"})
+    assert gz.headers["Content-Encoding"] == "gzip"
+    assert gz.headers["ETag"] == f'"{app.body.etag}-gzip"'
+    assert gzip.decompress(gz.data) == BODY.encode()
+    assert app.body.variant("gzip") is app.body.variant("gzip")   # comprimido uma vez
+
+
+def test_if_none_match_gives_304_for_any_variant(app):
+    c = app.test_client()
+    etag = app.body.etag
+    for tag, accept in ((etag, "gzip"), (f"{etag}-gzip", None), ("*", "gzip")):
+        resp = c.get("/fixo", headers={"If-None-Match": f'"{tag}"' if tag != "*" else tag,
+                                       **({"Accept-Encoding": accept} if accept else {})})
+        assert resp.status_code == 304 and resp.data == b""
+    assert c.get("/fixo", headers={"If-None-Match": '"outro"'}).status_code == 200
+
+
+def test_dynamic_responses_get_gzip_and_weak_etag(app):
+    c = app.test_client()
+    resp = c.get("/dinamico", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(resp.data) == BODY.encode()
+    small = c.get("/pequeno", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+    assert c.get("/dinamico").data == BODY.encode()
+
+
+def test_version_json_revalidates_with_304(client):
+    first = client.get("/version.json")
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "no-cache"
+    etag = first.headers["ETag"]
+    again = client.get("/version.json", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
@@ -0,0 +1,71 @@
+# tests/test_deck.py
+# Baralho com rampa de dificuldade: faixas por taxa de acerto, sorteio sem
+# repetição e em ordem fácil → difícil.
+import os
+import random
+
+from deck import DeckSampler, build_tiers
+
+
+def _rows(n=50, theme="Jogos"):
+    # id i acerta i% das 100 respostas: id maior = mais fácil
+    return [(i, theme, i, 100) for i in range(1, n + 1)]
+
+
+def _sampler(tiers):
+    s = DeckSampler()
+    s._tiers = tiers
+    s._pid = os.getpid()      # sem thread de rebuild
+    return s
+
+
+def test_tiers_go_from_easy_to_hard():
+    tiers = build_tiers(_rows(), tiers=5)["Jogos"]
+    assert [len(t) for t in tiers] == [10] * 5
+    assert tiers[0] == tuple(range(50, 40, -1))
+    assert tiers[-1] == tuple(range(10, 0, -1))
+
+
+def test_unanswered_question_is_smoothed_to_the_prior():
+    # sem respostas vale PRIOR_RATE (0.6): fica entre 90% e 10% de acerto
+    tiers = build_tiers([(1, "T", 90, 100), (2, "T", 0, 0), (3, "T", 10, 100)], tiers=3)["T"]
+    assert tiers == ((1,), (2,), (3,))
+    # 1 acerto em 1 resposta não passa na frente de 90 em 100
+    tiers = build_tiers([(1, "T", 90, 100), (2, "T", 1, 1)], tiers=2)["T"]
+    assert tiers == ((1,), (2,))
+
+
+def test_deck_ramps_and_never_repeats():
+    tiers = build_tiers(_rows(200), tiers=5)
+    tier_of = {q: k for k, band in enumerate(tiers["Jogos"]) for q in band}
+    s = _sampler(tiers)
+    rng = random.Random(3)
+    for _ in range(50):
+        deck = s.deck("Jogos", size=50, rng=rng)
+        assert len(deck) == 50 == len(set(deck))
+        levels = [tier_of[q] for q in deck]
+        assert levels == sorted(levels)
+        assert [levels.count(k) for k in range(5)] == [10] * 5
+
+
+def test_short_bands_are_filled_in_difficulty_order():
+    tiers = build_tiers(_rows(12), tiers=5)
+    deck = _sampler(tiers).deck("Jogos", size=20, rng=random.Random(1))
+    assert sorted(deck) == list(range(1, 13))          # tudo, uma vez só
+
+
+def test_unknown_theme_or_not_built():
+    assert _sampler(None).deck("Jogos") is None
+    assert _sampler(build_tiers(_rows())).deck("Música") is None
+
+
+def test_rebuild_from_the_database(quiz_app):
+    from models import SessionLocal, Question
+    s = DeckSampler()
+    s._pid = os.getpid()
+    s.rebuild()
+    assert s.ready
+    with SessionLocal() as db:
+        ids = {q.id for q in db.query(Question).filter_by(theme="Jogos")}
+    deck = s.deck("Jogos", size=len(ids))
+    assert sorted(deck) == sorted(ids)
@@ -0,0 +1,88 @@
+# tests/test_hashing.py
+# Hash de senha: quando regravar, upgrade de hash antigo no login e fila cheia.
+import threading
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import hashing
+from models import SessionLocal, User
+
+
+@pytest.mark.parametrize("stored, expected", [
+    ("pbkdf2:sha256:600000$salt$hash", True),          # algoritmo antigo
+    ("scrypt:16384:8:1$salt$hash", True),               # custo menor
+    ("scrypt:32768:8:1$salt$hash", False),              # o atual
+    ("scrypt:131072:8:1$salt$hash", False),             # maior: mantém
+    ("argon2$salt$hash", False),                        # desconhecido
+    ("sem-cifrão", False),
+    ("", False),
+    (None, False),
+])
+def test_needs_rehash(stored, expected):
+    assert hashing.current_method() == "scrypt:32768:8:1"
+    assert hashing.needs_rehash(stored) is expected
+
+
+def test_pinned_method_has_a_floor():
+    assert hashing._pinned_method("") == "scrypt:32768:8:1"
+    assert hashing._pinned_method("scrypt:1024:8:1") == "scrypt:32768:8:1"
+    assert hashing._pinned_method("scrypt:65536:8:2") == "scrypt:65536:8:2"
+    assert hashing._pinned_method("pbkdf2:sha256:600000") == "pbkdf2:sha256:600000"
+
+
+def test_busy_queue_raises(monkeypatch):
+    monkeypatch.setattr(hashing, "_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(hashing, "HASH_WAIT_TIMEOUT", 0.01)
+    hashing._slots.acquire()
+    try:
+        with pytest.raises(hashing.HashingBusy):
+            hashing.hash_password("x")
+        assert hashing.hash_password_later("x", lambda h: None) is False
+    finally:
+        hashing._slots.release()
+
+
+def test_slow_hash_times_out_and_frees_the_slot_when_done(monkeypatch):
+    monkeypatch.setattr(hashing, "_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(hashing, "HASH_RUN_TIMEOUT", 0.05)
+    with pytest.raises(hashing.HashingBusy):
+        hashing._run(time.sleep, 0.5)
+    # a vaga só volta quando o cálculo de fato termina
+    assert not hashing._slots.acquire(blocking=False)
+    assert hashing._slots.acquire(timeout=10)
+    hashing._slots.release()
+
+
+def test_busy_login_asks_to_retry(client, monkeypatch):
+    client.get("/logout")
+    monkeypatch.setattr(hashing, "_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(hashing, "HASH_WAIT_TIMEOUT", 0.01)
+    hashing._slots.acquire()
+    try:
+        r = client.post("/login/email", data=dict(email="teste@example.com", password="teste123"))
+    finally:
+        hashing._slots.release()
+    assert r.status_code == 302 and r.headers["Location"].endswith("/login")
+    with client.session_transaction() as s:
+        assert ("warn", "Servidor ocupado, tente novamente em instantes.") in s["_flashes"]
+
+
+def test_legacy_hash_is_upgraded_after_login(quiz_app):
+    with SessionLocal() as db:
+        db.add(User(nickname="legado", email="legado@example.com", is_active=True,
+                    password_hash=generate_password_hash("velha123", "pbkdf2:sha256:1000")))
+        db.commit()
+    c = quiz_app.app.test_client()
+    r = c.post("/login/email", data=dict(email="legado@example.com", password="velha123"))
+    assert r.headers["Location"].endswith("/")
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        with SessionLocal() as db:
+            stored = db.get(User, "legado").password_hash
+        if stored.startswith("scrypt:"):
+            break
+        time.sleep(0.05)
+    assert stored.startswith("scrypt:32768:8:1$")
+    assert hashing.verify_password(stored, "velha123")
@@ -0,0 +1,119 @@
+# tests/test_invalidation.py
+# Barramento de invalidação: despacho por tipo, eventos próprios ignorados e
+# o modo polling (SQLite) com anel de versões em meta.
+from types import SimpleNamespace
+
+import pytest
+
+import invalidation
+from invalidation import InvalidationBus, parse
+
+
+class Calls(list):
+    def __call__(self, key):
+        self.append(key)
+
+
+@pytest.fixture
+def buses(quiz_app):
+    from models import engine
+    a, b = InvalidationBus(engine), InvalidationBus(engine)
+    got = {k: Calls() for k in ("question", "leaderboard")}
+    for kind, fn in got.items():
+        b.subscribe(kind, fn)
+    b.poll_once()                      # primeira leitura só sincroniza a versão
+    return a, b, got
+
+
+def _publish(bus, *events, commit=True):
+    from models import SessionLocal
+    with SessionLocal() as db:
+        bus.publish(db, *events)
+        if commit:
+            db.commit()
+
+
+def test_parse():
+    assert parse("leaderboard:best|ab12") == ("leaderboard", "best", "ab12")
+    assert parse("week-reset") == ("week-reset", None, None)
+    assert parse("user:Ana Maria:x|o1") == ("user", "Ana Maria:x", "o1")
+
+
+def test_apply_dispatches_by_kind_and_skips_own_events(quiz_app):
+    from models import engine
+    bus = InvalidationBus(engine)
+    got, boom = Calls(), Calls()
+
+    def broken(key):
+        boom.append(key)
+        raise RuntimeError("handler quebrado")
+
+    bus.subscribe("question", broken)
+    bus.subscribe("question", got)
+    bus.apply("question:12|outro")
+    bus.apply(f"question:13|{bus.origin}")       # quem publicou já aplicou
+    bus.apply("user:ana|outro")                   # sem handler
+    assert got == ["12"] and boom == ["12"]
+    assert bus.stats["errors"] == 1
+    assert (bus.stats["received"], bus.stats["applied"]) == (3, 1)
+    bus.flush_all()
+    assert got[-1] is None and boom[-1] is None
+
+
+def test_polling_delivers_committed_events(buses):
+    a, b, got = buses
+    _publish(a, "question:7", "leaderboard:best")
+    _publish(a, "question:8")
+    b.poll_once()
+    assert got["question"] == ["7", "8"]
+    assert got["leaderboard"] == ["best"]
+    b.poll_once()
+    assert got["question"] == ["7", "8"]           # nada novo
+
+
+def test_rolled_back_publish_is_not_delivered(buses):
+    a, b, got = buses
+    _publish(a, "question:9", commit=False)
+    b.poll_once()
+    assert got["question"] == []
+
+
+def test_own_events_are_ignored_by_the_poller(buses):
+    _, b, got = buses
+    _publish(b, "question:10")
+    b.poll_once()
+    assert got["question"] == []
+
+
+def test_falling_behind_the_ring_flushes_everything(buses):
+    a, b, got = buses
+    for i in range(invalidation.RING_SLOTS + 1):
+        _publish(a, f"question:{i}")
+    b.poll_once()
+    assert got["question"] == [None] and got["leaderboard"] == [None]
+    assert b.stats["flush_all"] == 1
+
+
+def test_reused_slot_flushes_everything(buses):
+    from models import SessionLocal, Meta
+    a, b, got = buses
+    _publish(a, "question:1")
+    with SessionLocal() as db:
+        version = int(db.get(Meta, invalidation._VERSION_KEY).value)
+        slot = db.get(Meta, invalidation._SLOT_KEY.format(version % invalidation.RING_SLOTS))
+        slot.value = f"{version + invalidation.RING_SLOTS}|question:99|x"   # sobrescrito
+        db.commit()
+    b.poll_once()
+    assert got["question"] == [None]
+
+
+def test_postgres_publishes_with_pg_notify():
+    engine = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+    bus = InvalidationBus(engine, channel="canal")
+    sent = []
+    db = SimpleNamespace(execute=lambda stmt, params: sent.append((str(stmt), params)))
+    bus.publish(db, "question:1", "week-reset")
+    assert [p for _, p in sent] == [{"c": "canal", "p": f"question:1|{bus.origin}"},
+                                    {"c": "canal", "p": f"week-reset|{bus.origin}"}]
+    assert all("pg_notify" in s for s, _ in sent)
+    assert bus.stats["published"] == 2
@@ -0,0 +1,112 @@
+# tests/test_leaderboard.py
+# Páginas do ranking e o que chega ao hub SSE.
+import shm_cache
+
+
+def test_page_views_do_not_feed_the_hub(quiz_app, client):
+    A = quiz_app
+    A.shared_cache.set("lb", "total", [shm_cache.TopRow("velho", 1, 999, 1)])
+    seq = A.leaderboard_hub._seq
+    assert client.get("/leaderboard").status_code == 200
+    assert client.get("/leaderboard/top?mode=total").get_json()["rows"][0][0] == "velho"
+    # só o flush (primário, depois do commit) publica; cópias em cache não
+    assert A.leaderboard_hub._seq == seq
+    A.shared_cache.delete("lb", "total")
+
+
+# ---------- keyset e posição ----------
+import re
+
+import pytest
+from sqlalchemy import delete, func, select
+
+import score_hist
+from models import Leaderboard, SessionLocal
+
+# pontuações altas: ficam acima do que os outros testes gravam
+ROWS = [("kz", 5000), ("ka", 5000), ("km", 5000), ("kb", 4990), ("kc", 4000),
+        ("kd", 3000), ("ke", 3000), ("kf", 995), ("kg", 15)]
+
+
+@pytest.fixture
+def board(quiz_app):
+    with SessionLocal() as db:
+        db.add_all(Leaderboard(nickname=n, best_score=min(t // 100, 50), total_points=t, games_played=1)
+                   for n, t in ROWS)
+        db.flush()
+        score_hist.rebuild(db)
+        db.commit()
+    quiz_app.score_histogram.invalidate()
+    yield quiz_app
+    with SessionLocal() as db:
+        db.execute(delete(Leaderboard).where(Leaderboard.nickname.in_([n for n, _ in ROWS])))
+        score_hist.rebuild(db)
+        db.commit()
+    quiz_app.score_histogram.invalidate()
+
+
+def _pages(A, mode, size):
+    pages, after = [], None
+    with SessionLocal() as db:
+        while True:
+            rows = A._top_rows(db, mode, size + 1, after)
+            pages.append([r.nickname for r in rows[:size]])
+            if len(rows) <= size:
+                return pages
+            after = A._parse_after(A._cursor(mode, rows[size - 1]))
+
+
+def _brute_rank(mode, score, nick):
+    col = Leaderboard.best_score if mode == "best" else Leaderboard.total_points
+    with SessionLocal() as db:
+        return 1 + db.execute(select(func.count()).select_from(Leaderboard).where(
+            (col > score) | ((col == score) & (Leaderboard.nickname < nick)))).scalar()
+
+
+def test_keyset_pages_split_ties_by_nickname(board):
+    pages = _pages(board, "total", 2)
+    flat = [n for p in pages for n in p]
+    assert flat[:7] == ["ka", "km", "kz", "kb", "kc", "kd", "ke"]
+    assert len(flat) == len(set(flat))         # nada repetido nem pulado entre páginas
+    assert pages[0] == ["ka", "km"] and pages[1] == ["kz", "kb"]
+
+
+def test_last_page_has_no_next_link(board, client):
+    with SessionLocal() as db:
+        last = db.execute(select(Leaderboard).where(Leaderboard.total_points > 0)
+                          .order_by(Leaderboard.total_points, Leaderboard.nickname.desc())).scalars().first()
+    after = board._cursor("total", last)
+    html = client.get(f"/leaderboard?mode=total&after={after}&pos=99").get_data(as_text=True)
+    assert _names(html) == [] and "Próxima página" not in html
+    html = client.get("/leaderboard?mode=total&after=5000,ka&pos=1").get_data(as_text=True)
+    assert _names(html)[:3] == ["km", "kz", "kb"]
+    html = client.get("/leaderboard?mode=total&after=995,kf&pos=8").get_data(as_text=True)
+    assert "kg" in _names(html) and "Próxima página" not in html
+
+
+def _names(html):
+    ol = html[html.index('<ol class="rank-list">'):]
+    ol = ol[:ol.index("</ol>")]
+    return re.findall(r"<li[^>]*>\s*(?:\S+\s+)?(\S+) \|", ol)
+
+
+@pytest.mark.parametrize("after", ["", "5000", "x,ka", "5000;ka", ",ka", "-1,ka", "9" * 400 + ",a"])
+def test_malformed_after_is_ignored_or_harmless(board, client, after):
+    r = client.get("/leaderboard", query_string={"mode": "total", "after": after, "pos": "abc"})
+    assert r.status_code == 200
+
+
+def test_parse_after_keeps_commas_in_nickname(board):
+    assert board._parse_after("10,a,b") == (10, "a,b")
+    assert board._parse_after("x,a") is None
+    assert board._parse_after("10") is None
+    assert board._parse_after("9" * 10 + ",a") is None
+
+
+@pytest.mark.parametrize("mode", ["total", "best"])
+def test_rank_from_histogram_matches_count(board, mode):
+    with SessionLocal() as db:
+        for n, _ in ROWS:
+            me = db.get(Leaderboard, n)
+            score = me.best_score if mode == "best" else me.total_points
+            assert board._rank_of(db, mode, score, n) == _brute_rank(mode, score, n), n
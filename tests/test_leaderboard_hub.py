@@ -0,0 +1,90 @@
+# tests/test_leaderboard_hub.py
+# Publicador SSE: diffs compactos, retomada por Last-Event-ID e teto de assinantes.
+import json
+
+from leaderboard_hub import LeaderboardHub
+
+
+def _events(sub, n):
+    """Próximos `n` eventos (sem o "retry:") como (id, tipo, dados)."""
+    out = []
+    while len(out) < n:
+        txt = next(sub)
+        if txt.startswith("retry:") or txt.startswith(":"):
+            continue
+        fields = dict(line.split(": ", 1) for line in txt.strip().split("\n"))
+        out.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    return out
+
+
+def _hub(**kw):
+    return LeaderboardHub(top_n=3, heartbeat=0.01, max_stream=5, **kw)
+
+
+def test_diff_carries_only_changed_positions():
+    hub = _hub()
+    assert hub.observe("total", [("ana", 30, 3), ("bia", 20, 2), ("caio", 10, 1)])
+    assert not hub.observe("total", [("ana", 30, 3), ("bia", 20, 2), ("caio", 10, 1)])
+    sub = hub.subscribe()
+    (_, kind, snap), = _events(sub, 1)
+    assert kind == "snapshot"
+    assert snap["total"][0] == ["ana", 30, 3] and snap["best"] == []
+
+    hub.observe("total", [("ana", 30, 3), ("caio", 25, 2), ("bia", 20, 2), ("davi", 5, 1)])
+    (eid, kind, diff), = _events(sub, 1)
+    assert kind == "diff" and eid == 2
+    assert diff == {"m": "total", "set": [[1, "caio", 25, 2], [2, "bia", 20, 2]], "n": 3}
+
+    hub.observe("total", [("ana", 30, 3)])
+    (_, _, diff), = _events(sub, 1)
+    assert diff == {"m": "total", "set": [], "n": 1}
+    sub.close()
+
+
+def test_last_event_id_resumes_without_snapshot():
+    hub = _hub()
+    hub.observe("best", [("ana", 9, 1)])
+    hub.observe("best", [("bia", 10, 1), ("ana", 9, 1)])
+    hub.observe("total", [("ana", 3, 1)])
+    sub = hub.subscribe(last_event_id="1")
+    events = _events(sub, 2)
+    assert [(eid, kind) for eid, kind, _ in events] == [(2, "diff"), (3, "diff")]
+    sub.close()
+
+
+def test_unknown_or_evicted_id_starts_from_snapshot():
+    hub = LeaderboardHub(top_n=3, backlog=2, heartbeat=0.01)
+    for i in range(5):
+        hub.observe("total", [("ana", i, 1)])
+    for last in ("1", "99", "lixo", None):
+        sub = hub.subscribe(last_event_id=last)
+        (eid, kind, data), = _events(sub, 1)
+        assert (eid, kind) == (5, "snapshot")
+        assert data["total"] == [["ana", 4, 1]]
+        sub.close()
+
+
+def test_subscriber_cap_and_release():
+    hub = _hub(max_subscribers=2)
+    a, b = hub.subscribe(), hub.subscribe()
+    assert a is not None and b is not None
+    assert hub.subscribe() is None
+    assert hub.rejected == 1
+    # close() devolve a vaga mesmo sem o gerador ter começado
+    a.close()
+    a.close()
+    assert hub.subscribers == 1
+    c = hub.subscribe()
+    assert c is not None
+    b.close()
+    c.close()
+    assert hub.subscribers == 0
+
+
+def test_seeded_after_both_modes():
+    hub = _hub()
+    assert not hub.seeded()
+    hub.observe("total", [])
+    assert not hub.seeded()
+    hub.observe("best", [])
+    assert hub.seeded()
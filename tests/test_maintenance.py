@@ -0,0 +1,49 @@
+# tests/test_maintenance.py
+# Modo manutenção ligado por override no banco (settings), sem reiniciar.
+import gzip
+
+import pytest
+
+from models import SessionLocal, Meta
+
+
+@pytest.fixture
+def maintenance(quiz_app):
+    with SessionLocal() as db:
+        db.merge(Meta(key="setting:MAINTENANCE_MODE", value="true"))
+        db.commit()
+    quiz_app.settings.reload(reread_env=False)
+    assert quiz_app.settings.current.maintenance
+    yield quiz_app
+    with SessionLocal() as db:
+        db.query(Meta).filter(Meta.key == "setting:MAINTENANCE_MODE").delete()
+        db.commit()
+    quiz_app.settings.reload(reread_env=False)
+
+
+def test_page_is_served_compressed_with_503(maintenance):
+    c = maintenance.app.test_client()
+    r = c.get("/login", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 503
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert "melhorias" in gzip.decompress(r.data).decode()
+    assert c.get("/static/base.css").status_code == 200       # endpoint liberado
+
+
+def test_page_is_rendered_per_request(maintenance, monkeypatch):
+    c = maintenance.app.test_client()
+    assert "melhorias" in c.get("/login").get_data(as_text=True)
+    # template/settings trocados com o modo ligado aparecem no request seguinte
+    monkeypatch.setattr(maintenance, "_render_maintenance", lambda: "versão nova")
+    r = c.get("/login")
+    assert r.status_code == 503 and r.get_data(as_text=True) == "versão nova"
+
+
+def test_turning_it_off_takes_effect(maintenance):
+    c = maintenance.app.test_client()
+    assert c.get("/login").status_code == 503
+    with SessionLocal() as db:
+        db.query(Meta).filter(Meta.key == "setting:MAINTENANCE_MODE").delete()
+        db.commit()
+    maintenance.settings.reload(reread_env=False)
+    assert c.get("/login").status_code == 200
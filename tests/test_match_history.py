@@ -0,0 +1,108 @@
+# tests/test_match_history.py
+# Histórico de partidas: ids compactados, agregados/streak do perfil e a
+# gravação feita pelo /end.
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+import match_history
+from match_history import decode_ids, encode_ids
+
+TZ = timezone(timedelta(hours=-4))
+
+
+@pytest.mark.parametrize("ids", [
+    [],
+    [1],
+    [5, 3, 200, 199, 70000, 1],
+    list(range(400, 350, -1)),
+    [2 ** 40, 0, 2 ** 40],
+])
+def test_ids_round_trip(ids):
+    assert decode_ids(encode_ids(ids)) == ids
+
+
+def test_encoding_is_compact():
+    import random
+    ids = random.Random(5).sample(range(1, 400), 50)
+    assert len(encode_ids(ids)) <= 100
+    assert encode_ids([1, 2, 3]) == bytes([2, 2, 2])    # deltas +1 em zigzag
+    assert decode_ids(None) == []
+
+
+def _ms(day, hour=12):
+    return int(datetime(2026, 3, day, hour, tzinfo=TZ).timestamp() * 1000)
+
+
+def _record(db, nick, theme, score, day, hour=12):
+    match_history.record(db, nick, theme, score, [1, 2, 3][:score], 30_000, "wrong", _ms(day, hour), TZ)
+
+
+def test_record_aggregates_and_streak(quiz_app):
+    from models import SessionLocal
+    nick = "hist-streak"
+    with SessionLocal() as db:
+        _record(db, nick, "Jogos", 3, 1)
+        _record(db, nick, "Jogos", 1, 1, hour=20)        # mesmo dia: streak não muda
+        _record(db, nick, "Música", 2, 2)
+        _record(db, nick, "Jogos", 0, 3)
+        db.commit()
+        today = datetime(2026, 3, 3).toordinal()
+        p = match_history.profile(db, nick, today)
+        assert (p["games"], p["best_score"], p["avg_score"], p["avg_seconds"]) == (4, 3, 1.5, 30)
+        assert (p["streak"], p["best_streak"]) == (3, 3)
+        assert p["themes"] == [
+            {"theme": "Jogos", "games": 3, "best_score": 3, "avg_score": 1.3},
+            {"theme": "Música", "games": 1, "best_score": 2, "avg_score": 2.0},
+        ]
+        assert [m["score"] for m in p["recent"]] == [0, 2, 1, 3]
+
+        _record(db, nick, "Jogos", 1, 6)                 # pulou dias: recomeça
+        db.commit()
+        p = match_history.profile(db, nick, datetime(2026, 3, 8).toordinal())
+        assert (p["streak"], p["best_streak"]) == (0, 3)   # nem ontem nem hoje
+        assert match_history.profile(db, "ninguem", today) is None
+
+
+def _play_two_rounds(client):
+    from models import SessionLocal, Question
+    client.post("/start")
+    for _ in range(2):
+        client.get("/game")
+        with client.session_transaction() as s:
+            qid, token = s["current_qid"], s["current_token"]
+        with SessionLocal() as db:
+            correct = db.get(Question, qid).correct
+        client.post("/answer", data=dict(picked=correct, correct=correct, qid=qid, qtoken=token))
+        client.post("/continue", data=dict(last="correct"))
+    with client.session_transaction() as s:
+        return list(s["asked_ids"]), s["theme"]
+
+
+def test_end_records_the_match_once(client):
+    from models import SessionLocal, Match, PlayerStats
+
+    def games():
+        with SessionLocal() as db:
+            st = db.get(PlayerStats, "teste")
+            return st.games if st else 0
+
+    def count():
+        with SessionLocal() as db:
+            return db.scalar(select(func.count()).select_from(Match).where(Match.nickname == "teste"))
+
+    before_games, before_count = games(), count()
+    asked, theme = _play_two_rounds(client)
+    assert client.get("/end?reason=<script>").status_code == 200
+    with SessionLocal() as db:
+        m = db.execute(select(Match).where(Match.nickname == "teste")
+                       .order_by(Match.id.desc()).limit(1)).scalar_one()
+        assert (m.score, m.theme, m.end_reason) == (2, theme, "")
+        assert decode_ids(m.question_ids) == asked
+        assert m.duration_ms >= 0
+    assert games() == before_games + 1
+
+    client.get("/end?reason=wrong")                       # refresh não regrava
+    assert count() == before_count + 1
+    assert games() == before_games + 1
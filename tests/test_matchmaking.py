@@ -0,0 +1,96 @@
+# tests/test_matchmaking.py
+# Fila de pareamento com relógio injetado: milhares de jogadores simulados.
+import random
+
+from matchmaking import Matchmaker, ANY_THEME
+
+THEMES = ["Esportes", "Jogos", "Música", None]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _simulate(mm, clock, joiners=5000, arrivals_per_second=50, seed=7):
+    rng = random.Random(seed)
+    info = {}                      # chave -> (skill, tema, chegada)
+    pairs, expired = [], []
+
+    def record(a, b, theme, at):
+        pairs.append((a, b, theme, at))
+
+    for i in range(joiners):
+        clock.now = i / arrivals_per_second
+        if i % arrivals_per_second == 0:
+            got, gone = mm.sweep()
+            for a, b, theme in got:
+                record(a, b, theme, clock.now)
+            expired.extend(gone)
+        key = f"p{i}"
+        skill, theme = rng.randint(0, 50), rng.choice(THEMES)
+        info[key] = (skill, theme, clock.now)
+        other = mm.enqueue(key, skill, theme)
+        if other is not None:
+            record(other, key, theme, clock.now)
+    # depois da última chegada, as varreduras esvaziam a fila
+    while len(mm):
+        clock.now += 1
+        got, gone = mm.sweep()
+        for a, b, theme in got:
+            record(a, b, theme, clock.now)
+        expired.extend(gone)
+    return info, pairs, expired
+
+
+def test_thousands_of_joiners():
+    clock = FakeClock()
+    mm = Matchmaker(bucket_size=5, widen_every=5, max_wait=30, clock=clock)
+    info, pairs, expired = _simulate(mm, clock)
+
+    seen = [k for a, b, _, _ in pairs for k in (a, b)] + expired
+    assert sorted(seen) == sorted(info)            # todo mundo pareado ou expirado, uma vez só
+    assert len(mm) == 0
+    for a, b, theme, at in pairs:
+        assert a != b
+        (sa, ta, ja), (sb, tb, jb) = info[a], info[b]
+        assert ta == tb == theme                   # tema do par é o que os dois pediram
+        # a distância de faixas cabe na janela do que esperou mais
+        distance = abs(sa // 5 - sb // 5)
+        assert distance <= int((at - min(ja, jb)) // 5)
+        assert at - max(ja, jb) < 30
+    # com 50 chegadas/s espalhadas em 4 filas, quase ninguém expira
+    assert len(expired) < len(info) * 0.01
+    stats = mm.stats()
+    assert stats["matched"] == len(pairs)
+    assert stats["wait_p95"] <= 30
+
+
+def test_sweep_pairs_keep_the_theme():
+    clock = FakeClock()
+    mm = Matchmaker(bucket_size=5, widen_every=5, max_wait=30, clock=clock)
+    assert mm.enqueue("a", 0, "Música") is None
+    assert mm.enqueue("b", 25, "Música") is None
+    assert mm.enqueue("c", 0, None) is None
+    assert mm.enqueue("d", 25, None) is None
+    assert mm.sweep() == ([], [])                  # 5 faixas de distância
+    clock.now = 25                                 # janela alargada até 5 faixas
+    pairs, expired = mm.sweep()
+    assert sorted((sorted((a, b)), theme) for a, b, theme in pairs) == [
+        (["a", "b"], "Música"), (["c", "d"], None)]
+    assert expired == []
+
+
+def test_different_themes_never_pair():
+    clock = FakeClock()
+    mm = Matchmaker(clock=clock)
+    assert mm.enqueue("a", 10, "Música") is None
+    assert mm.enqueue("b", 10, "Jogos") is None
+    assert mm.enqueue("c", 10, ANY_THEME) is None
+    clock.now = 29
+    assert mm.sweep() == ([], [])
+    clock.now = 30
+    assert sorted(mm.sweep()[1]) == ["a", "b", "c"]
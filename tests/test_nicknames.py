@@ -0,0 +1,72 @@
+# tests/test_nicknames.py
+# Alocação de nickname no cadastro via Google: colisões, limite de 16 chars e
+# sufixos grandes demais (que estourariam o CAST no Postgres).
+import pytest
+from sqlalchemy import delete
+
+from models import SessionLocal, User
+
+
+@pytest.fixture
+def db(quiz_app):
+    with SessionLocal() as s:
+        yield s
+        s.rollback()
+        s.execute(delete(User).where(User.nickname != "teste"))
+        s.commit()
+
+
+def _add(db, *nicks):
+    for n in nicks:
+        db.add(User(nickname=n))
+    db.commit()
+
+
+def _create(A, db, name):
+    user = A.create_user_unique_nickname(db, name, is_active=True)
+    db.commit()
+    return user.nickname
+
+
+def test_free_name_is_kept(quiz_app, db):
+    assert quiz_app.unique_nickname_human(db, "lucas  silva") == "Lucas Silva"
+
+
+def test_collisions_take_the_next_suffix(quiz_app, db):
+    assert _create(quiz_app, db, "Lucas Silva") == "Lucas Silva"
+    assert _create(quiz_app, db, "Lucas Silva") == "Lucas Silva 2"
+    assert _create(quiz_app, db, "Lucas Silva") == "Lucas Silva 3"
+    _add(db, "Lucas Silva 7", "Lucas Silvana", "Lucas Silva 2b")
+    assert _create(quiz_app, db, "Lucas Silva") == "Lucas Silva 8"
+
+
+def test_suffix_that_does_not_fit_falls_back_to_lowest_free(quiz_app, db):
+    _add(db, "Lucas Silva", "Lucas Silva 9999")
+    nick = _create(quiz_app, db, "Lucas Silva")
+    assert nick == "Lucas Silva 2"
+    _add(db, "Lucas Silva 3")
+    assert _create(quiz_app, db, "Lucas Silva") == "Lucas Silva 4"
+
+
+def test_suffix_too_long_to_cast_is_ignored(quiz_app, db):
+    _add(db, "Ana", "Ana 99999999999", "Ana 100000000000")
+    assert _create(quiz_app, db, "Ana") == "Ana 2"
+
+
+def test_long_names_are_shortened_to_fit(quiz_app, db):
+    name = "Maria Aparecida dos Santos"
+    first = _create(quiz_app, db, name)
+    assert first == "Maria Aparecida"
+    second = _create(quiz_app, db, name)
+    assert len(second) <= quiz_app.NICK_MAX
+    assert second == "Maria Aparecid 2"
+    for _ in range(10):
+        assert len(_create(quiz_app, db, name)) <= quiz_app.NICK_MAX
+
+
+def test_every_one_digit_suffix_taken_shortens_the_base(quiz_app, db):
+    base = "Abcdefghijklmn"                       # 14 chars: só cabe 1 dígito
+    _add(db, base, *(f"{base} {i}" for i in range(2, 10)))
+    nick = _create(quiz_app, db, base)
+    assert nick == "Abcdefghijklm 2"
+    assert _create(quiz_app, db, base) == "Abcdefghijklm 3"
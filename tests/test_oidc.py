@@ -0,0 +1,119 @@
+# tests/test_oidc.py
+# JWKSCache contra um endpoint JWKS falso e relógio injetado.
+import pytest
+
+from oidc import JWKSCache
+
+KEYS_V1 = {"keys": [{"kid": "v1", "kty": "RSA"}]}
+KEYS_V2 = {"keys": [{"kid": "v2", "kty": "RSA"}]}
+
+
+class FakeResponse:
+    def __init__(self, body, cache_control=""):
+        self._body = body
+        self.headers = {"Cache-Control": cache_control} if cache_control else {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._body
+
+
+class FakeJWKS:
+    """Endpoint falso: devolve `body` ou levanta `error`, contando as chamadas."""
+
+    def __init__(self, body=KEYS_V1, cache_control=""):
+        self.body = body
+        self.cache_control = cache_control
+        self.error = None
+        self.calls = 0
+
+    def get(self, url, timeout=None):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return FakeResponse(self.body, self.cache_control)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _cache(http, clock, **kw):
+    kw.setdefault("ttl", 3600)
+    kw.setdefault("min_refresh", 60)
+    kw.setdefault("fail_backoff", 30)
+    return JWKSCache(lambda: "https://idp.example/jwks", http=http, clock=clock, **kw)
+
+
+def test_cached_until_ttl_and_max_age():
+    http, clock = FakeJWKS(cache_control="public, max-age=120"), FakeClock()
+    cache = _cache(http, clock)
+    assert cache.get() == KEYS_V1
+    clock.now += 119
+    assert cache.get() == KEYS_V1
+    assert http.calls == 1
+    http.body = KEYS_V2
+    clock.now += 1
+    assert cache.get() == KEYS_V2
+    assert http.calls == 2
+
+
+def test_forced_refresh_is_rate_limited():
+    http, clock = FakeJWKS(), FakeClock()
+    cache = _cache(http, clock)
+    cache.get()
+    clock.now += 10
+    cache.get(force=True)                # kid desconhecido logo depois do fetch
+    assert http.calls == 1
+    clock.now += 60
+    http.body = KEYS_V2
+    assert cache.get(force=True) == KEYS_V2
+    assert http.calls == 2
+
+
+def test_failed_forced_refetch_backs_off():
+    http, clock = FakeJWKS(), FakeClock()
+    cache = _cache(http, clock, min_refresh=0)
+    cache.get()
+    http.error = ConnectionError("idp fora")
+    for _ in range(20):                  # token forjado martelando kid desconhecido
+        assert cache.get(force=True) == KEYS_V1
+    assert http.calls == 2
+    clock.now += 29
+    cache.get(force=True)
+    assert http.calls == 2
+    clock.now += 1
+    http.error = None
+    http.body = KEYS_V2
+    assert cache.get(force=True) == KEYS_V2
+    assert http.calls == 3
+
+
+def test_failed_refresh_after_expiry_keeps_old_keys():
+    http, clock = FakeJWKS(), FakeClock()
+    cache = _cache(http, clock, ttl=100)
+    cache.get()
+    http.error = ConnectionError("idp fora")
+    clock.now += 100
+    for _ in range(5):
+        assert cache.get() == KEYS_V1
+    assert http.calls == 2               # uma tentativa; o resto cai no cache negativo
+
+
+def test_first_fetch_failure_raises_without_hammering():
+    http, clock = FakeJWKS(), FakeClock()
+    http.error = ConnectionError("idp fora")
+    cache = _cache(http, clock)
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            cache.get()
+    assert http.calls == 1
+    clock.now += 30
+    http.error = None
+    assert cache.get() == KEYS_V1
@@ -0,0 +1,99 @@
+# tests/test_profiler.py
+# Profiler por request: token do header, anel de perfis, nomes seguros e a
+# amostragem de um thread ocupado.
+import json
+import os
+import time
+from collections import Counter
+
+import pytest
+
+import profiler
+from profiler import Profiler, _Run, check_token, make_token
+
+
+def test_token_round_trip_and_rejections(monkeypatch):
+    tok = make_token("segredo", ttl=60)
+    assert check_token("segredo", tok)
+    assert not check_token("outro", tok)
+    exp, _, sig = tok.partition(".")
+    assert not check_token("segredo", f"{int(exp) + 1}.{sig}")     # expiração alterada
+    for bad in (None, "", "lixo", ".abc", f"{exp}.", f"-1.{sig}"):
+        assert not check_token("segredo", bad)
+    now = time.time()
+    monkeypatch.setattr(profiler.time, "time", lambda: now + 61)
+    assert not check_token("segredo", tok)
+
+
+def _fake_run(label="GET-home"):
+    run = _Run(0, label)
+    run.samples = Counter({(_fake_run.__code__, test_token_round_trip_and_rejections.__code__): 3})
+    return run
+
+
+@pytest.fixture
+def prof(tmp_path):
+    return Profiler(directory=str(tmp_path / "perfis"), keep=3, interval=0.001)
+
+
+def test_end_writes_both_formats(prof):
+    pid = prof.end(_fake_run("GET /a b?c"))
+    assert pid and "GET_a_b_c" in pid
+    collapsed = open(prof.path(pid, "collapsed"), encoding="utf-8").read()
+    assert collapsed.startswith("_fake_run (test_profiler.py:")
+    assert collapsed.rstrip().endswith(" 3")
+    doc = json.load(open(prof.path(pid, "speedscope"), encoding="utf-8"))
+    p = doc["profiles"][0]
+    assert [f["name"] for f in doc["shared"]["frames"]] == ["_fake_run", "test_token_round_trip_and_rejections"]
+    assert p["samples"] == [[0, 1]] and p["weights"] == [3.0]
+
+
+def test_run_without_samples_writes_nothing(prof):
+    assert prof.end(_Run(0, "rapido")) is None
+    assert prof.list() == []
+
+
+def test_ring_keeps_only_the_newest(prof):
+    ids = []
+    for i in range(5):
+        ids.append(prof.end(_fake_run(f"r{i}")))
+        # mtime distinto mesmo em sistemas de arquivos com resolução grossa
+        for ext in (".collapsed", ".speedscope.json"):
+            os.utime(os.path.join(prof.directory, ids[-1] + ext), (1000 + i, 1000 + i))
+    prof._trim()
+    assert prof.list() == ids[:1:-1]
+    assert len(os.listdir(prof.directory)) == 6
+
+
+def test_path_rejects_unsafe_ids_and_formats(prof):
+    pid = prof.end(_fake_run())
+    assert prof.path(pid, "collapsed")
+    assert prof.path(pid, "pdf") is None
+    assert prof.path("../" + pid, "collapsed") is None
+    assert prof.path("nao-existe", "collapsed") is None
+    assert Profiler(directory=os.path.join(prof.directory, "vazio")).list() == []
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < end:
+        n += 1
+    return n
+
+
+def test_sampler_sees_the_profiled_thread(prof):
+    run = prof.begin("busy")
+    _busy(0.2)
+    pid = prof.end(run)
+    assert pid is not None
+    collapsed = open(prof.path(pid, "collapsed"), encoding="utf-8").read()
+    assert "_busy (test_profiler.py:" in collapsed
+
+
+def test_profiles_endpoint_requires_token(client, quiz_app):
+    assert client.get("/__profiles").status_code == 403
+    tok = make_token(quiz_app.app.secret_key, ttl=60)
+    resp = client.get("/__profiles", headers={"X-Profile": tok})
+    assert resp.status_code == 200 and isinstance(resp.json, list)
+    assert client.get("/__profiles/x/collapsed", headers={"X-Profile": tok}).status_code == 404
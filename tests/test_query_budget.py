@@ -0,0 +1,84 @@
+# tests/test_query_budget.py
+# Consultas por request no ciclo da partida: /game → /answer → /continue → /end.
+# Em regime (caches quentes, semana já virada) o ciclo custa 0/0/0/5; o
+# primeiro /end da semana paga também o reset semanal (14-15 consultas).
+from models import SessionLocal, Question, Meta
+from query_budget import budget_for
+
+# reset semanal no /end: UPDATE leaderboard + rebuild do histograma "total" (3)
+# + evento de invalidação (4) + UPDATE da meta + releitura do histograma
+WEEK_RESET_QUERIES = 10
+
+
+def _correct(qid):
+    with SessionLocal() as db:
+        return db.get(Question, qid).correct
+
+
+def _play(client, query_budget, rounds=2, measure=True):
+    """Uma partida com `rounds` acertos; cada request dentro do orçamento do endpoint."""
+    def check(endpoint, label):
+        return query_budget(budget_for(endpoint) if measure else None, label)
+
+    assert client.post("/start").status_code == 302
+    for _ in range(rounds):
+        with check("game", "GET /game"):
+            assert client.get("/game").status_code == 200
+        with client.session_transaction() as s:
+            qid, token = s["current_qid"], s["current_token"]
+        correct = _correct(qid)
+        with check("answer", "POST /answer"):
+            r = client.post("/answer", data=dict(picked=correct, correct=correct, qid=qid, qtoken=token))
+            assert r.status_code == 302
+        with check("continue", "POST /continue"):
+            assert client.post("/continue", data=dict(last="correct")).status_code == 302
+
+
+def _settle(app_module):
+    # o flush em segundo plano invalida o histograma, e o /end seguinte o relê
+    # (uma consulta a mais, fora do regime): grava e aquece antes de medir
+    app_module.score_buffer.flush()
+    app_module.score_histogram.counts()
+
+
+def _end(client, query_budget, max_queries):
+    with query_budget(max_queries, "GET /end") as log:
+        assert client.get("/end?reason=wrong").status_code == 200
+    return log
+
+
+def test_game_loop_steady_state(quiz_app, client, query_budget):
+    # a primeira partida aquece caches e absorve um eventual reset semanal
+    _play(client, query_budget, measure=False)
+    client.get("/end?reason=wrong")
+
+    _play(client, query_budget)
+    _settle(quiz_app)
+    _end(client, query_budget, budget_for("end"))
+
+
+def test_hot_paths_touch_no_database(client, query_budget):
+    client.post("/start")
+    client.get("/game")
+    with query_budget(0, "GET /game (refresh)"):
+        assert client.get("/game").status_code == 200
+
+
+def test_first_end_of_week_pays_the_reset(quiz_app, client, query_budget):
+    _play(client, query_budget, measure=False)
+    client.get("/end?reason=wrong")
+
+    with SessionLocal() as db:
+        db.merge(Meta(key="last_reset_week", value="2000-W01"))
+        db.commit()
+    _play(client, query_budget)
+    _settle(quiz_app)
+    log = _end(client, query_budget, budget_for("end") + WEEK_RESET_QUERIES)
+    assert log.count > budget_for("end")
+    with SessionLocal() as db:
+        assert db.get(Meta, "last_reset_week").value != "2000-W01"
+
+    # a partida seguinte volta ao regime
+    _play(client, query_budget)
+    _settle(quiz_app)
+    _end(client, query_budget, budget_for("end"))
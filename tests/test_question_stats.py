@@ -0,0 +1,96 @@
+# tests/test_question_stats.py
+# Gravador de estatísticas por pergunta: agregação no flush, upsert e carry.
+import pytest
+
+from question_stats import QuestionStatsRecorder, _bucket, report
+
+
+class BrokenSession:
+    def get_bind(self):
+        raise RuntimeError("banco fora")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def rec(quiz_app):
+    from models import SessionLocal
+    state = {"fail": False}
+    r = QuestionStatsRecorder(lambda: BrokenSession() if state["fail"] else SessionLocal(),
+                              flush_seconds=3600)
+    r.state = state
+    return r
+
+
+@pytest.fixture
+def qids(quiz_app):
+    from models import SessionLocal, Question
+    with SessionLocal() as db:
+        return [q.id for q in db.query(Question).order_by(Question.id.desc()).limit(2)]
+
+
+def _stats(qid):
+    from models import SessionLocal, QuestionStat
+    with SessionLocal() as db:
+        st = db.get(QuestionStat, qid)
+        return {c: getattr(st, c) for c in ("shown", "correct", "wrong", "timeout", "total_ms",
+                                           "t_2s", "t_4s", "t_15s")} if st else None
+
+
+def test_bucket_edges():
+    assert [_bucket(ms) for ms in (0, 1999, 2000, 11999, 12000, 60000)] == \
+        ["t_2s", "t_2s", "t_4s", "t_12s", "t_15s", "t_15s"]
+
+
+def test_flush_aggregates_and_upserts(rec, qids):
+    a, b = qids
+    before = _stats(a) or dict.fromkeys(("shown", "correct", "wrong", "timeout", "total_ms",
+                                          "t_2s", "t_4s", "t_15s"), 0)
+    rec.shown(a)
+    rec.shown(a)
+    rec.answered(a, "correct", 1500)
+    rec.answered(a, "wrong", 3000)
+    rec.answered(a, "timeout", 15000)   # fora do tempo médio e do histograma
+    rec.answered(b, "correct", None)    # sem tempo medido
+    assert rec.flush() == 2
+    assert rec.flush() == 0
+    after = _stats(a)
+    assert {k: after[k] - before[k] for k in after} == {
+        "shown": 2, "correct": 1, "wrong": 1, "timeout": 1, "total_ms": 4500,
+        "t_2s": 1, "t_4s": 1, "t_15s": 0}
+
+    rec.answered(a, "correct", 500)
+    rec.flush()
+    assert _stats(a)["correct"] == after["correct"] + 1     # soma no conflito
+    assert _stats(b)["total_ms"] == 0
+
+
+def test_failed_flush_is_carried_to_the_next(rec, qids):
+    a, _ = qids
+    before = _stats(a)
+    rec.answered(a, "wrong", 100)
+    rec.state["fail"] = True
+    assert rec.flush() == 0
+    rec.answered(a, "wrong", 100)
+    rec.state["fail"] = False
+    assert rec.flush() == 1
+    assert _stats(a)["wrong"] == (before["wrong"] if before else 0) + 2
+
+
+def test_report_rates(rec, qids):
+    from models import SessionLocal
+    _, b = qids
+    rec.answered(b, "wrong", 1000)
+    rec.answered(b, "timeout", None)
+    rec.flush()
+    with SessionLocal() as db:
+        row = next(r for r in report(db) if r["id"] == b)
+    st = _stats(b)
+    n = st["correct"] + st["wrong"] + st["timeout"]
+    assert row["answers"] == n
+    assert row["correct_rate"] == st["correct"] / n
+    assert row["avg_ms"] == st["total_ms"] // (n - st["timeout"])
@@ -0,0 +1,122 @@
+# tests/test_replica.py
+# Roteamento de leituras com dois arquivos SQLite: "primário" e "réplica".
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+import replica
+from models import make_engine
+from replica import ReplicaRouter
+
+
+def _db(path, value):
+    eng = make_engine(f"sqlite:///{path}")
+    with eng.begin() as conn:
+        conn.execute(text("CREATE TABLE origin (name TEXT)"))
+        conn.execute(text("INSERT INTO origin VALUES (:v)"), {"v": value})
+    return eng, sessionmaker(bind=eng, future=True)
+
+
+@pytest.fixture
+def dbs(tmp_path):
+    primary_engine, primary = _db(tmp_path / "primary.db", "primário")
+    replica_engine, replica_factory = _db(tmp_path / "replica.db", "réplica")
+    yield primary, replica_factory, replica_engine
+    primary_engine.dispose()
+    replica_engine.dispose()
+
+
+def _read(factory):
+    with factory() as db:
+        return db.execute(text("SELECT name FROM origin")).scalar()
+
+
+def _measured(router):
+    # primeira leitura dispara a medição em segundo plano; espera ela terminar
+    router.factory_for()
+    router._thread.join(5)
+    return router
+
+
+def test_reads_go_to_healthy_replica(dbs):
+    primary, replica_factory, replica_engine = dbs
+    router = _measured(ReplicaRouter(primary, replica_factory, replica_engine))
+    factory, on_replica = router.factory_for()
+    assert on_replica
+    assert _read(factory) == "réplica"
+    assert router.reads["replica"] == 1
+
+
+def test_read_your_writes_sticks_to_primary(dbs):
+    primary, replica_factory, replica_engine = dbs
+    router = _measured(ReplicaRouter(primary, replica_factory, replica_engine))
+    factory, on_replica = router.factory_for(sticky_until=replica.time.time() + 5)
+    assert not on_replica
+    assert _read(factory) == "primário"
+    # passado o prazo, volta à réplica
+    assert router.factory_for(sticky_until=replica.time.time() - 1)[1]
+
+
+def test_unreachable_replica_falls_back(dbs, tmp_path):
+    primary, _, _ = dbs
+    broken = make_engine(f"sqlite:///{tmp_path / 'nao-existe' / 'replica.db'}")
+    router = _measured(ReplicaRouter(primary, sessionmaker(bind=broken), broken))
+    factory, on_replica = router.factory_for()
+    assert not on_replica
+    assert _read(factory) == "primário"
+    assert router.reads["fallback"] == 2
+    assert router.lag == float("inf")
+
+
+def test_lag_over_budget_falls_back(dbs, monkeypatch):
+    primary, replica_factory, replica_engine = dbs
+    monkeypatch.setitem(replica._LAG_SQL, "sqlite", "SELECT 12.5")
+    router = _measured(ReplicaRouter(primary, replica_factory, replica_engine, max_lag=5))
+    assert not router.factory_for()[1]
+    assert router.lag == 12.5
+    monkeypatch.setitem(replica._LAG_SQL, "sqlite", "SELECT 1")
+    router.check()
+    assert router.factory_for()[1]
+
+
+def test_mark_failed_until_next_check(dbs):
+    primary, replica_factory, replica_engine = dbs
+    router = ReplicaRouter(primary, replica_factory, replica_engine, health_ttl=60)
+    router.check()
+    assert router.factory_for()[1]
+    router.mark_failed()
+    assert not router.factory_for()[1]
+    # a próxima checagem (TTL vencido) devolve a réplica
+    router._checked_at -= 61
+    _measured(router)
+    assert router.factory_for()[1]
+
+
+def test_slow_probe_does_not_block_reads(dbs, monkeypatch):
+    primary, replica_factory, replica_engine = dbs
+    router = ReplicaRouter(primary, replica_factory, replica_engine, health_ttl=0)
+    release = threading.Event()
+    real_check = router._check
+
+    def slow_check():
+        release.wait(5)            # réplica pendurada no connect
+        real_check()
+    monkeypatch.setattr(router, "_check", slow_check)
+    t0 = time.monotonic()
+    for _ in range(20):
+        assert router.factory_for() == (primary, False)
+    assert time.monotonic() - t0 < 0.5
+    assert threading.active_count() < 20 + 5      # uma medição por vez
+    release.set()
+    router._thread.join(5)
+    assert router.factory_for()[1]
+
+
+def test_without_replica_everything_goes_to_primary(dbs):
+    primary, _, _ = dbs
+    router = ReplicaRouter(primary)
+    assert not router.enabled
+    assert router.factory_for() == (primary, False)
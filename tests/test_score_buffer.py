@@ -0,0 +1,148 @@
+# tests/test_score_buffer.py
+# Agregador write-behind: agregação, overlay, spill e recuperação após crash.
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from score_buffer import ScoreAggregator
+
+
+class Sink:
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def __call__(self, batch):
+        if self.fail:
+            raise RuntimeError("banco fora")
+        self.batches.append({n: list(v) for n, v in batch.items()})
+
+
+def _dead_pid():
+    p = subprocess.Popen([sys.executable, "-c", "pass"])
+    p.wait()
+    return p.pid
+
+
+def _spill(path, *events):
+    with open(path, "w", encoding="utf-8") as fh:
+        for e in events:
+            fh.write(json.dumps(e) + "\n")
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh]
+
+
+@pytest.fixture
+def agg(tmp_path):
+    sink = Sink()
+    a = ScoreAggregator(sink, flush_ms=60_000, flush_events=10_000, spill_dir=str(tmp_path))
+    a.sink = sink
+    yield a
+    a._pid = None           # não deixa o atexit gravar no sink de outro teste
+
+
+def test_events_are_merged_per_nickname(agg):
+    agg.add("ana", 10)
+    agg.add("ana", 7)
+    agg.add("bia", 3)
+    assert agg.flush() == 2
+    assert agg.sink.batches == [{"ana": [10, 17, 2], "bia": [3, 3, 1]}]
+    assert agg.flush() == 0
+
+
+def test_overlay_applies_pending_and_reorders(agg):
+    rows = [{"nickname": "ana", "best_score": 10, "total_points": 30, "games_played": 3},
+            {"nickname": "bia", "best_score": 8, "total_points": 8, "games_played": 1}]
+    agg.add("bia", 12)
+    agg.add("caio", 9)
+    out = agg.overlay(rows)
+    assert [r["nickname"] for r in out] == ["bia", "ana", "caio"]
+    assert out[0] == {"nickname": "bia", "best_score": 12, "total_points": 20, "games_played": 2}
+    assert rows[1]["best_score"] == 8          # não altera as linhas recebidas
+
+
+def test_every_event_is_spilled_until_flushed(agg, tmp_path):
+    agg.add("ana", 5)
+    agg.add("ana", 6)
+    spill = tmp_path / f"scores-{os.getpid()}.jsonl"
+    assert _lines(spill) == [["ana", 5, 5, 1], ["ana", 6, 6, 1]]
+    agg.flush()
+    assert _lines(spill) == []
+    assert not (tmp_path / f"scores-{os.getpid()}.jsonl.flushing").exists()
+
+
+def test_failed_flush_keeps_the_batch_and_backs_off(agg, tmp_path):
+    agg.add("ana", 5)
+    agg.sink.fail = True
+    assert agg.flush() == 0
+    assert agg.stats()["errors"] == 1
+    agg.add("ana", 4)
+    assert agg.pending_view() == {"ana": [5, 9, 2]}
+    assert _lines(tmp_path / f"scores-{os.getpid()}.jsonl") == [["ana", 5, 5, 1], ["ana", 4, 4, 1]]
+    agg.sink.fail = False
+    assert agg.flush() == 0                     # ainda no backoff
+    assert agg.flush(force=True) == 1
+    assert agg.sink.batches == [{"ana": [5, 9, 2]}]
+
+
+def test_start_recovers_spills_of_dead_processes(agg, tmp_path):
+    dead = _dead_pid()
+    _spill(tmp_path / f"scores-{dead}.jsonl", ["ana", 5, 5, 1], ["bia", 2, 2, 1])
+    _spill(tmp_path / f"scores-{dead}.jsonl.flushing", ["ana", 9, 9, 1])
+    _spill(tmp_path / f"scores-{os.getppid()}.jsonl", ["vivo", 1, 1, 1])   # dono vivo
+    agg.start()
+    assert agg.pending_view() == {"ana": [9, 14, 2], "bia": [2, 2, 1]}
+    names = sorted(os.listdir(tmp_path))
+    assert names == sorted([f"scores-{os.getpid()}.jsonl", f"scores-{os.getppid()}.jsonl"])
+    # o recuperado passou para o spill deste processo
+    assert sorted(_lines(tmp_path / f"scores-{os.getpid()}.jsonl")) == [["ana", 9, 14, 2], ["bia", 2, 2, 1]]
+
+
+def test_spill_with_our_own_pid_is_recovered(agg, tmp_path):
+    # container reiniciado: o worker novo recebeu o PID do que morreu
+    _spill(tmp_path / f"scores-{os.getpid()}.jsonl", ["ana", 7, 7, 1])
+    agg.start()
+    assert agg.pending_view() == {"ana": [7, 7, 1]}
+    agg.add("ana", 3)
+    assert agg.flush() == 1
+    assert agg.sink.batches == [{"ana": [7, 10, 2]}]
+
+
+def test_reset_week_zeroes_pending_totals_in_memory_and_spill(agg, tmp_path):
+    agg.add("ana", 8)
+    agg.reset_week()
+    assert agg.pending_view() == {"ana": [8, 0, 0]}
+    assert _lines(tmp_path / f"scores-{os.getpid()}.jsonl") == [["ana", 8, 0, 0]]
+
+
+def test_close_flushes_and_removes_the_spill(agg, tmp_path):
+    agg.add("ana", 1)
+    agg.close()
+    assert agg.sink.batches == [{"ana": [1, 1, 1]}]
+    assert os.listdir(tmp_path) == []
+
+
+def test_flush_counts_new_players_once_in_the_histogram(quiz_app):
+    # a linha nova é criada antes do SELECT ... FOR UPDATE; quem não a inseriu
+    # neste flush a vê como existente e move o histograma, não soma de novo
+    import score_hist
+    from models import SessionLocal, ScoreHistogram
+
+    def counts():
+        with SessionLocal() as db:
+            return {(k, b): n for k, b, n in db.query(ScoreHistogram.kind, ScoreHistogram.bucket,
+                                                      ScoreHistogram.count)}
+
+    before = counts()
+    quiz_app._flush_scores({"hist-novo": [7, 7, 1]})
+    quiz_app._flush_scores({"hist-novo": [9, 9, 1]})
+    after = counts()
+    delta = {k: after.get(k, 0) - before.get(k, 0) for k in set(after) | set(before)}
+    delta = {k: d for k, d in delta.items() if d}
+    assert delta == {("best", 9): 1, ("total", score_hist.bucket_of("total", 16)): 1}
@@ -0,0 +1,102 @@
+# tests/test_score_hist.py
+# Histograma do ranking: faixas, movimentos entre faixas, percentil e gráfico.
+import pytest
+
+import score_hist
+from score_hist import apply_moves, bucket_of, bucket_range, chart, moves_for
+
+
+def test_buckets_and_ranges():
+    assert [bucket_of("best", v) for v in (None, -3, 0, 17, 50, 80)] == [0, 0, 0, 17, 50, 50]
+    assert [bucket_of("total", v) for v in (0, 9, 10, 995, 5000)] == [0, 0, 1, 99, 99]
+    assert bucket_range("best", 17) == (17, 18)
+    assert bucket_range("best", 50) == (50, None)
+    assert bucket_range("total", 3) == (30, 40)
+    assert bucket_range("total", 99) == (990, None)
+
+
+def test_moves_for_new_and_existing_players():
+    assert moves_for(None, (7, 7)) == {("best", 7): 1, ("total", 0): 1}
+    # best subiu, total ficou na mesma faixa: só o best se move
+    assert moves_for((7, 12), (9, 19)) == {("best", 7): -1, ("best", 9): 1}
+    assert moves_for((9, 19), (9, 25)) == {("total", 1): -1, ("total", 2): 1}
+    assert moves_for((9, 19), (9, 19)) == {}
+
+
+def test_apply_moves_upserts_and_rebuild_matches_the_table(quiz_app):
+    from models import SessionLocal, ScoreHistogram
+
+    def counts(db):
+        return {(k, b): n for k, b, n in db.query(ScoreHistogram.kind, ScoreHistogram.bucket,
+                                                  ScoreHistogram.count) if n}
+
+    with SessionLocal() as db:
+        score_hist.rebuild(db)
+        db.flush()
+        base = counts(db)
+        apply_moves(db, {("best", 3): 2, ("best", 4): 0, ("total", 99): 1})
+        apply_moves(db, {("best", 3): -1})
+        got = counts(db)
+        assert got.get(("best", 3), 0) == base.get(("best", 3), 0) + 1
+        assert got.get(("total", 99), 0) == base.get(("total", 99), 0) + 1
+        assert got.get(("best", 4), 0) == base.get(("best", 4), 0)
+        score_hist.rebuild(db)
+        db.flush()
+        assert counts(db) == base
+        db.rollback()
+
+
+def test_chart_groups():
+    best = [0] * 51
+    best[0], best[4], best[5], best[50] = 1, 1, 4, 2
+    bars = chart("best", best)
+    assert [b["label"] for b in bars][:2] == ["0–4", "5–9"] and bars[-1]["label"] == "50"
+    assert [b["count"] for b in bars][:2] == [2, 4] and bars[-1]["count"] == 2
+    assert bars[1]["pct"] == 100 and bars[0]["pct"] == 50
+
+    total = [0] * 100
+    total[0], total[25] = 3, 1
+    bars = chart("total", total, bars=10)
+    assert bars[0] == {"label": "0–29", "count": 3, "pct": 100}
+    assert sum(b["count"] for b in bars) == 4
+    assert chart("total", [0] * 100) == [{"label": "0–9", "count": 0, "pct": 0}]
+
+
+class Hist:
+    def __init__(self, best):
+        self.best = best
+
+    def counts(self):
+        return {"best": self.best, "total": [0] * 100}
+
+
+@pytest.fixture
+def hist(quiz_app, monkeypatch):
+    def use(pairs):
+        best = [0] * 51
+        for score, n in pairs:
+            best[score] = n
+        monkeypatch.setattr(quiz_app, "score_histogram", Hist(best))
+    return use
+
+
+def test_beat_pct_new_player(quiz_app, hist):
+    hist([(2, 3), (5, 1), (9, 4)])
+    assert quiz_app._beat_pct(6, None) == 50          # 4 de 8 abaixo
+    assert quiz_app._beat_pct(0, None) == 0
+    assert quiz_app._beat_pct(10, None) == 100
+
+
+def test_beat_pct_does_not_count_the_player_twice(quiz_app, hist):
+    # o jogador já está no histograma com best 2
+    hist([(2, 3), (5, 1), (9, 4)])
+    assert quiz_app._beat_pct(6, 2) == 43             # 3 dos outros 7 abaixo
+    assert quiz_app._beat_pct(2, 2) == 0
+    assert quiz_app._beat_pct(3, 9) == 43             # recorde antigo acima: 3 de 7
+
+
+def test_beat_pct_alone(quiz_app, hist):
+    hist([])
+    assert quiz_app._beat_pct(5, None) is None
+    hist([(5, 1)])
+    assert quiz_app._beat_pct(5, 5) is None
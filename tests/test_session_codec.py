@@ -0,0 +1,129 @@
+# tests/test_session_codec.py
+# Cookie de sessão binário: ida e volta, adulteração, expiração e formato antigo.
+from datetime import timedelta
+
+import pytest
+from flask import Flask, flash, get_flashed_messages, session
+from flask.sessions import SecureCookieSessionInterface
+from markupsafe import Markup
+
+import session_codec
+from session_codec import BinarySessionInterface, decode, encode
+
+
+@pytest.fixture
+def app():
+    a = Flask(__name__)
+    a.secret_key = "testes"
+    a.session_interface = BinarySessionInterface()
+
+    @a.route("/set")
+    def set_():
+        session["nickname"] = "Ana"
+        session["queue_ids"] = [3, 70000, 5]
+        session.permanent = True
+        return ""
+
+    @a.route("/get")
+    def get():
+        return dict(session)
+
+    @a.route("/flash")
+    def flash_():
+        flash(Markup("<b>Bem-vindo</b>"), "ok")
+        return ""
+
+    @a.route("/flashes")
+    def flashes():
+        return {"m": get_flashed_messages(with_categories=True)}
+
+    return a
+
+
+def _cookie(client, app):
+    return client.get_cookie(app.config["SESSION_COOKIE_NAME"]).value
+
+
+@pytest.mark.parametrize("data", [
+    {},
+    {"_user_id": "Lucas Silva", "_fresh": True, "score": 0, "theme": "Música"},
+    {"_id": "ab" * 64, "current_shown_at": 1_760_000_000_000, "x": -(1 << 40), "f": 1.5},
+    {"queue_ids": [1, 2, 300], "asked_ids": [-1, 1 << 40], "vazio": [], "mista": [1, "a", None]},
+    {"feedback_state": {"qid": 7, "picked": "B", "timed_out": False}, "t": (1, "ok"), "b": b"\x00\xff"},
+    {"longa": "é" * 300, "hex_curto": "abcd", "hex_impar": "abc" * 7},
+])
+def test_round_trip(data):
+    assert decode(encode(data)) == data
+
+
+def test_str_subclass_is_stored_as_str():
+    out = decode(encode({"_flashes": [("ok", Markup("<b>oi</b>"))]}))
+    assert out == {"_flashes": [("ok", "<b>oi</b>")]}
+    assert type(out["_flashes"][0][1]) is str
+
+
+def test_flash_with_markup_survives_the_cookie(app):
+    c = app.test_client()
+    c.get("/flash")
+    assert _cookie(c, app).startswith(session_codec.PREFIX)
+    assert c.get("/flashes").json == {"m": [["ok", "<b>Bem-vindo</b>"]]}
+
+
+def test_cookie_round_trip_through_requests(app):
+    c = app.test_client()
+    c.get("/set")
+    assert c.get("/get").json == {"nickname": "Ana", "queue_ids": [3, 70000, 5], "_permanent": True}
+
+
+def test_tampered_cookie_is_discarded(app):
+    c = app.test_client()
+    c.get("/set")
+    val = _cookie(c, app)
+    body = val[len(session_codec.PREFIX):]
+    forged = session_codec.PREFIX + body[:10] + ("A" if body[10] != "A" else "B") + body[11:]
+    c.set_cookie(app.config["SESSION_COOKIE_NAME"], forged)
+    assert c.get("/get").json == {}
+    c.set_cookie(app.config["SESSION_COOKIE_NAME"], session_codec.PREFIX + "lixo!")
+    assert c.get("/get").json == {}
+
+
+def test_other_secret_does_not_validate(app):
+    iface = BinarySessionInterface()
+    val = iface.sign(app, encode({"nickname": "Ana"}))
+    other = Flask(__name__)
+    other.secret_key = "outra"
+    assert iface.unsign(other, val) is None
+    assert decode(iface.unsign(app, val)) == {"nickname": "Ana"}
+
+
+def test_expired_cookie_is_discarded(app, monkeypatch):
+    iface = BinarySessionInterface()
+    app.permanent_session_lifetime = timedelta(minutes=5)
+    now = 1_760_000_000
+    monkeypatch.setattr(session_codec.time, "time", lambda: now)
+    val = iface.sign(app, encode({"nickname": "Ana"}))
+    monkeypatch.setattr(session_codec.time, "time", lambda: now + 299)
+    assert iface.unsign(app, val) is not None
+    monkeypatch.setattr(session_codec.time, "time", lambda: now + 301)
+    assert iface.unsign(app, val) is None
+
+
+def test_legacy_cookie_is_read_and_rewritten(app):
+    legacy = SecureCookieSessionInterface().get_signing_serializer(app)
+    c = app.test_client()
+    c.set_cookie(app.config["SESSION_COOKIE_NAME"], legacy.dumps({"nickname": "Ana", "score": 3}))
+    assert c.get("/get").json == {"nickname": "Ana", "score": 3}
+    # migra para o formato novo na mesma resposta
+    assert _cookie(c, app).startswith(session_codec.PREFIX)
+    assert c.get("/get").json == {"nickname": "Ana", "score": 3}
+
+
+def test_unmodified_session_is_only_resigned(app, monkeypatch):
+    c = app.test_client()
+    c.get("/set")
+    before = _cookie(c, app)
+    monkeypatch.setattr(session_codec, "encode", lambda data: pytest.fail("recodificou"))
+    later = session_codec.time.time() + 10
+    monkeypatch.setattr(session_codec.time, "time", lambda: later)
+    assert c.get("/get").json["nickname"] == "Ana"     # sessão permanente: refresh do cookie
+    assert _cookie(c, app) != before
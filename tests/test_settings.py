@@ -0,0 +1,107 @@
+# tests/test_settings.py
+# Snapshot de configuração: leitura do ambiente, overrides no banco e reload.
+import pytest
+
+import settings
+from settings import Settings, SettingsStore
+
+
+def test_from_env_parses_and_defaults():
+    cur = Settings.from_env({
+        "MAINTENANCE_MODE": " Yes ",
+        "MAINTENANCE_ALLOWED": "status, ,extra",
+        "MAIL_DEFAULT_SENDER": "Quiz <quiz@example.com>",
+        "PROFILE_SAMPLE_RATE": "0.25",
+    }, version=3)
+    assert cur.maintenance and cur.version == 3
+    assert cur.maintenance_allowed == settings.MAINTENANCE_ALLOWED | {"status", "extra"}
+    assert (cur.mail_sender_name, cur.mail_sender_email) == ("Quiz", "quiz@example.com")
+    assert cur.profile_sample_rate == 0.25
+
+    empty = Settings.from_env({})
+    assert not empty.maintenance
+    assert empty.mail_sender_email is None and empty.mail_sender_name is None
+    assert empty.preferred_url_scheme == "https" and empty.profile_sample_rate == 0.0
+    only_user = Settings.from_env({"MAIL_USERNAME": "eu@example.com"})
+    assert (only_user.mail_sender_name, only_user.mail_sender_email) == (None, "eu@example.com")
+
+
+@pytest.fixture
+def overrides(quiz_app):
+    from models import SessionLocal, Meta
+    keys = []
+
+    def put(var, value):
+        with SessionLocal() as db:
+            db.merge(Meta(key=settings.META_PREFIX + var, value=value))
+            db.commit()
+        keys.append(settings.META_PREFIX + var)
+
+    yield put
+    with SessionLocal() as db:
+        db.query(Meta).filter(Meta.key.in_(keys)).delete()
+        db.commit()
+
+
+def test_reload_applies_db_overrides_as_a_new_snapshot(overrides, monkeypatch):
+    from models import SessionLocal
+    monkeypatch.delenv("BATTLE_WS_URL", raising=False)
+    store = SettingsStore(SessionLocal, poll_seconds=0)
+    before = store.current
+    store.reload(reread_env=False)
+    assert store.current is before                 # nada mudou: mesmo snapshot, mesma versão
+
+    overrides("BATTLE_WS_URL", "wss://batalha.example.com")
+    store.reload(reread_env=False)
+    cur = store.current
+    assert cur is not before and before.battle_ws_url == "ws://localhost:8765"
+    assert cur.battle_ws_url == "wss://batalha.example.com"
+    assert cur.version == before.version + 1
+
+
+def test_db_override_wins_over_env(overrides, monkeypatch):
+    from models import SessionLocal
+    monkeypatch.setenv("PREVIEW_TOKEN", "do-ambiente")
+    overrides("PREVIEW_TOKEN", "do-banco")
+    store = SettingsStore(SessionLocal, poll_seconds=0)
+    assert store.current.preview_token == "do-ambiente"
+    store.reload(reread_env=False)
+    assert store.current.preview_token == "do-banco"
+
+
+def test_reload_rereads_dotenv(monkeypatch):
+    monkeypatch.delenv("PREVIEW_TOKEN", raising=False)
+    store = SettingsStore()
+    monkeypatch.setattr(settings, "load_dotenv",
+                        lambda override: monkeypatch.setenv("PREVIEW_TOKEN", "novo"))
+    store.reload()
+    assert store.current.preview_token == "novo"
+
+
+def test_unreachable_db_keeps_the_last_overrides(overrides):
+    from models import SessionLocal
+    state = {"down": False}
+
+    def factory():
+        if state["down"]:
+            raise RuntimeError("banco fora")
+        return SessionLocal()
+
+    overrides("MAINTENANCE_MODE", "true")
+    store = SettingsStore(factory, poll_seconds=0)
+    store.reload(reread_env=False)
+    assert store.current.maintenance
+    state["down"] = True
+    store.reload(reread_env=False)
+    assert store.current.maintenance
+
+
+def test_cli_set_show_unset(quiz_app, capsys):
+    from models import SessionLocal
+    assert settings.main(["settings.py", "set", "PROFILE_SAMPLE_RATE", "0.5"]) == 0
+    assert settings.main(["settings.py", "show"]) == 0
+    assert "PROFILE_SAMPLE_RATE=0.5" in capsys.readouterr().out
+    assert settings.main(["settings.py", "unset", "PROFILE_SAMPLE_RATE"]) == 0
+    with SessionLocal() as db:
+        assert "PROFILE_SAMPLE_RATE" not in settings.read_overrides(db)
+    assert settings.main(["settings.py", "set", "X"]) == 2